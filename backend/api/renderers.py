@@ -0,0 +1,30 @@
+from django.http import HttpResponse
+from rest_framework.renderers import BaseRenderer
+
+from scraper.records import render_json
+
+
+class ProductJSONRenderer(BaseRenderer):
+    """JSON renderer that writes product records out directly.
+
+    DRF's JSONRenderer only sees records through its encoder's fallback, one
+    dict per product; this renderer encodes them field by field instead.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return escape_separators(render_json(data))
+
+
+def escape_separators(content):
+    """Escape U+2028/U+2029, which are valid in JSON but not in JavaScript source."""
+    return content.replace('\u2028'.encode('utf-8'), b'\\u2028').replace('\u2029'.encode('utf-8'), b'\\u2029')
+
+
+def json_response(data, status=200):
+    """Build a JSON HttpResponse for views outside DRF, through the product renderer."""
+    return HttpResponse(ProductJSONRenderer().render(data), status=status, content_type='application/json')
@@ -4,4 +4,12 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),  # Root URL handler
     path('search/', views.search, name='search'),  # Search endpoint
+    path('search/stream/', views.search_stream, name='search_stream'),  # Streaming (NDJSON) search endpoint
+    path('search/async/', views.search_async, name='search_async'),  # Async search endpoint (serve via ASGI)
+    path('jobs/', views.submit_search_job, name='submit_search_job'),  # Queue a search for the scraper workers
+    path('jobs/<uuid:job_id>/', views.search_job, name='search_job'),  # Search job status and results
+    path('jobs/<uuid:job_id>/stream/', views.search_job_stream, name='search_job_stream'),  # Streaming (NDJSON) job progress
+    path('nodes/', views.scraper_nodes, name='scraper_nodes'),  # Scraper worker nodes and their throughput
+    path('prewarm/', views.prewarm_stats, name='prewarm_stats'),  # Query log and pre-warm report
+    path('stats/', views.scraper_stats, name='scraper_stats'),  # Scraper subsystem stats
 ]
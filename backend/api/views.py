@@ -1,15 +1,177 @@
 from django.shortcuts import render
 from rest_framework.response import Response
-from rest_framework.decorators import api_view
-from scraper.utils import scrape_all_sites, scrape_meesho, scrape_nykaa_fashion, scrape_fabindia
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.renderers import BrowsableAPIRenderer
+from scraper.utils import collect_errors, iter_site_results
+from scraper.deadline import Deadline
+from scraper.admission import Overloaded, get_browser_admission
+from scraper.async_pipeline import scrape_sites_async
+from scraper.browser_profile import get_page_load_stats
+from scraper.cache import get_result_cache
+from scraper.catalog import get_catalog, listing_key, normalize_name
+from scraper.coalesce import get_single_flight
+from scraper.driver_pool import get_driver_pool
+from scraper.jobs import QueueFull, get_job_queue, job_filters, job_sites
+from scraper.health import get_retry_budget, get_site_health
+from scraper.parse_pool import get_parse_pool
+from scraper.prewarm import DEFAULT_WINDOW_DAYS, prewarm_report
+from scraper.query_log import get_query_log
+from scraper.quota import ResultQuota
+from scraper.models import SearchJob
+from scraper.nodes import node_stats
+from scraper.records import Product, iter_json
+from scraper.cursors import CursorExpired, decode_cursor, encode_cursor, get_result_store
+from scraper.results import DEFAULT_SORT, SORT_MODES, ResultSet
+from scraper.scheduler import get_duration_estimator
+from scraper.search_index import IndexUnavailable, search_products
+from scraper.sites import get_site_registry
+from .renderers import ProductJSONRenderer, json_response
 import logging
-from django.http import JsonResponse
-from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+import json
 import time
 
 logger = logging.getLogger(__name__)
 
+# Values of the search API's `source` parameter
+SOURCE_LIVE = 'live'  # Scrape the sites (through the result cache and catalog)
+SOURCE_INDEX = 'index'  # Match the query against the local full-text product index
+
+def filter_and_sort_results(results, min_price=0, max_price=float('inf'), min_rating=0, sort=DEFAULT_SORT):
+    """Drop incomplete products, apply price/rating filters and sort (by price, lowest first, by default)."""
+    result_set = ResultSet(results).filter(min_price=min_price, max_price=max_price, min_rating=min_rating)
+    return result_set.sort(SORT_MODES[sort]).to_list()
+
+def sort_param(sort):
+    if sort not in SORT_MODES:
+        raise ValueError(f"Unknown sort '{sort}', expected one of: {', '.join(SORT_MODES)}")
+    return sort
+
+def limit_param(limit):
+    """Parse a `limit` parameter into a positive integer, or None if not given."""
+    if limit in (None, ''):
+        return None
+    limit = str(limit)
+    if not limit.isdigit() or int(limit) < 1:
+        raise ValueError("limit must be a positive integer")
+    return int(limit)
+
+def page_params(request):
+    """Read the `sort`, `limit` and `cursor` parameters, raising ValueError if invalid."""
+    sort = sort_param(request.GET.get('sort', DEFAULT_SORT))
+    return sort, limit_param(request.GET.get('limit')), request.GET.get('cursor') or None
+
+def result_page(result_id, result_set, sort, limit=None, offset=0, min_price=0, max_price=float('inf'), min_rating=0):
+    """Filter, sort and slice a stored result set into the response's result and cursor fields.
+    
+    A page needs only the first ``offset + limit`` rows in sort order, so it
+    is cut with a partial sort. ``cursor`` re-reads the same set from the
+    start (e.g. with another `sort`); ``next_cursor`` continues after this page.
+    """
+    matching = result_set.filter(min_price=min_price, max_price=max_price, min_rating=min_rating)
+    keys = SORT_MODES[sort]
+    if limit is None:
+        page = matching.sort(keys).to_list()[offset:]
+    else:
+        page = matching.top(offset + limit, keys).to_list()[offset:]
+    end = offset + len(page)
+    return {
+        "total_results": len(matching),
+        "results": page,
+        "sort": sort,
+        "cursor": encode_cursor(result_id, 0),
+        "next_cursor": encode_cursor(result_id, end) if end < len(matching) else None,
+    }
+
+def cursor_page(cursor, sort, limit, min_price, max_price, min_rating):
+    """Serve a page of a stored result set; returns the response data and status."""
+    start_time = time.time()
+    try:
+        result_id, offset = decode_cursor(cursor)
+        result_set, query = get_result_store().load(result_id)
+    except ValueError as e:
+        return {"error": str(e), "results": []}, 400
+    except CursorExpired as e:
+        return {"error": str(e), "results": []}, 410
+    page = result_page(result_id, result_set, sort, limit, offset, min_price, max_price, min_rating)
+    return {"query": query, **page, "execution_time": round(time.time() - start_time, 2)}, 200
+
+def result_quota(limit, min_price, max_price, min_rating):
+    """Build the quota that stops a search once `limit` matching products are found."""
+    if limit is None:
+        return None
+    return ResultQuota(limit, min_price=min_price, max_price=max_price, min_rating=min_rating)
+
+def merge_results(indexed, live):
+    """Add live products to index results, replacing the indexed listings they are fresh copies of."""
+    def key(product):
+        return normalize_name(product['name']), product['site'], listing_key(product)
+
+    live_keys = {key(product): product for product in live}
+    merged = [live_keys.pop(key(product), product) for product in indexed]
+    return merged + list(live_keys.values())
+
+def index_search(query, sites, sort, limit, top_up, timeout, min_price, max_price, min_rating):
+    """Answer a search from the full-text product index; returns the response data and status.
+    
+    With ``top_up`` and fewer than ``limit`` indexed matches (or no limit),
+    the sites are scraped too, stopping once the missing matches are found.
+    """
+    start_time = time.time()
+    scrapers = resolve_scrapers(sites)
+    index_report = {}
+    try:
+        results = search_products(query, [adapter.name for adapter in scrapers], report=index_report)
+    except IndexUnavailable as e:
+        return {"error": str(e), "query": query, "results": []}, 503
+    
+    site_reports = {}
+    schedule = {}
+    errors = []
+    matched = len(ResultSet(results).filter(min_price=min_price, max_price=max_price, min_rating=min_rating))
+    if top_up and (limit is None or matched < limit):
+        try:
+            get_browser_admission().check(timeout)
+            quota = result_quota(limit - matched if limit else None, min_price, max_price, min_rating)
+            live = []
+            for _, site_results in iter_site_results(query, scrapers, reports=site_reports, deadline=Deadline(timeout), schedule=schedule, quota=quota):
+                live.extend(site_results)
+            results = merge_results(results, live)
+            errors = collect_errors(site_reports)
+        except Overloaded as e:
+            errors = [f"Live top-up skipped: {e}"]
+    
+    result_id, result_set = get_result_store().save(results, query)
+    page = result_page(result_id, result_set, sort, limit, 0, min_price, max_price, min_rating)
+    execution_time = time.time() - start_time
+    get_query_log().record(query, execution_time, site_reports)
+    return {
+        "query": query,
+        "source": SOURCE_INDEX,
+        **page,
+        "execution_time": round(execution_time, 4),
+        "index": index_report,
+        "sites": site_reports,
+        "schedule": schedule,
+        "errors": errors if errors else None
+    }, 200
+
+def resolve_scrapers(sites):
+    """Map a comma-separated `sites` parameter to site adapters (all default sites if empty)."""
+    if not sites:
+        return get_site_registry().defaults()
+    return get_site_registry().resolve([s for s in sites.split(',') if s.strip()])
+
+def overloaded_response(query, error):
+    """Build the 429 response returned when scraper capacity is exhausted."""
+    response = JsonResponse({"error": str(error), "query": query, "results": []}, status=429)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
 @api_view(['GET'])
+@renderer_classes([ProductJSONRenderer, BrowsableAPIRenderer])
 def search(request):
     """
     Search for clothing items across multiple e-commerce sites.
@@ -17,96 +179,82 @@ def search(request):
     Query parameters:
     - query: The search term (required)
     - sites: Comma-separated list of sites to search (optional, defaults to all)
-    - timeout: Maximum time to wait for results in seconds (optional, defaults to 60)
+    - timeout: Deadline for the whole search in seconds (optional, defaults to 60).
+      Sites still running at the deadline are cancelled and partial results
+      are returned with a per-site status (ok / timeout / error / skipped).
     - min_rating: Minimum rating filter (optional)
     - min_price: Minimum price filter (optional)
     - max_price: Maximum price filter (optional)
+    - sort: price (default, lowest first), price_desc, rating or discount
+    - limit: Page size (optional, defaults to all results). Also ends the
+      search early: sites read deeper than usual but stop paging and
+      scrolling, and sites not yet started are skipped, once `limit`
+      products matching the filters have been found.
+    - cursor: `cursor` or `next_cursor` of an earlier response. Pages, re-sorts
+      and re-filters the stored results of that search without scraping;
+      `query` is then not needed.
+    - source: live (default) scrapes the sites; index answers from the local
+      full-text index of previously scraped products, sorted by `relevance`
+      unless `sort` is given
+    - top_up: With source=index, also scrape the sites when the index has
+      fewer than `limit` matches (or for every search without a `limit`)
     """
     query = request.GET.get('query', '')
-    if not query:
-        return Response({"error": "Query parameter is required"}, status=400)
-    
     sites = request.GET.get('sites', '')
     timeout = int(request.GET.get('timeout', 60))
     min_rating = float(request.GET.get('min_rating', 0))
     min_price = float(request.GET.get('min_price', 0))
     max_price = float(request.GET.get('max_price', float('inf')))
+    source = request.GET.get('source', SOURCE_LIVE)
+    try:
+        sort, limit, cursor = page_params(request)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    if source not in (SOURCE_LIVE, SOURCE_INDEX):
+        return Response({"error": f"Unknown source '{source}', expected live or index"}, status=400)
+    
+    if cursor:
+        data, status = cursor_page(cursor, sort, limit, min_price, max_price, min_rating)
+        return Response(data, status=status)
+    if not query:
+        return Response({"error": "Query parameter is required"}, status=400)
+    if source == SOURCE_INDEX:
+        if 'sort' not in request.GET:
+            sort = 'relevance'
+        top_up = request.GET.get('top_up', '').lower() in ('1', 'true', 'yes')
+        data, status = index_search(query, sites, sort, limit, top_up, timeout, min_price, max_price, min_rating)
+        return Response(data, status=status)
+    
+    try:
+        get_browser_admission().check(timeout)
+    except Overloaded as e:
+        return overloaded_response(query, e)
     
     try:
         start_time = time.time()
         results = []
-        errors = []
-        
-        # If specific sites are requested
-        if sites:
-            site_list = [s.strip().lower() for s in sites.split(',')]
-            site_functions = {
-                'meesho': scrape_meesho,
-                'nykaa': scrape_nykaa_fashion,
-                'nykaafashion': scrape_nykaa_fashion,
-                'fabindia': scrape_fabindia
-            }
-            
-            with ThreadPoolExecutor(max_workers=len(site_list)) as executor:
-                future_to_site = {
-                    executor.submit(func, query): site
-                    for site, func in site_functions.items()
-                    if site in site_list
-                }
-                
-                for future in future_to_site:
-                    site = future_to_site[future]
-                    try:
-                        site_results = future.result(timeout=timeout)
-                        results.extend(site_results)
-                    except TimeoutError:
-                        errors.append(f"Timeout while scraping {site}")
-                    except Exception as e:
-                        errors.append(f"Error scraping {site}: {str(e)}")
-        else:
-            # Search all sites
-            try:
-                results = scrape_all_sites(query)
-            except Exception as e:
-                errors.append(f"Error in general scraping: {str(e)}")
+        site_reports = {}
+        schedule = {}
         
-        # Filter out products with missing critical data
-        filtered_results = [
-            product for product in results 
-            if product.get('name') != 'N/A' and product.get('price') is not None
-        ]
+        deadline = Deadline(timeout)
         
-        # Apply filters
-        filtered_results = [
-            product for product in filtered_results
-            if (product.get('price', 0) >= min_price and 
-                product.get('price', float('inf')) <= max_price)
-        ]
+        quota = result_quota(limit, min_price, max_price, min_rating)
+        for _, site_results in iter_site_results(query, resolve_scrapers(sites), reports=site_reports, deadline=deadline, schedule=schedule, quota=quota):
+            results.extend(site_results)
+        errors = collect_errors(site_reports)
         
-        # Apply rating filter if specified
-        if min_rating > 0:
-            filtered_results = [
-                product for product in filtered_results
-                if (product.get('rating') and 
-                    product.get('rating') != 'N/A' and
-                    (float(product.get('rating').split('|')[0] if isinstance(product.get('rating'), str) and '|' in product.get('rating')
-                    else product.get('rating').split()[0] if isinstance(product.get('rating'), str)
-                    else product.get('rating', 0)) >= min_rating))
-            ]
-        
-        # Sort by price (lowest first)
-        sorted_results = sorted(
-            filtered_results, 
-            key=lambda x: x.get('price', float('inf')) if x.get('price') is not None else float('inf')
-        )
+        result_id, result_set = get_result_store().save(results, query)
+        page = result_page(result_id, result_set, sort, limit, 0, min_price, max_price, min_rating)
         
         execution_time = time.time() - start_time
+        get_query_log().record(query, execution_time, site_reports)
         
         response_data = {
             "query": query,
-            "total_results": len(sorted_results),
-            "results": sorted_results,
+            **page,
             "execution_time": round(execution_time, 2),
+            "sites": site_reports,
+            "schedule": schedule,
             "errors": errors if errors else None
         }
         
@@ -120,6 +268,301 @@ def search(request):
             "results": []
         }, status=500)
 
+def search_stream(request):
+    """
+    Stream search results as newline-delimited JSON while sites finish.
+    
+    Accepts the same query parameters as `search` except `cursor`; `limit`
+    only ends the search early, every matching product found is streamed.
+    Emits one `{"type": "site", ...}` frame per site as soon as its scraper
+    completes, followed by a single `{"type": "summary", ...}` frame with
+    errors, per-site reports, timing and a `cursor` over the merged results
+    for paging and re-sorting through `search`.
+    """
+    query = request.GET.get('query', '')
+    if not query:
+        return JsonResponse({"error": "Query parameter is required"}, status=400)
+    
+    sites = request.GET.get('sites', '')
+    timeout = int(request.GET.get('timeout', 60))
+    min_rating = float(request.GET.get('min_rating', 0))
+    min_price = float(request.GET.get('min_price', 0))
+    max_price = float(request.GET.get('max_price', float('inf')))
+    try:
+        sort, limit, _ = page_params(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    
+    try:
+        get_browser_admission().check(timeout)
+    except Overloaded as e:
+        return overloaded_response(query, e)
+    
+    scraping_functions = resolve_scrapers(sites)
+    
+    def frames():
+        start_time = time.time()
+        site_reports = {}
+        schedule = {}
+        total_results = 0
+        all_products = []
+        cursor = None
+        errors = []
+        
+        try:
+            deadline = Deadline(timeout)
+            quota = result_quota(limit, min_price, max_price, min_rating)
+            for site, products in iter_site_results(query, scraping_functions, reports=site_reports, deadline=deadline, schedule=schedule, quota=quota):
+                all_products.extend(products)
+                site_results = filter_and_sort_results(products, min_price, max_price, min_rating, sort)
+                total_results += len(site_results)
+                yield ''.join(iter_json({
+                    "type": "site",
+                    "site": site,
+                    "results": site_results,
+                    "report": site_reports[site],
+                    "elapsed": round(time.time() - start_time, 2)
+                })) + "\n"
+            result_id, _ = get_result_store().save(all_products, query)
+            cursor = encode_cursor(result_id, 0)
+        except Exception as e:
+            logger.error(f"Error in search stream: {e}")
+            errors.append(f"An error occurred: {str(e)}")
+        
+        errors = collect_errors(site_reports) + errors
+        execution_time = time.time() - start_time
+        get_query_log().record(query, execution_time, site_reports)
+        yield json.dumps({
+            "type": "summary",
+            "query": query,
+            "total_results": total_results,
+            "cursor": cursor,
+            "execution_time": round(execution_time, 2),
+            "sites": site_reports,
+            "schedule": schedule,
+            "errors": errors if errors else None
+        }) + "\n"
+    
+    response = StreamingHttpResponse(frames(), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering so frames flush immediately
+    return response
+
+async def search_async(request):
+    """
+    Asynchronous variant of `search` for ASGI deployments.
+    
+    Accepts the same query parameters. Sites are fanned out on the event
+    loop with a per-site deadline, while the blocking scrapers run on a
+    bounded shared executor, so a worker is not tied up per search.
+    """
+    query = request.GET.get('query', '')
+    sites = request.GET.get('sites', '')
+    timeout = int(request.GET.get('timeout', 60))
+    min_rating = float(request.GET.get('min_rating', 0))
+    min_price = float(request.GET.get('min_price', 0))
+    max_price = float(request.GET.get('max_price', float('inf')))
+    try:
+        sort, limit, cursor = page_params(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    
+    # The result store's shared tier is a database cache, which can't be used on the event loop
+    if cursor:
+        data, status = await sync_to_async(cursor_page)(cursor, sort, limit, min_price, max_price, min_rating)
+        return json_response(data, status=status)
+    if not query:
+        return JsonResponse({"error": "Query parameter is required"}, status=400)
+    
+    try:
+        get_browser_admission().check(timeout)
+    except Overloaded as e:
+        return overloaded_response(query, e)
+    
+    try:
+        start_time = time.time()
+        site_reports = {}
+        schedule = {}
+        
+        deadline = Deadline(timeout)
+        
+        quota = result_quota(limit, min_price, max_price, min_rating)
+        results = await scrape_sites_async(query, resolve_scrapers(sites), reports=site_reports, deadline=deadline, schedule=schedule, quota=quota)
+        result_id, result_set = await sync_to_async(get_result_store().save)(results, query)
+        page = result_page(result_id, result_set, sort, limit, 0, min_price, max_price, min_rating)
+        errors = collect_errors(site_reports)
+        execution_time = time.time() - start_time
+        get_query_log().record(query, execution_time, site_reports)
+        
+        return json_response({
+            "query": query,
+            **page,
+            "execution_time": round(execution_time, 2),
+            "sites": site_reports,
+            "schedule": schedule,
+            "errors": errors if errors else None
+        })
+        
+    except Exception as e:
+        logger.error(f"Error in async search API: {e}")
+        return JsonResponse({
+            "error": f"An error occurred: {str(e)}",
+            "query": query,
+            "results": []
+        }, status=500)
+
+def job_params(values):
+    """Validate the search parameters of a job submission, raising ValueError if invalid."""
+    max_price = values.get('max_price')
+    return {
+        "sites": values.get('sites', ''),
+        "timeout": int(values.get('timeout', 60)),
+        "min_price": float(values.get('min_price', 0)),
+        "max_price": None if max_price in (None, '') else float(max_price),
+        "min_rating": float(values.get('min_rating', 0)),
+        "sort": sort_param(values.get('sort', DEFAULT_SORT)),
+        "limit": limit_param(values.get('limit')),
+    }
+
+def job_data(job):
+    """Describe a search job: its status and per-site progress, plus its first page of results once done."""
+    data = {
+        "job_id": str(job.pk),
+        "status": job.status,
+        "query": job.query,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "sites": job_sites(job),
+        "errors": job.errors,
+    }
+    if job.status == SearchJob.DONE:
+        params = job.params
+        result_set = ResultSet([Product(**product) for product in job.results])
+        page = result_page(job.result_id, result_set, params['sort'], params['limit'], 0, **job_filters(params))
+        data.update(page, execution_time=job.execution_time)
+    return data
+
+@api_view(['POST'])
+@renderer_classes([ProductJSONRenderer, BrowsableAPIRenderer])
+def submit_search_job(request):
+    """
+    Queue a search for the scraper workers (`python manage.py scraper_worker`).
+    
+    Takes the parameters of `search` (except `cursor` and `source`), in the
+    query string or the request body, and answers 202 with the job's id and
+    the URLs to poll (`status_url`) or stream (`stream_url`) it. The search
+    runs on a worker's browsers, not this web process's. 429 when too many
+    jobs are already queued.
+    """
+    body = request.data.dict() if hasattr(request.data, 'dict') else dict(request.data)
+    values = {**request.GET.dict(), **body}
+    query = values.get('query', '')
+    if not query:
+        return Response({"error": "Query parameter is required"}, status=400)
+    try:
+        params = job_params(values)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    try:
+        job = get_job_queue().submit(query, params)
+    except QueueFull as e:
+        response = Response({"error": str(e), "query": query}, status=429)
+        response['Retry-After'] = str(get_job_queue().lease_seconds)
+        return response
+    
+    # Relative to this endpoint, so the URLs keep its /api/ prefix
+    status_url = request.build_absolute_uri(f"{job.pk}/")
+    response = Response({
+        "job_id": str(job.pk),
+        "status": job.status,
+        "query": query,
+        "status_url": status_url,
+        "stream_url": f"{status_url}stream/",
+    }, status=202)
+    response['Location'] = status_url
+    return response
+
+@api_view(['GET'])
+@renderer_classes([ProductJSONRenderer, BrowsableAPIRenderer])
+def search_job(request, job_id):
+    """
+    Poll a search job: `status` is queued, running, done or failed, with
+    per-site reports as sites finish, each with its `task` status and the
+    `node` that ran it. Once done, the response carries the first page of
+    results and cursors, like a `search` response.
+    """
+    try:
+        job = SearchJob.objects.get(pk=job_id)
+    except SearchJob.DoesNotExist:
+        return Response({"error": "Unknown job"}, status=404)
+    return Response(job_data(job))
+
+def search_job_stream(request, job_id):
+    """
+    Stream a search job's progress as newline-delimited JSON.
+    
+    Emits a `{"type": "status", ...}` frame whenever the job's status or
+    site reports change, then a final `{"type": "job", ...}` frame with the
+    job as `search_job` returns it, once it is done or failed (or when
+    SCRAPER_JOB_STREAM_SECONDS pass first).
+    """
+    if not SearchJob.objects.filter(pk=job_id).exists():
+        return JsonResponse({"error": "Unknown job"}, status=404)
+    poll_seconds = getattr(settings, 'SCRAPER_JOB_STREAM_POLL_SECONDS', 0.5)
+    stream_seconds = getattr(settings, 'SCRAPER_JOB_STREAM_SECONDS', 300)
+    
+    def frames():
+        started = time.monotonic()
+        last = None
+        while True:
+            job = SearchJob.objects.get(pk=job_id)
+            if job.status in (SearchJob.DONE, SearchJob.FAILED) or time.monotonic() - started >= stream_seconds:
+                break
+            state = (job.status, job_sites(job))
+            if state != last:
+                last = state
+                yield json.dumps({"type": "status", "job_id": str(job.pk), "status": job.status, "sites": state[1]}) + "\n"
+            time.sleep(poll_seconds)
+        yield ''.join(iter_json({"type": "job", **job_data(job)})) + "\n"
+    
+    response = StreamingHttpResponse(frames(), content_type='application/x-ndjson')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def scraper_nodes(request):
+    """List the scraper worker nodes: heartbeat, site shard, load, counters and recent throughput."""
+    return JsonResponse({"nodes": node_stats(get_job_queue().lease_seconds)})
+
+def prewarm_stats(request):
+    """Report searches, cache and pre-warm hit rates and the browser time pre-warming spent over the last `days`."""
+    try:
+        days = max(1, int(request.GET.get('days', DEFAULT_WINDOW_DAYS)))
+    except ValueError:
+        return JsonResponse({"error": "days must be an integer"}, status=400)
+    return JsonResponse(prewarm_report(days))
+
+def scraper_stats(request):
+    """Report the state of the scraping subsystems in this worker process."""
+    pool = get_driver_pool(create=False)
+    return JsonResponse({
+        "driver_pool": pool.stats() if pool is not None else None,
+        "admission": get_browser_admission().stats(),
+        "result_cache": get_result_cache().stats(),
+        "coalescing": get_single_flight().stats(),
+        "site_health": get_site_health().stats(),
+        "retry_budget": get_retry_budget().stats(),
+        "site_durations": get_duration_estimator().stats(),
+        "page_loads": get_page_load_stats().stats(),
+        "parse_pool": get_parse_pool().stats(),
+        "result_store": get_result_store().stats(),
+        "catalog": get_catalog().stats(),
+        "job_queue": get_job_queue().stats(),
+        "query_log": get_query_log().stats(),
+    })
+
 def home_view(request):
     return JsonResponse({
         "message": "Welcome to the Clothing API",
@@ -134,6 +577,12 @@ def index(request):
         "message": "Welcome to the Clothing API",
         "available_endpoints": {
             "search": "/api/search/",
+            "search_stream": "/api/search/stream/",
+            "search_async": "/api/search/async/",
+            "jobs": "/api/jobs/",
+            "nodes": "/api/nodes/",
+            "prewarm": "/api/prewarm/",
+            "stats": "/api/stats/",
             "documentation": "Use /api/search/?query=your_search_term to search for clothing items"
         }
     })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -85,10 +86,28 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Several scraper workers may write at once; wait for the lock instead of failing
+        'OPTIONS': {'timeout': 20},
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared tier of the scraper result cache; create the table with
+    # `python manage.py createcachetable`
+    'scraper': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'scraper_result_cache',
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -129,3 +148,119 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Scraper settings
+
+# Headless browser pool shared by all scrapers in this process
+SCRAPER_POOL_SIZE = 5  # Maximum number of live browsers
+SCRAPER_POOL_PRELAUNCH = 2  # Browsers started ahead of the first search
+SCRAPER_POOL_MAX_PAGES_PER_DRIVER = 50  # Recycle a browser after this many scrapes
+SCRAPER_POOL_CHECKOUT_TIMEOUT = 60  # Seconds to wait for a free browser
+# Browser jobs from all requests queue by priority for SCRAPER_POOL_SIZE slots;
+# searches whose expected queue wait exceeds their timeout get a 429
+SCRAPER_ADMISSION_JOB_SECONDS = 20  # Initial estimate of one browser job's duration
+
+# Sites are declared in scraper/sites.py. Their knobs (wait_timeout,
+# card_limit, max_cards and max_pages (depth read for searches with a limit),
+# max_scrolls, concurrency, tier ('http' tries plain HTTP before a browser),
+# prior_seconds, default) can be overridden per site, e.g.
+#   {'flipkart': {'tier': 'selenium', 'card_limit': 20}}
+SCRAPER_SITE_OVERRIDES = {}
+
+# Search result cache: an in-process LRU in front of the shared CACHES alias
+SCRAPER_CACHE_ALIAS = 'scraper'
+SCRAPER_CACHE_LOCAL_MAX_BYTES = 32 * 1024 * 1024
+SCRAPER_CACHE_TTL = 600  # Seconds a result is served as fresh
+SCRAPER_CACHE_SITE_TTLS = {  # Per-site overrides for fast-moving catalogs
+    'amazon': 300,
+    'flipkart': 300,
+    'google_shopping': 300,
+}
+SCRAPER_CACHE_STALE_TTL = 1800  # Seconds an expired result is served while it refreshes
+
+# Merged search results are kept (locally and in the shared cache alias) so
+# `cursor` requests can page, re-sort and re-filter them without scraping
+SCRAPER_CURSOR_TTL = 900  # Seconds a cursor stays valid
+SCRAPER_CURSOR_LOCAL_MAX_BYTES = 16 * 1024 * 1024
+
+# Every scrape is ingested into the product catalog (scraper.models) by a
+# background writer; run `python manage.py migrate` to create its tables.
+# A site scraped for the same query within SCRAPER_CATALOG_TTL seconds is
+# answered from the catalog instead of being scraped again.
+SCRAPER_CATALOG_TTL = 600
+SCRAPER_CATALOG_QUEUE_SIZE = 1000  # Scrape results waiting for ingestion before new ones are dropped
+SCRAPER_CATALOG_BATCH_PRODUCTS = 2000  # Products written per ingestion transaction
+SCRAPER_CATALOG_FLUSH_SECONDS = 2.0  # Longest a result waits for its batch to fill
+
+# Catalog offers are full-text indexed (FTS5 on SQLite, tsvector + GIN on
+# PostgreSQL) for `source=index` searches
+SCRAPER_INDEX_MAX_RESULTS = 200  # Best-ranked offers an index search returns
+SCRAPER_INDEX_MAX_AGE = 7 * 24 * 3600  # Offers not scraped for this many seconds drop out of searches
+
+# Searches submitted to /api/jobs/ are queued in the database as one task per
+# site and run by `python manage.py scraper_worker` nodes with their own
+# browsers. Sites are sharded over the live nodes; an idle node steals tasks
+# that waited SCRAPER_WORKER_STEAL_AFTER seconds for their own node.
+SCRAPER_JOB_LEASE_SECONDS = 30  # Nodes renew task leases and heartbeats every third of this; silent nodes lose their sites
+SCRAPER_JOB_MAX_ATTEMPTS = 3  # Workers that may take a site task (after earlier ones died) before it fails
+SCRAPER_JOB_MAX_QUEUED = 1000  # Queued jobs beyond which submissions are refused with 429
+SCRAPER_JOB_STREAM_SECONDS = 300  # Longest a job stream follows an unfinished job
+SCRAPER_WORKER_CONCURRENCY = 2  # Site tasks a worker runs at once
+SCRAPER_WORKER_POOL_SIZE = 5  # Live browsers per worker, replacing SCRAPER_POOL_SIZE there
+SCRAPER_WORKER_POLL_SECONDS = 1.0  # Idle wait between queue polls
+SCRAPER_WORKER_STEAL_AFTER = 2.0  # Seconds a task waits for its site's node before idle nodes may take it
+
+# Every search is counted per normalized query and day (scraper.query_log),
+# with its latency and each site's cache hits. `python manage.py prewarm --loop`
+# refreshes each site's SCRAPER_PREWARM_TOP_QUERIES most searched queries
+# before their cached results expire, at background priority.
+SCRAPER_QUERY_LOG_FLUSH_SECONDS = 10.0  # Longest a search's counts wait in memory before they are written
+SCRAPER_PREWARM_TOP_QUERIES = 20
+SCRAPER_PREWARM_WINDOW_DAYS = 7  # Days of searches popularity is counted over
+SCRAPER_PREWARM_LEAD_SECONDS = 120  # Refresh results expiring within this many seconds
+SCRAPER_PREWARM_INTERVAL = 60  # Seconds between scheduler passes
+SCRAPER_PREWARM_BROWSERS = 1  # Browsers (and refreshes at once) of the pre-warm process
+SCRAPER_PREWARM_BROWSER_MINUTES = 5.0  # Browser time a pass may spend; the rest waits for the next pass
+
+# Threads that run blocking scrapers for the async search endpoint, shared by
+# all in-flight async searches in the process
+SCRAPER_ASYNC_MAX_WORKERS = 16
+
+# Identical in-flight scrapes are coalesced across threads and, through file
+# locks in this directory, across worker processes on the same host
+SCRAPER_COALESCE_LOCK_DIR = BASE_DIR / '.scrape-locks'
+SCRAPER_COALESCE_PROCESS_WAIT = 120  # Seconds to wait on another process's scrape
+
+# A site that fails SCRAPER_CIRCUIT_FAILURE_THRESHOLD scrapes in a row is
+# skipped for SCRAPER_CIRCUIT_COOLDOWN seconds, then probed with one scrape
+SCRAPER_CIRCUIT_FAILURE_THRESHOLD = 3
+SCRAPER_CIRCUIT_COOLDOWN = 60
+# Page waits follow each site's recent p95 scrape latency times this factor,
+# never below the floor (seconds) nor above the scraper's own timeout
+SCRAPER_ADAPTIVE_TIMEOUT_FACTOR = 1.5
+SCRAPER_ADAPTIVE_TIMEOUT_FLOOR = 5
+# Retries across all sites are capped at this fraction of recent scrape
+# attempts, plus a small allowance, so an outage cannot multiply load
+SCRAPER_RETRY_BUDGET_RATIO = 0.2
+SCRAPER_RETRY_BUDGET_MIN = 3
+
+# Lightweight browser profile: pages load eagerly (at DOMContentLoaded) and
+# images, fonts, stylesheets, media and tracker domains are blocked. The
+# default block lists live in scraper/browser_profile.py; per-site rules can
+# allow patterns back or block extra ones, e.g.
+#   {'myntra': {'allow': ['*.css'], 'block': ['*recommendations*']}}
+SCRAPER_LIGHT_PROFILE = True
+SCRAPER_SITE_RESOURCE_RULES = {}
+# Share of browser scrapes loaded without blocking, as the baseline for the
+# per-profile page weight and load time reported by /api/stats/
+SCRAPER_PROFILE_BASELINE_RATE = 0.05
+
+# How browser scrapes read products: 'js' runs a per-site extractor in the
+# page and returns only product fields, 'soup' parses the full page source
+# with BeautifulSoup, 'compare' runs both and logs differences
+SCRAPER_EXTRACTION_MODE = 'js'
+
+# Worker processes that parse fetched page source off the web process's GIL;
+# 0 parses in the scraping thread instead
+SCRAPER_PARSE_WORKERS = min(4, os.cpu_count() or 1)
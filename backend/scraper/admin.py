@@ -1,3 +1,56 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import (
+    CatalogProduct, Offer, PrewarmRun, ScrapeRun, SearchJob, SearchQuery, SiteTask, WorkerNode
+)
+
+
+@admin.register(CatalogProduct)
+class CatalogProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'material', 'last_seen')
+    search_fields = ('normalized_name',)
+
+
+@admin.register(Offer)
+class OfferAdmin(admin.ModelAdmin):
+    list_display = ('product', 'site', 'price', 'rating_value', 'scraped_at')
+    list_filter = ('site',)
+    raw_id_fields = ('product',)
+
+
+@admin.register(ScrapeRun)
+class ScrapeRunAdmin(admin.ModelAdmin):
+    list_display = ('site', 'query', 'tier', 'product_count', 'exhausted', 'finished_at')
+    list_filter = ('site', 'tier')
+
+
+@admin.register(SearchJob)
+class SearchJobAdmin(admin.ModelAdmin):
+    list_display = ('query', 'status', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    exclude = ('results',)
+
+
+@admin.register(SiteTask)
+class SiteTaskAdmin(admin.ModelAdmin):
+    list_display = ('job', 'site', 'status', 'worker', 'stolen', 'attempts', 'product_count', 'finished_at')
+    list_filter = ('status', 'site', 'stolen')
+    raw_id_fields = ('job',)
+    exclude = ('results',)
+
+
+@admin.register(WorkerNode)
+class WorkerNodeAdmin(admin.ModelAdmin):
+    list_display = ('name', 'host', 'last_heartbeat', 'running', 'tasks_done', 'tasks_stolen', 'products')
+
+
+@admin.register(SearchQuery)
+class SearchQueryAdmin(admin.ModelAdmin):
+    list_display = ('query', 'day', 'searches', 'seconds', 'max_seconds')
+    list_filter = ('day',)
+    search_fields = ('query',)
+
+
+@admin.register(PrewarmRun)
+class PrewarmRunAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'planned', 'refreshed', 'failed', 'skipped', 'browser_seconds')
@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Lower values are admitted first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 10
+
+DEFAULT_CAPACITY = 5  # Browsers in use at once across the process
+DEFAULT_JOB_SECONDS = 20.0  # Initial estimate of how long a browser is held
+EWMA_ALPHA = 0.2  # Weight of the latest hold time in the moving average
+
+_context = threading.local()
+
+
+class Overloaded(Exception):
+    """Raised when a browser job would wait longer than its caller can afford."""
+
+    def __init__(self, retry_after, message=None):
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        super().__init__(message or f"Scraper capacity exhausted, retry after {self.retry_after}s")
+
+
+@contextmanager
+def scrape_priority(priority):
+    """Run browser jobs started by this thread at ``priority``."""
+    previous = getattr(_context, 'priority', PRIORITY_INTERACTIVE)
+    _context.priority = priority
+    try:
+        yield
+    finally:
+        _context.priority = previous
+
+
+def current_priority():
+    return getattr(_context, 'priority', PRIORITY_INTERACTIVE)
+
+
+class BrowserAdmission:
+    """Process-wide admission control for browser jobs.
+
+    At most ``capacity`` jobs hold a browser at once, whichever request they
+    belong to. Waiting jobs are admitted by priority, then arrival order, and
+    a job whose expected queue wait exceeds its timeout is rejected with
+    ``Overloaded`` instead of being queued.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, job_seconds=DEFAULT_JOB_SECONDS):
+        self.capacity = max(1, capacity)
+        self._avg_job_seconds = job_seconds
+        self._in_use = 0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {'admitted': 0, 'rejected': 0, 'timed_out': 0}
+
+    def estimate_wait(self, priority=PRIORITY_INTERACTIVE):
+        """Seconds a new job at ``priority`` would expect to queue."""
+        with self._cond:
+            return self._estimate_wait(priority)
+
+    def check(self, timeout, priority=PRIORITY_INTERACTIVE):
+        """Raise ``Overloaded`` if a new job could not be admitted within ``timeout``."""
+        wait = self.estimate_wait(priority)
+        if wait > timeout:
+            with self._cond:
+                self._stats['rejected'] += 1
+            raise Overloaded(wait)
+
+    def acquire(self, priority=None, timeout=None):
+        """Block until a browser slot is granted; returns the admission time."""
+        if priority is None:
+            priority = current_priority()
+
+        with self._cond:
+            expected = self._estimate_wait(priority)
+            if timeout is not None and expected > timeout:
+                self._stats['rejected'] += 1
+                raise Overloaded(expected)
+
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._waiters, entry)
+            give_up_at = time.monotonic() + timeout if timeout is not None else None
+            try:
+                while not (self._in_use < self.capacity and self._waiters[0] == entry):
+                    remaining = give_up_at - time.monotonic() if give_up_at is not None else None
+                    if remaining is not None and remaining <= 0:
+                        self._stats['timed_out'] += 1
+                        raise Overloaded(self._estimate_wait(priority), "Timed out waiting for a browser")
+                    self._cond.wait(remaining)
+                heapq.heappop(self._waiters)
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                self._cond.notify_all()
+                raise
+
+            self._in_use += 1
+            self._stats['admitted'] += 1
+            self._cond.notify_all()
+            return time.monotonic()
+
+    def release(self, admitted_at):
+        """Give back a slot taken by ``acquire`` and update the hold-time estimate."""
+        held = time.monotonic() - admitted_at
+        with self._cond:
+            self._in_use -= 1
+            self._avg_job_seconds += EWMA_ALPHA * (held - self._avg_job_seconds)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority=None, timeout=None):
+        admitted_at = self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(admitted_at)
+
+    def available(self):
+        """Browser slots free right now, ignoring jobs already queued for them."""
+        with self._cond:
+            return max(0, self.capacity - self._in_use - len(self._waiters))
+
+    def stats(self):
+        with self._cond:
+            return {
+                'capacity': self.capacity,
+                'in_use': self._in_use,
+                'queued': len(self._waiters),
+                'queued_background': sum(1 for priority, _ in self._waiters if priority >= PRIORITY_BACKGROUND),
+                'avg_job_seconds': round(self._avg_job_seconds, 2),
+                'estimated_wait': round(self._estimate_wait(PRIORITY_INTERACTIVE), 2),
+                **self._stats,
+            }
+
+    def _estimate_wait(self, priority):
+        ahead = sum(1 for waiting_priority, _ in self._waiters if waiting_priority <= priority)
+        free = self.capacity - self._in_use
+        if ahead < free:
+            return 0.0
+        # Jobs drain `capacity` at a time, each wave taking about one average hold
+        waves = (ahead - free) // self.capacity + 1
+        return waves * self._avg_job_seconds
+
+
+_admission = None
+_admission_lock = threading.Lock()
+
+
+def get_browser_admission(capacity=None):
+    """Return the process-wide browser admission controller.
+
+    ``capacity`` replaces SCRAPER_POOL_SIZE when this call creates it.
+    """
+    global _admission
+    with _admission_lock:
+        if _admission is None:
+            _admission = BrowserAdmission(
+                capacity=capacity if capacity is not None else getattr(settings, 'SCRAPER_POOL_SIZE', DEFAULT_CAPACITY),
+                job_seconds=getattr(settings, 'SCRAPER_ADMISSION_JOB_SECONDS', DEFAULT_JOB_SECONDS),
+            )
+        return _admission
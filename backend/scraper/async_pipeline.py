@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .admission import Overloaded
+from .deadline import STATUS_SKIPPED, STATUS_TIMEOUT
+from .health import CircuitOpen
+from .scheduler import plan_schedule, worker_count
+from .utils import expected_duration, new_site_report, record_failure, scrape_site, site_depth, site_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 16  # Threads available to blocking scrapers across all async searches
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_blocking_executor():
+    """Return the bounded executor that runs blocking scrapers for async searches."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'SCRAPER_ASYNC_MAX_WORKERS', DEFAULT_MAX_WORKERS),
+                thread_name_prefix='async-scrape'
+            )
+        return _executor
+
+
+async def scrape_site_async(scrape_func, query, report=None, deadline=None, quota=None):
+    """Run one blocking scraper on the shared executor, bounded by ``deadline``."""
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(
+        get_blocking_executor(),
+        lambda: scrape_site(scrape_func, query, report=report, deadline=deadline, quota=quota)
+    )
+    return await asyncio.wait_for(future, deadline.remaining() if deadline is not None else None)
+
+
+def _plan_sites(query, funcs, quota=None):
+    """Plan the dispatch order of ``funcs`` (site key to scraper), as ``iter_site_results`` does."""
+    # Browsers, not executor threads, bound how many sites progress at once
+    return plan_schedule(
+        {site: expected_duration(site, query, site_depth(funcs[site])) for site in funcs},
+        max(1, sum(worker_count(list(funcs.values()), len(funcs)))),
+        shortest_first=quota is not None
+    )
+
+
+async def scrape_sites_async(query, scraping_functions, reports=None, deadline=None, schedule=None, quota=None):
+    """Fan out scrapers concurrently and return the merged products.
+
+    Sites are handed to the shared executor longest-expected first; the plan
+    and measured makespan are written to ``schedule`` if it is a dict.
+    A site that misses ``deadline``, or fails, contributes no products and
+    gets a ``timeout``/``error`` status in its report while the remaining
+    sites are still collected. Scrapes still running at the deadline are
+    cancelled so their browsers are released. A result ``quota`` is shared
+    by the sites as in ``iter_site_results``.
+    """
+    if reports is None:
+        reports = {}
+    if schedule is None:
+        schedule = {}
+
+    async def _run(func):
+        key = site_key(func)
+        report = reports[key]
+        try:
+            products = await scrape_site_async(func, query, report=report, deadline=deadline, quota=quota)
+        except asyncio.TimeoutError:
+            report['status'] = STATUS_TIMEOUT
+            report['error'] = "Deadline exceeded"
+            return []
+        except (Overloaded, CircuitOpen) as e:
+            report['status'] = STATUS_SKIPPED
+            report['error'] = str(e)
+            return []
+        except Exception as e:
+            logger.error(f"Error scraping {key}: {str(e)}")
+            record_failure(report, e, deadline)
+            return []
+        report['results'] = len(products)
+        logger.info(f"Completed scraping {func.__name__} - found {len(products)} products")
+        return products
+
+    funcs = {}
+    for func in scraping_functions:
+        if site_key(func) not in reports:
+            reports[site_key(func)] = new_site_report()
+            funcs[site_key(func)] = func
+    # Expected durations look up the shared result cache, which blocks
+    loop = asyncio.get_running_loop()
+    schedule.update(await loop.run_in_executor(get_blocking_executor(), lambda: _plan_sites(query, funcs, quota)))
+
+    started = time.monotonic()
+    all_products = []
+    for products in await asyncio.gather(*(_run(funcs[site]) for site in schedule['order'])):
+        all_products.extend(products)
+    schedule['actual_makespan'] = round(time.monotonic() - started, 2)
+
+    if deadline is not None and deadline.expired():
+        # Abort scrapes still holding browsers instead of letting them run on
+        deadline.cancel()
+    return all_products
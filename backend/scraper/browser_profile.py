@@ -0,0 +1,180 @@
+import json
+import logging
+import random
+import threading
+import time
+
+from django.conf import settings
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.webdriver.support.ui import WebDriverWait
+
+from .deadline import bounded
+
+logger = logging.getLogger(__name__)
+
+# Profiles reported per page load
+PROFILE_LIGHT = 'light'
+PROFILE_FULL = 'full'
+
+DEFAULT_BASELINE_RATE = 0.05  # Share of scrapes loaded unblocked, to keep measuring the saving
+BASELINE_LOAD_TIMEOUT = 30  # Longest a baseline load waits for the load event, in seconds
+
+# Resource types scrapers never read: only card markup and img[src]
+# attributes are parsed, so images need not be downloaded
+DEFAULT_BLOCKED_RESOURCES = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3',
+    '*.css',
+]
+
+# Analytics, advertising and session-replay hosts loaded by the storefronts
+DEFAULT_BLOCKED_DOMAINS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*googleadservices.com*', '*connect.facebook.net*',
+    '*hotjar.com*', '*clarity.ms*', '*criteo.com*', '*criteo.net*', '*branch.io*',
+    '*moengage.com*', '*webengage.com*', '*nr-data.net*', '*newrelic.com*',
+    '*segment.io*', '*mixpanel.com*', '*scorecardresearch.com*', '*taboola.com*',
+]
+
+
+def light_profile_enabled():
+    return getattr(settings, 'SCRAPER_LIGHT_PROFILE', True)
+
+
+def blocked_urls(site):
+    """Return the URL patterns blocked while scraping ``site``.
+
+    Per-site rules in ``SCRAPER_SITE_RESOURCE_RULES`` can ``allow`` default
+    patterns back (e.g. ``'*.css'`` for a site whose lazy loading needs
+    layout) and ``block`` extra ones.
+    """
+    rules = getattr(settings, 'SCRAPER_SITE_RESOURCE_RULES', {}).get(site, {})
+    allowed = set(rules.get('allow', []))
+    patterns = (
+        getattr(settings, 'SCRAPER_BLOCKED_RESOURCES', DEFAULT_BLOCKED_RESOURCES)
+        + getattr(settings, 'SCRAPER_BLOCKED_DOMAINS', DEFAULT_BLOCKED_DOMAINS)
+        + list(rules.get('block', []))
+    )
+    return [pattern for pattern in patterns if pattern not in allowed]
+
+
+def configure_options(options):
+    """Add the light profile's launch options to Chrome ``options``."""
+    # Performance logs carry the network events used to measure page weight
+    options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+    if light_profile_enabled():
+        # Return from get() at DOMContentLoaded instead of waiting for every subresource;
+        # baseline loads wait for the load event themselves (see load_page)
+        options.page_load_strategy = 'eager'
+
+
+def load_page(driver, url, site, report=None, deadline=None):
+    """Navigate ``driver`` to ``url`` under ``site``'s resource profile.
+
+    Blocked URL patterns are applied through the DevTools protocol, so the
+    browser never requests them. A small share of loads (set by
+    ``SCRAPER_PROFILE_BASELINE_RATE``) run unblocked as a baseline; as the
+    browser returns early under the light profile's eager strategy, these
+    wait for the load event so they measure a normal full load. Bytes
+    transferred, requests blocked and load time are written to ``report``
+    under ``page`` and aggregated per profile for ``/api/stats/``.
+    """
+    profile = PROFILE_FULL
+    if light_profile_enabled() and random.random() >= getattr(settings, 'SCRAPER_PROFILE_BASELINE_RATE', DEFAULT_BASELINE_RATE):
+        profile = PROFILE_LIGHT
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_urls(site) if profile == PROFILE_LIGHT else []})
+    except WebDriverException as e:
+        logger.warning(f"Could not apply the {profile} browser profile for {site}: {e}")
+        profile = PROFILE_FULL
+    _drain_network_log(driver)
+
+    started = time.monotonic()
+    driver.get(url)
+    if profile == PROFILE_FULL:
+        _wait_for_load(driver, site, bounded(deadline, BASELINE_LOAD_TIMEOUT))
+    load_seconds = time.monotonic() - started
+
+    transferred, requests, blocked = _network_totals(_drain_network_log(driver))
+    page = {
+        'profile': profile,
+        'bytes': transferred,
+        'requests': requests,
+        'blocked': blocked,
+        'load_seconds': round(load_seconds, 2),
+    }
+    if report is not None:
+        report['page'] = page
+    get_page_load_stats().record(page)
+    return page
+
+
+def _wait_for_load(driver, site, timeout):
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(
+            lambda driver: driver.execute_script('return document.readyState') == 'complete'
+        )
+    except TimeoutException:
+        logger.debug(f"Baseline load of {site} did not finish within {timeout:.1f}s")
+
+
+def _drain_network_log(driver):
+    try:
+        return driver.get_log('performance')
+    except Exception:
+        # Logging not enabled on this driver; page weight is then unknown
+        return []
+
+
+def _network_totals(entries):
+    transferred = requests = blocked = 0
+    for entry in entries:
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, TypeError, ValueError):
+            continue
+        method = message.get('method')
+        if method == 'Network.loadingFinished':
+            transferred += int(message['params'].get('encodedDataLength', 0))
+            requests += 1
+        elif method == 'Network.loadingFailed' and message['params'].get('blockedReason'):
+            blocked += 1
+    return transferred, requests, blocked
+
+
+class PageLoadStats:
+    """Page weight and load time aggregated per browser profile."""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, page):
+        with self._lock:
+            totals = self._totals.setdefault(page['profile'], {'pages': 0, 'bytes': 0, 'blocked': 0, 'seconds': 0.0})
+            totals['pages'] += 1
+            totals['bytes'] += page['bytes']
+            totals['blocked'] += page['blocked']
+            totals['seconds'] += page['load_seconds']
+
+    def stats(self):
+        with self._lock:
+            return {
+                profile: {
+                    'pages': totals['pages'],
+                    'avg_bytes': int(totals['bytes'] / totals['pages']),
+                    'avg_blocked': round(totals['blocked'] / totals['pages'], 1),
+                    'avg_load_seconds': round(totals['seconds'] / totals['pages'], 2),
+                }
+                for profile, totals in self._totals.items()
+            }
+
+
+_page_load_stats = PageLoadStats()
+
+
+def get_page_load_stats():
+    """Return the process-wide page load statistics."""
+    return _page_load_stats
@@ -0,0 +1,313 @@
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+
+from .admission import PRIORITY_BACKGROUND, scrape_priority
+from .coalesce import ROLE_LEADER, get_single_flight
+from .deadline import STATUS_TIMEOUT, DeadlineExceeded
+from .records import render_json
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable from Django settings
+DEFAULT_CACHE_ALIAS = 'scraper'
+DEFAULT_LOCAL_MAX_BYTES = 32 * 1024 * 1024  # Memory bound of the in-process tier
+DEFAULT_TTL = 600  # seconds a result is served as fresh
+DEFAULT_STALE_TTL = 1800  # seconds past expiry a result may be served while refreshing
+REFRESH_WORKERS = 2  # Background refreshes running at once
+
+CACHE_HIT = 'hit'
+CACHE_STALE = 'stale'
+CACHE_MISS = 'miss'
+
+
+class _CutShort(Exception):
+    """A coalesced scrape ended by its leader's deadline; the outcome is the leader's alone."""
+
+    def __init__(self, products=None, error=None):
+        super().__init__("Scrape cut short by its caller's deadline")
+        self.products = products
+        self.error = error
+
+
+def normalize_query(query):
+    """Normalize a search query so equivalent spellings share a cache entry."""
+    return ' '.join(query.lower().split())
+
+
+class _LocalLRU:
+    """A thread-safe LRU map bounded by the approximate size of its values."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def set(self, key, entry, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (entry, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+
+
+class ResultCache:
+    """Two-tier cache of scraped products keyed by (site, normalized query).
+
+    Lookups check the in-process LRU first and then the shared Django cache,
+    which is also re-read once a local copy is past its TTL, so every worker
+    benefits from a scrape or pre-warm done by any other. Entries older
+    than the site's TTL but inside the stale window are served immediately
+    while a background refresh replaces them. Entries stored by a pre-warm
+    ``refresh`` are marked, so hits on them are reported as ``prewarmed``.
+    """
+
+    def __init__(self, alias=DEFAULT_CACHE_ALIAS, local_max_bytes=DEFAULT_LOCAL_MAX_BYTES,
+                 ttl=DEFAULT_TTL, site_ttls=None, stale_ttl=DEFAULT_STALE_TTL):
+        self.alias = alias
+        self.ttl = ttl
+        self.site_ttls = site_ttls or {}
+        self.stale_ttl = stale_ttl
+        self._local = _LocalLRU(local_max_bytes)
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='cache-refresh')
+
+    def ttl_for(self, site):
+        return self.site_ttls.get(site, self.ttl)
+
+    def get_or_scrape(self, site, query, fetch, report=None, deadline=None, depth=None, read_depth=None,
+                      refresh_fetch=None):
+        """Return cached products for (site, query), scraping on a miss.
+
+        ``fetch`` is called with a report dict and a deadline (None for
+        background refreshes) and must return a product list. Background
+        refreshes of stale entries call ``refresh_fetch`` instead when given.
+        Hit, miss and age details are written to ``report`` when given.
+
+        ``depth`` is how many products the caller needs at least. An entry
+        holding fewer is a miss, unless the scrape that stored it found the
+        site had no more; a deeper entry is returned whole. ``read_depth`` is
+        how many products a scrape on a miss reads, ``depth`` by default;
+        only scrapes reading as deep are shared between callers.
+        """
+        key = self._key(site, query)
+        entry, source = self._lookup(key, site)
+        now = time.time()
+
+        if entry is not None and self._deep_enough(entry, depth):
+            age = now - entry['stored_at']
+            ttl = self.ttl_for(site)
+            if age <= ttl:
+                self._report(report, CACHE_HIT, age, source, entry)
+                return list(entry['products'])
+            if age <= ttl + self.stale_ttl:
+                self._report(report, CACHE_STALE, age, source, entry)
+                self._schedule_refresh(key, site, refresh_fetch or fetch)
+                return list(entry['products'])
+
+        self._report(report, CACHE_MISS, None, None)
+        fetch_report = report if report is not None else {}
+
+        def _fetch_and_store():
+            try:
+                products = fetch(fetch_report, deadline)
+            except DeadlineExceeded as e:
+                raise _CutShort(error=e)
+            exhausted = self._exhausted(fetch_report)
+            self._store(key, site, products, exhausted)
+            if deadline is not None and deadline.expired() and fetch_report.get('status') == STATUS_TIMEOUT:
+                raise _CutShort(products)
+            return {'products': products, 'exhausted': exhausted}
+
+        # Identical misses in flight (in this or another local process) share one
+        # scrape. Followers with time left scrape again rather than share a
+        # failure caused by the leader's shorter deadline, and so do followers
+        # needing more products than a scrape cut short by its search's limit found.
+        if read_depth is None:
+            read_depth = depth
+        try:
+            shared, role = get_single_flight().do(
+                f"{key}:{read_depth}", _fetch_and_store,
+                lookup=lambda: self._fresh_shared(key, site, depth),
+                timeout=deadline.remaining() if deadline is not None else None,
+                private_errors=(_CutShort,),
+                accept=lambda shared: self._deep_enough(shared, depth)
+            )
+        except TimeoutError:
+            raise DeadlineExceeded(f"Deadline passed waiting for an in-flight scrape of {site}")
+        except _CutShort as e:
+            if e.error is not None:
+                raise e.error
+            shared, role = {'products': e.products}, ROLE_LEADER
+        fetch_report['coalesced'] = role
+        return list(shared['products'])
+
+    def refresh(self, site, query, fetch, report=None, deadline=None):
+        """Scrape (site, query) now and store the results as pre-warmed, whatever is cached."""
+        fetch_report = report if report is not None else {}
+        products = fetch(fetch_report, deadline)
+        self._store(self._key(site, query), site, products, self._exhausted(fetch_report), prewarmed=True)
+        return products
+
+    def expires_in(self, site, query):
+        """Seconds until the cached results of (site, query) stop being fresh (negative once past), None if none."""
+        key = self._key(site, query)
+        try:
+            entry = caches[self.alias].get(key)
+        except Exception as e:
+            logger.warning(f"Shared result cache unavailable: {e}")
+            entry = None
+        if entry is None:
+            entry = self._local.get(key)
+        if entry is None:
+            return None
+        return entry['stored_at'] + self.ttl_for(site) - time.time()
+
+    def is_cached(self, site, query, depth=None):
+        """Return True if (site, query) would be answered without scraping."""
+        entry, _ = self._lookup(self._key(site, query), site)
+        return (entry is not None and self._deep_enough(entry, depth)
+                and time.time() - entry['stored_at'] <= self.ttl_for(site) + self.stale_ttl)
+
+    def stats(self):
+        with self._refresh_lock:
+            refreshing = len(self._refreshing)
+        return {'local': self._local.stats(), 'refreshing': refreshing}
+
+    def _key(self, site, query):
+        digest = hashlib.sha1(normalize_query(query).encode('utf-8')).hexdigest()
+        return f"results:{site}:{digest}"
+
+    def _lookup(self, key, site):
+        # A local copy past its TTL may have been replaced in the shared tier
+        # by another process (e.g. a pre-warm), so re-read before serving it stale
+        local = self._local.get(key)
+        if local is not None and time.time() - local['stored_at'] <= self.ttl_for(site):
+            return local, 'local'
+        try:
+            entry = caches[self.alias].get(key)
+        except Exception as e:
+            logger.warning(f"Shared result cache unavailable: {e}")
+            entry = None
+        if entry is None or (local is not None and entry['stored_at'] <= local['stored_at']):
+            return (local, 'local') if local is not None else (None, None)
+        self._local.set(key, entry, self._size(entry))
+        return entry, 'shared'
+
+    def _fresh_shared(self, key, site, depth=None):
+        """Return the entry stored by another process within the TTL, if any."""
+        try:
+            entry = caches[self.alias].get(key)
+        except Exception as e:
+            logger.warning(f"Shared result cache unavailable: {e}")
+            return None
+        if entry is None or time.time() - entry['stored_at'] > self.ttl_for(site) or not self._deep_enough(entry, depth):
+            return None
+        self._local.set(key, entry, self._size(entry))
+        return entry
+
+    def _store(self, key, site, products, exhausted=True, prewarmed=False):
+        # Empty results usually mean the site failed; don't pin that in the cache
+        if not products:
+            return
+        entry = {'products': products, 'stored_at': time.time(), 'exhausted': exhausted, 'prewarmed': prewarmed}
+        self._local.set(key, entry, self._size(entry))
+        try:
+            caches[self.alias].set(key, entry, timeout=self.ttl_for(site) + self.stale_ttl)
+        except Exception as e:
+            logger.warning(f"Error writing shared result cache: {e}")
+
+    def _schedule_refresh(self, key, site, fetch):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def _refresh():
+            # Refresh threads read the database cache and the catalog outside any request cycle
+            close_old_connections()
+            try:
+                # Refreshes queue behind interactive scrapes for browsers
+                with scrape_priority(PRIORITY_BACKGROUND):
+                    fetch_report = {}
+                    products = fetch(fetch_report, None)
+                    self._store(key, site, products, self._exhausted(fetch_report))
+            except Exception as e:
+                logger.error(f"Error refreshing cached results for {site}: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+                close_old_connections()
+
+        self._refresh_executor.submit(_refresh)
+
+    @staticmethod
+    def _deep_enough(entry, depth):
+        # Entries stored before depths were tracked count as complete
+        return depth is None or len(entry['products']) >= depth or entry.get('exhausted', True)
+
+    @staticmethod
+    def _exhausted(fetch_report):
+        """Whether the scrape behind ``fetch_report`` read every product the site had."""
+        depth = fetch_report.get('depth')
+        return depth is None or depth['exhausted']
+
+    @staticmethod
+    def _size(entry):
+        return len(render_json(entry['products']))
+
+    @staticmethod
+    def _report(report, status, age, source, entry=None):
+        if report is None:
+            return
+        report['cache'] = status
+        report['cache_age'] = round(age, 1) if age is not None else None
+        report['cache_tier'] = source
+        if entry is not None:
+            report['prewarmed'] = entry.get('prewarmed', False)
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Return the process-wide result cache, creating it on first use."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                alias=getattr(settings, 'SCRAPER_CACHE_ALIAS', DEFAULT_CACHE_ALIAS),
+                local_max_bytes=getattr(settings, 'SCRAPER_CACHE_LOCAL_MAX_BYTES', DEFAULT_LOCAL_MAX_BYTES),
+                ttl=getattr(settings, 'SCRAPER_CACHE_TTL', DEFAULT_TTL),
+                site_ttls=getattr(settings, 'SCRAPER_CACHE_SITE_TTLS', {}),
+                stale_ttl=getattr(settings, 'SCRAPER_CACHE_STALE_TTL', DEFAULT_STALE_TTL),
+            )
+        return _result_cache
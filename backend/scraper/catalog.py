@@ -0,0 +1,400 @@
+import atexit
+import csv
+import hashlib
+import io
+import logging
+import queue
+import re
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .cache import normalize_query
+from .models import CatalogProduct, Offer, RunResult, ScrapeRun
+from .records import Product
+from .search_index import update_index
+
+logger = logging.getLogger(__name__)
+
+TIER_CATALOG = 'catalog'  # Fetch tier reported for sites answered from catalog rows
+
+# Defaults, overridable from Django settings
+DEFAULT_CATALOG_TTL = 600  # Seconds a scrape run answers the same search instead of a new scrape
+DEFAULT_QUEUE_SIZE = 1000  # Scrape results waiting for ingestion before new ones are dropped
+DEFAULT_BATCH_PRODUCTS = 2000  # Products written in one ingestion transaction
+DEFAULT_FLUSH_SECONDS = 2.0  # Longest a scrape result waits for its batch to fill
+QUERY_CHUNK = 500  # Rows per INSERT and values per IN (...) lookup, within SQLite's variable limit
+
+# Offer columns refreshed when a site lists a known product again
+OFFER_FIELDS = ('price', 'price_display', 'mrp', 'image', 'rating', 'rating_value', 'review_count', 'scraped_at')
+
+# Columns of the COPY staging table, in the order rows are written, and those that may be NULL
+STAGING_COLUMNS = (
+    'run_id', 'position', 'normalized_name', 'name', 'material', 'site', 'listing', 'price', 'price_display', 'mrp', 'image',
+    'rating', 'rating_value', 'review_count',
+)
+STAGING_NULLABLE = ('price', 'mrp', 'rating_value', 'review_count')
+
+IngestJob = namedtuple('IngestJob', 'site query products found tier exhausted finished_at')
+
+_STOP = object()
+
+
+def normalize_name(name):
+    """Key a product name so listings differing only in case, spacing or punctuation match.
+
+    Names with no word characters at all keep their punctuation rather than
+    all sharing the empty key.
+    """
+    key = ' '.join(re.sub(r'\W+', ' ', name.lower()).split())
+    return (key or ' '.join(name.lower().split()))[:255]
+
+
+def listing_key(product):
+    """Key one listing among a site's listings of a product: by its image, or its price if it has none.
+
+    A site can list several cards under one name (e.g. one per seller); each
+    is kept as its own offer, and a card repriced since the last scrape is
+    still recognized by its image.
+    """
+    image = product.get('image')
+    identity = image if image not in (None, 'N/A') else f"price:{product.get('price_display')}"
+    return hashlib.sha1(identity.encode('utf-8')).hexdigest()
+
+
+def _chunks(values, size=QUERY_CHUNK):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def write_batch(jobs):
+    """Write a batch of scrape results to the catalog in one transaction.
+
+    Each job becomes a scrape run; its products are upserted by normalized
+    name, their offers by (product, site, listing), and the run's results link the
+    two in the order the site returned them. PostgreSQL loads the batch
+    with COPY and upserts it set-wise; other backends use bulk upserts.
+    The upserted offers are re-indexed for full-text search.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        runs = ScrapeRun.objects.bulk_create([
+            ScrapeRun(site=job.site, query=job.query, tier=job.tier or '', product_count=job.found,
+                      exhausted=job.exhausted, finished_at=job.finished_at)
+            for job in jobs
+        ])
+        rows = [
+            (run.pk, position, normalize_name(product.get('name')), listing_key(product), product)
+            for run, job in zip(runs, jobs)
+            for position, product in enumerate(job.products)
+        ]
+        if connection.vendor == 'postgresql':
+            offer_ids = _copy_rows(rows, now)
+        else:
+            offer_ids = _upsert_rows(rows, now)
+        update_index(offer_ids)
+    return len(rows)
+
+
+def _upsert_rows(rows, now):
+    products = {}
+    for _, _, key, _, product in rows:
+        products[key] = CatalogProduct(normalized_name=key, name=product.get('name')[:500],
+                                       material=product.get('material') or 'N/A', first_seen=now, last_seen=now)
+    CatalogProduct.objects.bulk_create(
+        products.values(), batch_size=QUERY_CHUNK,
+        update_conflicts=True, unique_fields=['normalized_name'], update_fields=['name', 'material', 'last_seen']
+    )
+    product_ids = {}
+    for chunk in _chunks(list(products)):
+        product_ids.update(CatalogProduct.objects.filter(normalized_name__in=chunk).values_list('normalized_name', 'id'))
+
+    offers = {}
+    for _, _, key, listing, product in rows:
+        product_id = product_ids[key]
+        offers[product_id, product.get('site'), listing] = Offer(
+            product_id=product_id,
+            site=product.get('site'),
+            listing=listing,
+            price=product.get('price'),
+            price_display=product.get('price_display'),
+            mrp=product.get('mrp'),
+            image=product.get('image'),
+            rating=product.get('rating'),
+            rating_value=product.get('rating_value'),
+            review_count=product.get('review_count'),
+            scraped_at=now,
+        )
+    Offer.objects.bulk_create(
+        offers.values(), batch_size=QUERY_CHUNK,
+        update_conflicts=True, unique_fields=['product', 'site', 'listing'], update_fields=OFFER_FIELDS
+    )
+    offer_ids = {}
+    for chunk in _chunks(list({product_id for product_id, _, _ in offers})):
+        offer_rows = Offer.objects.filter(product_id__in=chunk).values_list('id', 'product_id', 'site', 'listing')
+        for offer_id, product_id, site, listing in offer_rows:
+            offer_ids[product_id, site, listing] = offer_id
+
+    RunResult.objects.bulk_create([
+        RunResult(run_id=run_id, offer_id=offer_ids[product_ids[key], product.get('site'), listing], position=position)
+        for run_id, position, key, listing, product in rows
+    ], batch_size=QUERY_CHUNK)
+    return [offer_ids[key] for key in offers]
+
+
+def _staging_csv(rows):
+    """Write rows as CSV for COPY into the staging table.
+
+    Strings are quoted and so are the empty fields written for None; the
+    COPY reads those as NULL in the ``STAGING_NULLABLE`` columns (FORCE_NULL).
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for run_id, position, key, listing, product in rows:
+        writer.writerow([
+            run_id, position, key, product.get('name')[:500], product.get('material') or 'N/A', product.get('site'),
+            listing, product.get('price'), product.get('price_display'), product.get('mrp'), product.get('image'),
+            product.get('rating'), product.get('rating_value'), product.get('review_count'),
+        ])
+    buffer.seek(0)
+    return buffer
+
+
+def _copy_rows(rows, now):
+    """Load rows into a staging table with COPY, then upsert them with three statements.
+
+    Returns the ids of the upserted offers.
+    """
+    buffer = _staging_csv(rows)
+
+    products = CatalogProduct._meta.db_table
+    offers = Offer._meta.db_table
+    results = RunResult._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            CREATE TEMP TABLE catalog_staging (
+                run_id bigint, position integer, normalized_name text, name text, material text, site text,
+                listing text, price double precision, price_display text, mrp double precision, image text,
+                rating text, rating_value double precision, review_count integer
+            ) ON COMMIT DROP
+        """)
+        cursor.copy_expert(
+            f"COPY catalog_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN "
+            f"WITH (FORMAT csv, FORCE_NULL ({', '.join(STAGING_NULLABLE)}))",
+            buffer
+        )
+        cursor.execute(f"""
+            INSERT INTO {products} (normalized_name, name, material, first_seen, last_seen)
+            SELECT DISTINCT ON (normalized_name) normalized_name, name, material, %s, %s
+            FROM catalog_staging
+            ORDER BY normalized_name, run_id DESC, position
+            ON CONFLICT (normalized_name) DO UPDATE
+            SET name = EXCLUDED.name, material = EXCLUDED.material, last_seen = EXCLUDED.last_seen
+        """, [now, now])
+        cursor.execute(f"""
+            INSERT INTO {offers} (product_id, site, listing, {', '.join(OFFER_FIELDS)})
+            SELECT DISTINCT ON (p.id, s.site, s.listing) p.id, s.site, s.listing, s.price, s.price_display, s.mrp, s.image,
+                   s.rating, s.rating_value, s.review_count, %s
+            FROM catalog_staging s JOIN {products} p ON p.normalized_name = s.normalized_name
+            ORDER BY p.id, s.site, s.listing, s.run_id DESC, s.position
+            ON CONFLICT (product_id, site, listing) DO UPDATE
+            SET {', '.join(f'{field} = EXCLUDED.{field}' for field in OFFER_FIELDS)}
+            RETURNING id
+        """, [now])
+        offer_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(f"""
+            INSERT INTO {results} (run_id, offer_id, position)
+            SELECT s.run_id, o.id, s.position
+            FROM catalog_staging s
+            JOIN {products} p ON p.normalized_name = s.normalized_name
+            JOIN {offers} o ON o.product_id = p.id AND o.site = s.site AND o.listing = s.listing
+        """)
+    return offer_ids
+
+
+class CatalogWriter:
+    """Background thread that ingests scrape results into the catalog in batches.
+
+    ``submit`` only enqueues, so scrapes never wait on the database; when
+    the queue is full the result is dropped and counted rather than
+    blocking. Results are written once ``batch_products`` products have
+    queued up or ``flush_seconds`` after the first one, whichever is sooner.
+    """
+
+    def __init__(self, queue_size=DEFAULT_QUEUE_SIZE, batch_products=DEFAULT_BATCH_PRODUCTS,
+                 flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.batch_products = batch_products
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {'runs': 0, 'products': 0, 'batches': 0, 'dropped': 0, 'errors': 0, 'last_batch_seconds': None}
+
+    def submit(self, job):
+        self._start()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            logger.warning(f"Catalog ingestion queue is full, dropping {job.site} results for {job.query}")
+
+    def close(self, timeout=5):
+        """Write what is queued and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {'queued': self._queue.qsize(), **self._stats}
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='catalog-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        stop = False
+        while not stop:
+            job = self._queue.get()
+            if job is _STOP:
+                return
+            batch = [job]
+            size = len(job.products)
+            flush_at = time.monotonic() + self.flush_seconds
+            while size < self.batch_products:
+                try:
+                    job = self._queue.get(timeout=max(0, flush_at - time.monotonic()))
+                except queue.Empty:
+                    break
+                if job is _STOP:
+                    stop = True
+                    break
+                batch.append(job)
+                size += len(job.products)
+            self._write(batch)
+
+    def _write(self, batch):
+        close_old_connections()
+        started = time.monotonic()
+        try:
+            written = write_batch(batch)
+        except Exception as e:
+            logger.error(f"Error writing {len(batch)} scrape results to the catalog: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+            return
+        elapsed = time.monotonic() - started
+        logger.debug(f"Ingested {written} products from {len(batch)} scrapes in {elapsed:.3f}s")
+        with self._lock:
+            self._stats['runs'] += len(batch)
+            self._stats['products'] += written
+            self._stats['batches'] += 1
+            self._stats['last_batch_seconds'] = round(elapsed, 3)
+
+
+class Catalog:
+    """Durable store of every scraped product, its offers and the runs that found them.
+
+    Scrapes hand their results to the background writer. A site scraped
+    for the same query within ``ttl`` seconds, by any worker, is answered
+    from that run's rows instead of being scraped again.
+    """
+
+    def __init__(self, ttl=DEFAULT_CATALOG_TTL, writer=None):
+        self.ttl = ttl
+        self.writer = writer or CatalogWriter()
+
+    def ingest(self, site, query, products, report=None):
+        """Queue a scrape's products for ingestion; products without a name are not kept."""
+        report = report or {}
+        kept = [product for product in products if product.get('name') not in (None, 'N/A')]
+        if not kept:
+            return
+        depth = report.get('depth')
+        self.writer.submit(IngestJob(
+            site=site,
+            query=normalize_query(query)[:255],
+            products=kept,
+            found=len(products),
+            tier=report.get('tier'),
+            exhausted=depth is None or depth['exhausted'],
+            finished_at=timezone.now(),
+        ))
+
+    def lookup(self, site, query, depth=None, report=None):
+        """Return the products of ``site``'s fresh run for ``query``, or None if there is none.
+
+        As with cached results, a run that read fewer than ``depth`` cards
+        only counts if the site had no more.
+        """
+        try:
+            run = (ScrapeRun.objects
+                   .filter(site=site, query=normalize_query(query)[:255],
+                           finished_at__gte=timezone.now() - timedelta(seconds=self.ttl))
+                   .order_by('-finished_at')
+                   .first())
+            if run is None or not (depth is None or run.product_count >= depth or run.exhausted):
+                return None
+            results = run.results.order_by('position').select_related('offer__product')
+            products = [offer_record(result.offer) for result in results]
+        except DatabaseError as e:
+            logger.warning(f"Catalog unavailable: {e}")
+            return None
+        if report is not None:
+            report['tier'] = TIER_CATALOG
+            report['catalog_age'] = round((timezone.now() - run.finished_at).total_seconds(), 1)
+        return products
+
+    def stats(self):
+        return {'ttl': self.ttl, 'writer': self.writer.stats()}
+
+
+def offer_record(offer):
+    """Build the product record served for a catalog offer."""
+    return Product(
+        name=offer.product.name,
+        price=offer.price,
+        price_display=offer.price_display,
+        image=offer.image,
+        material=offer.product.material,
+        rating=offer.rating,
+        rating_value=offer.rating_value,
+        review_count=offer.review_count,
+        site=offer.site,
+        mrp=offer.mrp
+    )
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """Return the process-wide catalog, creating it on first use."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = Catalog(
+                ttl=getattr(settings, 'SCRAPER_CATALOG_TTL', DEFAULT_CATALOG_TTL),
+                writer=CatalogWriter(
+                    queue_size=getattr(settings, 'SCRAPER_CATALOG_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+                    batch_products=getattr(settings, 'SCRAPER_CATALOG_BATCH_PRODUCTS', DEFAULT_BATCH_PRODUCTS),
+                    flush_seconds=getattr(settings, 'SCRAPER_CATALOG_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS),
+                ),
+            )
+            atexit.register(_catalog.writer.close)
+        return _catalog
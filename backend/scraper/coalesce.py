@@ -0,0 +1,222 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; coalescing is then per process only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LOCK_DIR = os.path.join(tempfile.gettempdir(), 'shopsphere-scrape-locks')
+DEFAULT_PROCESS_WAIT = 120  # seconds a process waits on another process's scrape
+LOCK_POLL_INTERVAL = 0.05  # seconds
+
+# Role of a caller in a coalesced scrape, reported per site
+ROLE_LEADER = 'leader'
+ROLE_FOLLOWER = 'follower'
+ROLE_PROCESS_FOLLOWER = 'process_follower'
+
+
+class _Call:
+    """An in-flight call that followers in the same process wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one execution.
+
+    Threads in the same process asking for the same key while a call is in
+    flight wait for it and share its result. Across processes on one host the
+    leader also holds an exclusive lock on a file per key, removed when the
+    call finishes; a process that finds the lock taken waits for it and then
+    asks ``lookup`` for the result the other process stored (e.g. in the
+    shared cache) before doing the work itself.
+    """
+
+    def __init__(self, lock_dir=DEFAULT_LOCK_DIR, process_wait=DEFAULT_PROCESS_WAIT):
+        self.lock_dir = lock_dir
+        self.process_wait = process_wait
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'leaders': 0, 'followers': 0, 'process_followers': 0}
+        if fcntl is not None:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn, lookup=None, timeout=None, private_errors=(), accept=None):
+        """Return ``(result, role)`` for ``key``, running ``fn`` only if no one else is.
+
+        Waiting on another caller's work is bounded by ``timeout`` seconds,
+        after which ``TimeoutError`` is raised. Errors of the
+        ``private_errors`` types are the leader's alone, as are results that
+        ``accept`` rejects: followers call again instead of sharing them,
+        within what is left of their timeout.
+        """
+        give_up_at = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    call.followers += 1
+                    self._stats['followers'] += 1
+            if leader:
+                break
+
+            if not call.done.wait(self._remaining(give_up_at)):
+                raise TimeoutError(f"Timed out waiting for in-flight call {key}")
+            if isinstance(call.error, private_errors):
+                continue
+            if call.error is not None:
+                raise call.error
+            if accept is not None and not accept(call.result):
+                continue
+            return call.result, ROLE_FOLLOWER
+
+        try:
+            call.result, role = self._run_leader(key, fn, lookup, self._remaining(give_up_at))
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+        if call.followers:
+            logger.info(f"Coalesced {call.followers} identical requests for {key}")
+        return call.result, role
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        followers = stats['followers'] + stats['process_followers']
+        stats['followers_per_leader'] = round(followers / stats['leaders'], 2) if stats['leaders'] else 0.0
+        return stats
+
+    @staticmethod
+    def _remaining(give_up_at):
+        return max(0.0, give_up_at - time.monotonic()) if give_up_at is not None else None
+
+    def _run_leader(self, key, fn, lookup, timeout):
+        if fcntl is None:
+            return self._lead(fn)
+
+        path = os.path.join(self.lock_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.lock')
+        fd, waited = self._lock_file(path, timeout)
+        try:
+            if waited:
+                # Another process was scraping the same key; use its result if it stored one
+                result = lookup() if lookup is not None else None
+                if result is not None:
+                    with self._lock:
+                        self._stats['process_followers'] += 1
+                    return result, ROLE_PROCESS_FOLLOWER
+            return self._lead(fn)
+        finally:
+            if fd is not None:
+                self._unlock_file(fd, path)
+
+    def _lead(self, fn):
+        with self._lock:
+            self._stats['leaders'] += 1
+        return fn(), ROLE_LEADER
+
+    def _lock_file(self, path, timeout=None):
+        """Lock the file at ``path``, waiting while another process holds it.
+
+        Returns the locked descriptor, or None if waiting was given up, and
+        whether another process held the lock first.
+        """
+        wait = self.process_wait if timeout is None else min(timeout, self.process_wait)
+        give_up_at = time.monotonic() + wait
+        waited = False
+        while True:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                locked = self._try_lock(fd)
+                if not locked:
+                    waited = True
+                    locked = self._wait_for_lock(fd, give_up_at)
+            except BaseException:
+                os.close(fd)
+                raise
+            if not locked:
+                os.close(fd)
+                if timeout is not None and wait == timeout:
+                    raise TimeoutError("Timed out waiting for another process's scrape")
+                logger.warning(f"Gave up waiting {self.process_wait}s for another process's scrape")
+                return None, waited
+            if self._is_current(fd, path):
+                return fd, waited
+            # The holder removed the file when it finished; lock whichever file is at the path now
+            os.close(fd)
+
+    @staticmethod
+    def _unlock_file(fd, path):
+        # Lock files are removed while still locked, so every key's file only
+        # exists while it is in flight; see _is_current for the other side
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        finally:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _is_current(fd, path):
+        """Whether the locked ``fd`` is still the file at ``path``, not one removed after it was opened."""
+        try:
+            linked = os.stat(path)
+        except FileNotFoundError:
+            return False
+        opened = os.fstat(fd)
+        return (opened.st_dev, opened.st_ino) == (linked.st_dev, linked.st_ino)
+
+    @staticmethod
+    def _try_lock(fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _wait_for_lock(self, fd, give_up_at):
+        while time.monotonic() < give_up_at:
+            time.sleep(LOCK_POLL_INTERVAL)
+            if self._try_lock(fd):
+                return True
+        return False
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """Return the process-wide single-flight group, creating it on first use."""
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight(
+                lock_dir=getattr(settings, 'SCRAPER_COALESCE_LOCK_DIR', DEFAULT_LOCK_DIR),
+                process_wait=getattr(settings, 'SCRAPER_COALESCE_PROCESS_WAIT', DEFAULT_PROCESS_WAIT),
+            )
+        return _single_flight
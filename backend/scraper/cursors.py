@@ -0,0 +1,114 @@
+import base64
+import logging
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .cache import DEFAULT_CACHE_ALIAS, _LocalLRU
+from .results import ResultSet
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CURSOR_TTL = 900  # Seconds a merged result set stays pageable
+DEFAULT_LOCAL_MAX_BYTES = 16 * 1024 * 1024  # Memory bound of the in-process tier
+APPROX_PRODUCT_BYTES = 600  # Rough in-memory size of one product record, for the LRU bound
+
+RESULT_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+
+class CursorExpired(Exception):
+    """The result set a cursor points at is no longer stored."""
+
+
+def encode_cursor(result_id, offset):
+    """Build the opaque cursor for row ``offset`` of a stored result set."""
+    return base64.urlsafe_b64encode(f"{result_id}:{offset}".encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(result_id, offset)`` from a cursor; raises ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('ascii')
+        result_id, offset = raw.split(':')
+        offset = int(offset)
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+    if not RESULT_ID_PATTERN.fullmatch(result_id) or offset < 0:
+        raise ValueError("Invalid cursor")
+    return result_id, offset
+
+
+class ResultStore:
+    """Merged search results kept server-side so cursors can page and re-sort them.
+
+    A stored set lives in the in-process LRU as a ResultSet, its columns
+    built once, and in the shared Django cache so a cursor issued by one
+    worker can be served by any other.
+    """
+
+    def __init__(self, alias=DEFAULT_CACHE_ALIAS, ttl=DEFAULT_CURSOR_TTL, local_max_bytes=DEFAULT_LOCAL_MAX_BYTES):
+        self.alias = alias
+        self.ttl = ttl
+        self._local = _LocalLRU(local_max_bytes)
+
+    def save(self, products, query):
+        """Store a merged result set; returns its id and ResultSet."""
+        result_id = uuid.uuid4().hex
+        entry = {'products': list(products), 'query': query, 'expires_at': time.time() + self.ttl}
+        result_set = ResultSet(entry['products'])
+        self._local.set(result_id, (result_set, entry), self._size(entry))
+        try:
+            caches[self.alias].set(self._key(result_id), entry, timeout=self.ttl)
+        except Exception as e:
+            logger.warning(f"Error writing shared result store: {e}")
+        return result_id, result_set
+
+    def load(self, result_id):
+        """Return ``(result_set, query)`` of a stored set; raises CursorExpired if gone."""
+        item = self._local.get(result_id)
+        if item is None:
+            try:
+                entry = caches[self.alias].get(self._key(result_id))
+            except Exception as e:
+                logger.warning(f"Shared result store unavailable: {e}")
+                entry = None
+            if entry is None:
+                raise CursorExpired("Cursor has expired; repeat the search")
+            item = (ResultSet(entry['products']), entry)
+            self._local.set(result_id, item, self._size(entry))
+        result_set, entry = item
+        if entry['expires_at'] < time.time():
+            raise CursorExpired("Cursor has expired; repeat the search")
+        return result_set, entry['query']
+
+    def stats(self):
+        return {'ttl': self.ttl, 'local': self._local.stats()}
+
+    @staticmethod
+    def _key(result_id):
+        return f"resultset:{result_id}"
+
+    @staticmethod
+    def _size(entry):
+        return len(entry['products']) * APPROX_PRODUCT_BYTES
+
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store():
+    """Return the process-wide result store, creating it on first use."""
+    global _result_store
+    with _result_store_lock:
+        if _result_store is None:
+            _result_store = ResultStore(
+                alias=getattr(settings, 'SCRAPER_CACHE_ALIAS', DEFAULT_CACHE_ALIAS),
+                ttl=getattr(settings, 'SCRAPER_CURSOR_TTL', DEFAULT_CURSOR_TTL),
+                local_max_bytes=getattr(settings, 'SCRAPER_CURSOR_LOCAL_MAX_BYTES', DEFAULT_LOCAL_MAX_BYTES),
+            )
+        return _result_store
@@ -0,0 +1,99 @@
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per-site outcome reported in the search response
+STATUS_OK = 'ok'
+STATUS_TIMEOUT = 'timeout'
+STATUS_ERROR = 'error'
+STATUS_SKIPPED = 'skipped'
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work continues past its deadline or after it was cancelled."""
+
+
+class Deadline:
+    """A point in time by which a search, and every scrape it started, must finish.
+
+    The deadline is passed from the view down to the scrapers, which use
+    ``timeout()`` to bound their waits and ``check()`` between steps. When the
+    caller gives up it calls ``cancel()``, which also runs the registered
+    callbacks so in-flight browser work is aborted instead of left running.
+    """
+
+    def __init__(self, seconds):
+        self.expires_at = time.monotonic() + seconds
+        self._cancelled = False
+        self._callbacks = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """Seconds left, never negative; zero once cancelled."""
+        if self._cancelled:
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self._cancelled or time.monotonic() >= self.expires_at
+
+    def timeout(self, cap):
+        """Return ``cap`` seconds or the time left, whichever is smaller."""
+        return min(cap, self.remaining())
+
+    def check(self):
+        """Raise ``DeadlineExceeded`` if the deadline has passed."""
+        if self.expired():
+            raise DeadlineExceeded("Deadline exceeded")
+
+    def sleep(self, seconds):
+        """Sleep for ``seconds`` unless the deadline comes first."""
+        self.check()
+        time.sleep(self.timeout(seconds))
+        self.check()
+
+    def add_cancel_callback(self, callback):
+        """Register ``callback`` to run on ``cancel()``; returns a handle for removal."""
+        with self._lock:
+            if not self._cancelled:
+                handle = next(self._ids)
+                self._callbacks[handle] = callback
+                return handle
+        # Already cancelled: abort straight away
+        callback()
+        return None
+
+    def remove_cancel_callback(self, handle):
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+    def cancel(self):
+        """Expire the deadline now and abort the work registered against it."""
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Error running deadline cancel callback: {e}")
+
+
+def bounded(deadline, cap):
+    """Return ``cap`` bounded by ``deadline`` if one is given."""
+    return deadline.timeout(cap) if deadline is not None else cap
+
+
+def pause(deadline, seconds):
+    """Sleep for ``seconds``, cut short by ``deadline`` if one is given."""
+    if deadline is not None:
+        deadline.sleep(seconds)
+    else:
+        time.sleep(seconds)
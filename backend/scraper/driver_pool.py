@@ -0,0 +1,276 @@
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable from Django settings
+DEFAULT_POOL_SIZE = 5  # Maximum number of live browsers in the pool
+DEFAULT_POOL_PRELAUNCH = 2  # Browsers launched ahead of the first request
+DEFAULT_MAX_PAGES_PER_DRIVER = 50  # Recycle a browser after this many scrapes
+DEFAULT_CHECKOUT_TIMEOUT = 60  # seconds
+
+
+class DriverPoolTimeout(Exception):
+    """Raised when no browser becomes available within the checkout timeout."""
+
+
+class WebDriverLaunchError(Exception):
+    """Raised when the pool cannot start a new browser."""
+
+
+class _PooledDriver:
+    """Bookkeeping for one browser owned by the pool."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.created_at = time.time()
+        self.admitted_at = None
+        self.aborted = False
+
+
+class DriverPool:
+    """A bounded pool of reusable headless browsers.
+
+    Browsers are checked out for a single scrape and checked back in
+    afterwards. On check-in the browser is reset (cookies and storage
+    cleared) and parked for the next caller; it is recycled once it has
+    served ``max_pages`` scrapes or if it no longer responds.
+    """
+
+    def __init__(self, factory, size=DEFAULT_POOL_SIZE, max_pages=DEFAULT_MAX_PAGES_PER_DRIVER,
+                 checkout_timeout=DEFAULT_CHECKOUT_TIMEOUT, admission=None):
+        self.factory = factory
+        self.admission = admission
+        self.size = size
+        self.max_pages = max_pages
+        self.checkout_timeout = checkout_timeout
+        self._idle = deque()
+        self._leased = {}
+        self._live = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {'launched': 0, 'recycled': 0, 'crashed': 0, 'aborted': 0, 'checkouts': 0, 'reuses': 0}
+
+    def prelaunch(self, count):
+        """Launch up to ``count`` idle browsers in a background thread."""
+        def _launch():
+            for _ in range(count):
+                with self._cond:
+                    if self._closed or self._live >= self.size or len(self._idle) >= count:
+                        return
+                    self._live += 1
+                pooled = self._launch()
+                if pooled is None:
+                    return
+                with self._cond:
+                    self._idle.append(pooled)
+                    self._cond.notify()
+
+        threading.Thread(target=_launch, name='driver-pool-prelaunch', daemon=True).start()
+
+    def checkout(self, timeout=None):
+        """Borrow a browser, launching a new one if the pool has room.
+
+        When the pool has an admission controller, the caller first queues
+        there by priority and may be rejected with ``Overloaded``. The
+        admission wait and the pool wait share the one ``timeout``.
+        """
+        if timeout is None:
+            timeout = self.checkout_timeout
+        deadline = time.monotonic() + timeout
+
+        admitted_at = self.admission.acquire(timeout=timeout) if self.admission is not None else None
+        try:
+            pooled = self._checkout(deadline, timeout)
+        except BaseException:
+            if admitted_at is not None:
+                self.admission.release(admitted_at)
+            raise
+
+        pooled.admitted_at = admitted_at
+        with self._cond:
+            self._leased[id(pooled.driver)] = pooled
+        return pooled.driver
+
+    def _checkout(self, deadline, timeout):
+        while True:
+            with self._cond:
+                pooled = None
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Driver pool is closed")
+                    if self._idle:
+                        pooled = self._idle.popleft()
+                        break
+                    if self._live < self.size:
+                        self._live += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DriverPoolTimeout(f"No browser available after {timeout}s")
+                    self._cond.wait(remaining)
+                self._stats['checkouts'] += 1
+
+            if pooled is None:
+                pooled = self._launch()
+                if pooled is None:
+                    raise WebDriverLaunchError("Failed to launch browser")
+            elif not self._is_alive(pooled):
+                self._discard(pooled, crashed=True)
+                continue
+            else:
+                with self._cond:
+                    self._stats['reuses'] += 1
+            return pooled
+
+    def checkin(self, driver, discard=False):
+        """Return a browser to the pool, resetting or recycling it."""
+        with self._cond:
+            pooled = self._leased.pop(id(driver), None)
+        if pooled is None:
+            logger.warning("Ignoring check-in of a browser that is not leased from the pool")
+            return
+
+        if pooled.admitted_at is not None:
+            self.admission.release(pooled.admitted_at)
+            pooled.admitted_at = None
+        pooled.pages += 1
+        if discard or pooled.aborted or self._closed:
+            self._discard(pooled, crashed=discard)
+            return
+        if pooled.pages >= self.max_pages:
+            logger.info(f"Recycling browser after {pooled.pages} pages")
+            self._discard(pooled)
+            return
+        if not self._reset(pooled):
+            self._discard(pooled, crashed=True)
+            return
+
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def abort(self, driver):
+        """Quit a leased browser from another thread so its blocked scrape fails fast.
+
+        The browser is discarded rather than reused when it is checked in.
+        """
+        with self._cond:
+            pooled = self._leased.get(id(driver))
+            if pooled is None or pooled.aborted:
+                return
+            pooled.aborted = True
+            self._stats['aborted'] += 1
+        logger.info("Aborting browser of a cancelled scrape")
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting aborted browser: {e}")
+
+    def stats(self):
+        """Return a snapshot of pool occupancy and lifetime counters."""
+        with self._cond:
+            return {
+                'size': self.size,
+                'live': self._live,
+                'idle': len(self._idle),
+                'leased': len(self._leased),
+                **self._stats,
+            }
+
+    def close(self):
+        """Quit every idle browser and refuse further checkouts."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for pooled in idle:
+            self._discard(pooled)
+
+    def _launch(self):
+        try:
+            pooled = _PooledDriver(self.factory())
+        except Exception as e:
+            logger.error(f"Error launching browser: {e}")
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            return None
+        with self._cond:
+            self._stats['launched'] += 1
+        return pooled
+
+    def _discard(self, pooled, crashed=False):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting browser: {e}")
+        with self._cond:
+            self._live -= 1
+            self._stats['crashed' if crashed else 'recycled'] += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _is_alive(pooled):
+        try:
+            pooled.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(pooled):
+        """Clear cookies and web storage so the next scrape starts clean."""
+        driver = pooled.driver
+        try:
+            try:
+                driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+            except Exception:
+                # Storage is not accessible on some pages (e.g. about:blank)
+                pass
+            driver.delete_all_cookies()
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            logger.warning(f"Error resetting browser, recycling it: {e}")
+            return False
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool(create=True, size=None):
+    """Return the process-wide driver pool, creating it on first use.
+
+    With ``create=False`` returns None instead of launching a pool that does
+    not exist yet (e.g. when only reporting stats). ``size`` replaces
+    SCRAPER_POOL_SIZE as the pool's and browser admission's capacity when
+    this call creates them, as a scraper process started with its own
+    browser count does.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None and create:
+            from .admission import get_browser_admission
+            from .utils import setup_driver
+
+            if size is None:
+                size = getattr(settings, 'SCRAPER_POOL_SIZE', DEFAULT_POOL_SIZE)
+            _pool = DriverPool(
+                setup_driver,
+                size=size,
+                max_pages=getattr(settings, 'SCRAPER_POOL_MAX_PAGES_PER_DRIVER', DEFAULT_MAX_PAGES_PER_DRIVER),
+                checkout_timeout=getattr(settings, 'SCRAPER_POOL_CHECKOUT_TIMEOUT', DEFAULT_CHECKOUT_TIMEOUT),
+                admission=get_browser_admission(capacity=size),
+            )
+            _pool.prelaunch(getattr(settings, 'SCRAPER_POOL_PRELAUNCH', DEFAULT_POOL_PRELAUNCH))
+            atexit.register(_pool.close)
+        return _pool
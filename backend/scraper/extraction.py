@@ -0,0 +1,141 @@
+import json
+import logging
+
+from django.conf import settings
+from selenium.common.exceptions import WebDriverException
+
+from .records import Product
+
+logger = logging.getLogger(__name__)
+
+# How products are read from a loaded page, set by SCRAPER_EXTRACTION_MODE
+MODE_JS = 'js'  # Run the site's extractor inside the page, return compact JSON
+MODE_SOUP = 'soup'  # Ship page_source to Python and parse it with BeautifulSoup
+MODE_COMPARE = 'compare'  # Run both, log any difference, serve the soup result
+
+DEFAULT_MODE = MODE_JS
+
+# Reads the fields named in a site spec from each product card. Text fields
+# use textContent, which is what BeautifulSoup's `.text` returns; each field
+# lists selectors tried in order, like the soup parsers' fallbacks.
+EXTRACT_JS = """
+const spec = arguments[0];
+const rows = [];
+const cards = Array.from(document.querySelectorAll(spec.cards)).slice(spec.offset || 0, spec.limit);
+for (const card of cards) {
+  try {
+    const row = {};
+    for (const [field, rule] of Object.entries(spec.fields)) {
+      let value = null;
+      for (const selector of rule.selectors) {
+        const element = card.querySelector(selector);
+        if (element) {
+          if (!rule.attr) value = element.textContent;
+          else if (element.hasAttribute(rule.attr)) value = element.getAttribute(rule.attr);
+          break;
+        }
+      }
+      row[field] = value;
+    }
+    rows.push(row);
+  } catch (e) {}
+}
+return JSON.stringify(rows);
+"""
+
+
+def text_field(*selectors):
+    """A field read from the text of the first element matching one of ``selectors``."""
+    return {'selectors': list(selectors), 'attr': None}
+
+
+def attr_field(attr, *selectors):
+    """A field read from attribute ``attr`` of the first element matching one of ``selectors``."""
+    return {'selectors': list(selectors), 'attr': attr}
+
+
+def field_value(row, field, strip=False):
+    """Return a raw field string as the parsers report it, 'N/A' if missing."""
+    value = row.get(field)
+    if value is None:
+        return 'N/A'
+    return value.strip() if strip else value
+
+
+def brand_name(row, brand_if_name=False):
+    """Prefix the product name with its brand, as "<brand> - <name>"."""
+    brand = field_value(row, 'brand', strip=True) if row.get('brand') is not None else ''
+    name = field_value(row, 'name', strip=True)
+    if brand and (not brand_if_name or name != 'N/A'):
+        return f"{brand} - {name}"
+    return name
+
+
+def make_product(name, price, image, material, rating, site, mrp='N/A'):
+    """Build the product record returned for every site."""
+    from .utils import normalize_price, normalize_rating
+
+    rating_value, review_count = normalize_rating(rating)
+    return Product(
+        name=name,
+        price=normalize_price(price),
+        price_display=price,
+        image=image,
+        material=material,
+        rating=rating,
+        rating_value=rating_value,
+        review_count=review_count,
+        site=site,
+        mrp=normalize_price(mrp)
+    )
+
+
+def extraction_mode():
+    return getattr(settings, 'SCRAPER_EXTRACTION_MODE', DEFAULT_MODE)
+
+
+def extract_in_page(driver, adapter, offset=0, limit=None):
+    """Run ``adapter``'s extractor inside the page and return the products of cards ``offset:limit``."""
+    spec = adapter.spec
+    if offset or limit:
+        spec = {**spec, 'offset': offset, 'limit': limit or spec['limit']}
+    rows = json.loads(driver.execute_script(EXTRACT_JS, spec))
+    return adapter.products(rows)
+
+
+def extract_products(driver, adapter, report=None, deadline=None, offset=0, limit=None):
+    """Read the products on the page loaded in ``driver``.
+
+    Cards before ``offset`` (already read while scrolling) are skipped and
+    at most ``limit`` cards are read, the adapter's card limit by default.
+
+    In ``js`` mode only the product fields cross the WebDriver connection;
+    the page's full source is fetched and parsed with the adapter's parser in
+    ``soup`` mode, or if the in-page extractor fails, in the parse pool.
+    ``compare`` mode runs both and logs any product that differs between them.
+    """
+    from .parse_pool import parse_page
+
+    mode = extraction_mode()
+    products = None
+    if mode in (MODE_JS, MODE_COMPARE):
+        try:
+            products = extract_in_page(driver, adapter, offset, limit)
+        except (WebDriverException, ValueError) as e:
+            logger.warning(f"In-page extraction failed for {adapter.key}, parsing page source: {e}")
+            mode = MODE_SOUP
+
+    if mode in (MODE_SOUP, MODE_COMPARE):
+        soup_products = parse_page(adapter, driver.page_source, deadline, limit)[offset:]
+        if mode == MODE_COMPARE:
+            mismatches = sum(1 for js, soup in zip(products, soup_products) if js != soup)
+            mismatches += abs(len(products) - len(soup_products))
+            if mismatches:
+                logger.warning(f"In-page extraction differs from page source parsing for {adapter.key} on {mismatches} products")
+            if report is not None:
+                report['extraction_mismatches'] = mismatches
+        products = soup_products
+
+    if report is not None:
+        report['extraction'] = mode
+    return products
@@ -0,0 +1,252 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker states reported per site
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+DEFAULT_WINDOW = 20  # Recent scrapes kept per site for latency and failure rate
+DEFAULT_FAILURE_THRESHOLD = 3  # Consecutive failures that open a site's circuit
+DEFAULT_COOLDOWN = 60  # seconds a tripped site is skipped before a probe is let through
+DEFAULT_TIMEOUT_MIN_SAMPLES = 5  # Successful scrapes needed before timeouts adapt
+DEFAULT_TIMEOUT_FACTOR = 1.5  # Headroom over the p95 latency
+DEFAULT_TIMEOUT_FLOOR = 5  # seconds; adaptive timeouts never go below this
+DEFAULT_RETRY_RATIO = 0.2  # Retries allowed per scrape attempt, across all sites
+DEFAULT_RETRY_MIN = 3  # Retries always allowed per budget window
+DEFAULT_RETRY_WINDOW = 10  # seconds over which the retry budget is counted
+
+ANY_TIER = 'any'  # Latency samples of attempts that reported no fetch tier
+
+
+class CircuitOpen(Exception):
+    """Raised when a site is skipped because its circuit breaker is open."""
+
+    def __init__(self, site, retry_after):
+        self.site = site
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        super().__init__(f"{site} is failing, skipped for {self.retry_after}s")
+
+
+class SiteHealth:
+    """Latency, failure rate and circuit breaker state of one site."""
+
+    def __init__(self, site, window, failure_threshold, cooldown):
+        self.site = site
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = CIRCUIT_CLOSED
+        self.opened_at = None
+        self.consecutive_failures = 0
+        self.latencies = {}  # Fetch tier -> recent successful latencies
+        self.outcomes = deque(maxlen=window)
+        self.probing = False
+
+    def allow(self, now):
+        """Return seconds until the site may be tried again, or 0 to go ahead."""
+        if self.state == CIRCUIT_OPEN:
+            wait = self.opened_at + self.cooldown - now
+            if wait > 0:
+                return wait
+            self.state = CIRCUIT_HALF_OPEN
+        if self.state == CIRCUIT_HALF_OPEN:
+            # Only one probe at a time while the site is on trial
+            if self.probing:
+                return self.cooldown
+            self.probing = True
+        return 0
+
+    def record(self, latency, ok, now, tier=ANY_TIER):
+        self.outcomes.append(ok)
+        self.probing = False
+        if ok:
+            self.latencies.setdefault(tier, deque(maxlen=self.window)).append(latency)
+            self.consecutive_failures = 0
+            if self.state != CIRCUIT_CLOSED:
+                logger.info(f"Circuit for {self.site} closed")
+            self.state = CIRCUIT_CLOSED
+            return
+
+        self.consecutive_failures += 1
+        if self.state == CIRCUIT_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != CIRCUIT_OPEN:
+                logger.warning(f"Circuit for {self.site} opened after {self.consecutive_failures} failures")
+            self.state = CIRCUIT_OPEN
+            self.opened_at = now
+
+    def p95(self, tier=ANY_TIER):
+        latencies = self.latencies.get(tier)
+        if not latencies:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(math.ceil(0.95 * len(ordered))) - 1)]
+
+    def failure_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return sum(1 for ok in self.outcomes if not ok) / len(self.outcomes)
+
+
+class SiteHealthTracker:
+    """Process-wide health of every site, shared by all searches.
+
+    Each finished scrape attempt is recorded with its latency and whether it
+    failed. A site that fails ``failure_threshold`` times in a row has its
+    circuit opened and is skipped for ``cooldown`` seconds; after that a
+    single probe is let through, which closes the circuit on success or
+    reopens it on failure. Wait timeouts are derived from each site's recent
+    p95 latency so a site that normally answers in 4s isn't given 30s.
+    Latencies are kept per fetch tier, so fast HTTP-tier scrapes don't cut
+    the browser wait of the same site's Selenium fallback.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 cooldown=DEFAULT_COOLDOWN, timeout_min_samples=DEFAULT_TIMEOUT_MIN_SAMPLES,
+                 timeout_factor=DEFAULT_TIMEOUT_FACTOR, timeout_floor=DEFAULT_TIMEOUT_FLOOR):
+        self.window = window
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.timeout_min_samples = timeout_min_samples
+        self.timeout_factor = timeout_factor
+        self.timeout_floor = timeout_floor
+        self._sites = {}
+        self._lock = threading.Lock()
+        self._stats = {'short_circuited': 0}
+
+    def check(self, site):
+        """Raise ``CircuitOpen`` if ``site`` should be skipped right now."""
+        with self._lock:
+            wait = self._site(site).allow(time.monotonic())
+            if wait:
+                self._stats['short_circuited'] += 1
+        if wait:
+            raise CircuitOpen(site, wait)
+
+    def record(self, site, latency, ok, tier=ANY_TIER):
+        with self._lock:
+            self._site(site).record(latency, ok, time.monotonic(), tier)
+
+    def abandon(self, site):
+        """Forget an attempt that ended without a recordable outcome."""
+        with self._lock:
+            self._site(site).probing = False
+
+    def timeout(self, site, cap, tier=ANY_TIER):
+        """Return the wait timeout for ``site``: its p95 latency on ``tier`` with headroom, at most ``cap``."""
+        with self._lock:
+            adaptive = self._adaptive_timeout(self._sites.get(site), tier)
+        return cap if adaptive is None else min(cap, adaptive)
+
+    def stats(self):
+        with self._lock:
+            sites = {
+                site: {
+                    'circuit': health.state,
+                    'consecutive_failures': health.consecutive_failures,
+                    'failure_rate': round(health.failure_rate(), 2),
+                    'p95_seconds': {tier: round(health.p95(tier), 2) for tier in health.latencies},
+                    'adaptive_timeout': {tier: self._adaptive_timeout(health, tier) for tier in health.latencies},
+                    'samples': len(health.outcomes),
+                }
+                for site, health in self._sites.items()
+            }
+            stats = dict(self._stats)
+        stats['sites'] = sites
+        return stats
+
+    def _adaptive_timeout(self, health, tier):
+        if health is None or len(health.latencies.get(tier, ())) < self.timeout_min_samples:
+            return None
+        return round(max(self.timeout_floor, health.p95(tier) * self.timeout_factor), 2)
+
+    def _site(self, site):
+        health = self._sites.get(site)
+        if health is None:
+            health = self._sites[site] = SiteHealth(site, self.window, self.failure_threshold, self.cooldown)
+        return health
+
+
+class RetryBudget:
+    """Shared cap on retries so that an outage cannot multiply load.
+
+    Retries across all sites are limited to ``ratio`` of the scrape attempts
+    made in the last ``window`` seconds, plus ``min_retries`` so that a quiet
+    process can still retry.
+    """
+
+    def __init__(self, ratio=DEFAULT_RETRY_RATIO, min_retries=DEFAULT_RETRY_MIN, window=DEFAULT_RETRY_WINDOW):
+        self.ratio = ratio
+        self.min_retries = min_retries
+        self.window = window
+        self._attempts = deque()
+        self._retries = deque()
+        self._lock = threading.Lock()
+        self._stats = {'retries': 0, 'denied': 0}
+
+    def record_attempt(self):
+        with self._lock:
+            self._attempts.append(time.monotonic())
+
+    def try_retry(self):
+        """Spend one retry from the budget; returns False if it is exhausted."""
+        with self._lock:
+            self._expire(time.monotonic())
+            if len(self._retries) >= self.min_retries + self.ratio * len(self._attempts):
+                self._stats['denied'] += 1
+                return False
+            self._retries.append(time.monotonic())
+            self._stats['retries'] += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                'attempts_in_window': len(self._attempts),
+                'retries_in_window': len(self._retries),
+                **self._stats,
+            }
+
+    def _expire(self, now):
+        for timestamps in (self._attempts, self._retries):
+            while timestamps and now - timestamps[0] > self.window:
+                timestamps.popleft()
+
+
+_tracker = None
+_retry_budget = None
+_health_lock = threading.Lock()
+
+
+def get_site_health():
+    """Return the process-wide site health tracker."""
+    global _tracker
+    with _health_lock:
+        if _tracker is None:
+            _tracker = SiteHealthTracker(
+                failure_threshold=getattr(settings, 'SCRAPER_CIRCUIT_FAILURE_THRESHOLD', DEFAULT_FAILURE_THRESHOLD),
+                cooldown=getattr(settings, 'SCRAPER_CIRCUIT_COOLDOWN', DEFAULT_COOLDOWN),
+                timeout_factor=getattr(settings, 'SCRAPER_ADAPTIVE_TIMEOUT_FACTOR', DEFAULT_TIMEOUT_FACTOR),
+                timeout_floor=getattr(settings, 'SCRAPER_ADAPTIVE_TIMEOUT_FLOOR', DEFAULT_TIMEOUT_FLOOR),
+            )
+        return _tracker
+
+
+def get_retry_budget():
+    """Return the process-wide retry budget."""
+    global _retry_budget
+    with _health_lock:
+        if _retry_budget is None:
+            _retry_budget = RetryBudget(
+                ratio=getattr(settings, 'SCRAPER_RETRY_BUDGET_RATIO', DEFAULT_RETRY_RATIO),
+                min_retries=getattr(settings, 'SCRAPER_RETRY_BUDGET_MIN', DEFAULT_RETRY_MIN),
+            )
+        return _retry_budget
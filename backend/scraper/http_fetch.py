@@ -0,0 +1,229 @@
+import json
+import logging
+import re
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .deadline import DeadlineExceeded, bounded
+from .parse_pool import parse_page
+from .records import Product
+
+logger = logging.getLogger(__name__)
+
+# Fetch tiers reported per site in the search response
+TIER_HTTP = 'http'
+TIER_SELENIUM = 'selenium'
+
+HTTP_TIMEOUT = 10  # seconds
+HTTP_POOL_MAXSIZE = 10  # Keep-alive connections per site
+HTTP_RESULT_LIMIT = 10  # Default products taken from embedded state
+
+HTTP_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-IN,en;q=0.9',
+}
+
+# Script tags that carry the initial application state on SSR storefronts
+STATE_PATTERNS = [
+    re.compile(r'<script[^>]+id="__NEXT_DATA__"[^>]*>', re.I),
+    re.compile(r'window\.(?:__PRELOADED_STATE__|__INITIAL_STATE__|__myx)\s*=\s*'),
+]
+
+NAME_KEYS = ('productName', 'product_name', 'name', 'title')
+BRAND_KEYS = ('brand', 'brandName', 'brand_name')
+PRICE_KEYS = ('discountedPrice', 'offerPrice', 'sellingPrice', 'final_price', 'price')
+MRP_KEYS = ('mrp', 'MRP', 'originalPrice', 'listPrice', 'strikePrice')
+IMAGE_KEYS = ('searchImage', 'imageUrl', 'image_url', 'image', 'images', 'imageUrls')
+RATING_KEYS = ('rating', 'averageRating', 'avg_rating')
+RATING_COUNT_KEYS = ('ratingCount', 'rating_count', 'totalRatings', 'reviewCount', 'review_count')
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def record_tier(report, tier):
+    """Record which fetch tier served a site, if the caller asked for a report."""
+    if report is not None:
+        report['tier'] = tier
+
+
+def get_session(site):
+    """Return the keep-alive session dedicated to ``site``."""
+    with _sessions_lock:
+        session = _sessions.get(site)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(HTTP_HEADERS)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[site] = session
+        return session
+
+
+def fetch_with_http(adapter, query, report=None, deadline=None, depth=None, quota=None):
+    """Fetch ``adapter``'s search results for ``query`` without a browser.
+
+    Embedded JSON state is tried first for sites that carry it, then the
+    adapter's static HTML parser (run in the parse pool). Up to ``depth``
+    products are read, the adapter's card limit by default; deeper reads
+    follow the site's result pages, counting each page toward ``quota`` and
+    stopping as soon as it is met or a page comes back empty.
+    Returns an empty list when the first page fails or has no products,
+    so the caller can fall back to Selenium.
+    """
+    site = adapter.key
+    depth = depth or adapter.card_limit
+    products = []
+    pages = 0
+    while pages < adapter.max_pages and len(products) < depth:
+        if deadline is not None and deadline.expired():
+            break
+        page_products = _fetch_page(adapter, adapter.search_url(query, pages + 1), depth - len(products), deadline)
+        if not page_products:
+            break
+        pages += 1
+        products.extend(page_products)
+        if quota is not None:
+            quota.update(site, products)
+            if quota.met():
+                break
+
+    if products:
+        logger.info(f"HTTP tier served {site} - found {len(products)} products on {pages} pages")
+        record_tier(report, TIER_HTTP)
+        if report is not None:
+            report['pages'] = pages
+    return products
+
+
+def _fetch_page(adapter, url, limit, deadline=None):
+    """Fetch one result page and extract up to ``limit`` products from it."""
+    site = adapter.key
+    try:
+        response = get_session(site).get(url, timeout=bounded(deadline, HTTP_TIMEOUT))
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logger.info(f"HTTP tier failed for {site}: {e}")
+        return []
+
+    html = response.text
+    products = []
+    if adapter.embedded_state:
+        try:
+            products = extract_embedded_products(html, adapter.name, limit=limit)
+        except Exception as e:
+            logger.warning(f"Error extracting embedded state for {site}: {e}")
+    if not products:
+        try:
+            products = parse_page(adapter, html, deadline, limit)
+        except DeadlineExceeded:
+            return []
+        except Exception as e:
+            logger.warning(f"Error parsing static HTML for {site}: {e}")
+            products = []
+    return products
+
+
+def extract_embedded_products(html, site_name, limit=HTTP_RESULT_LIMIT):
+    """Build product records from JSON state embedded in a search results page."""
+    best = []
+    for state in _iter_embedded_state(html):
+        candidates = _find_product_lists(state)
+        if candidates:
+            best = max([best] + candidates, key=len)
+
+    products = []
+    for entry in best[:limit]:
+        product = _product_from_entry(entry, site_name)
+        if product:
+            products.append(product)
+    return products
+
+
+def _iter_embedded_state(html):
+    decoder = json.JSONDecoder()
+    for pattern in STATE_PATTERNS:
+        for match in pattern.finditer(html):
+            start = match.end()
+            while start < len(html) and html[start].isspace():
+                start += 1
+            try:
+                state, _ = decoder.raw_decode(html, start)
+            except ValueError:
+                continue
+            yield state
+
+
+def _find_product_lists(node):
+    """Return every list in ``node`` whose entries look like product records."""
+    found = []
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, dict):
+            stack.extend(current.values())
+        elif isinstance(current, list):
+            records = [entry for entry in current if isinstance(entry, dict)]
+            if records and sum(1 for entry in records if _looks_like_product(entry)) * 2 >= len(records):
+                found.append(records)
+            stack.extend(records)
+    return found
+
+
+def _looks_like_product(entry):
+    return _first(entry, NAME_KEYS) is not None and _first(entry, PRICE_KEYS) is not None
+
+
+def _first(entry, keys):
+    for key in keys:
+        value = entry.get(key)
+        if value not in (None, '', [], {}):
+            return value
+    return None
+
+
+def _text(value):
+    """Flatten the scalar, dict and list shapes storefronts use for a field."""
+    if isinstance(value, dict):
+        value = _first(value, ('formattedValue', 'displayformattedValue', 'value', 'name', 'url', 'src'))
+    elif isinstance(value, list):
+        value = _text(value[0]) if value else None
+    return None if value is None else str(value).strip()
+
+
+def _product_from_entry(entry, site_name):
+    from .utils import normalize_price, normalize_rating
+
+    name = _text(_first(entry, NAME_KEYS))
+    price = _text(_first(entry, PRICE_KEYS))
+    if not name or not price:
+        return None
+
+    brand = _text(_first(entry, BRAND_KEYS))
+    if brand and not name.lower().startswith(brand.lower()):
+        name = f"{brand} - {name}"
+    if re.fullmatch(r'[\d.]+', price):
+        price = f"₹{float(price):,.0f}"
+
+    rating = _text(_first(entry, RATING_KEYS)) or 'N/A'
+    rating_value, review_count = normalize_rating(rating)
+    count = _text(_first(entry, RATING_COUNT_KEYS))
+    if count and re.fullmatch(r'\d+', count):
+        review_count = int(count)
+
+    return Product(
+        name=name,
+        price=normalize_price(price),
+        price_display=price,
+        image=_text(_first(entry, IMAGE_KEYS)) or 'N/A',
+        material='N/A',
+        rating=rating,
+        rating_value=rating_value,
+        review_count=review_count,
+        site=site_name,
+        mrp=normalize_price(_text(_first(entry, MRP_KEYS)))
+    )
@@ -0,0 +1,370 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .cursors import get_result_store
+from .deadline import STATUS_ERROR, Deadline
+from .models import SearchJob, SiteTask
+from .nodes import assign_sites, heartbeat, live_nodes, record_task, register_node, stop_node
+from .query_log import get_query_log
+from .quota import ResultQuota
+from .records import PRODUCT_FIELDS, Product
+from .results import ResultSet
+from .sites import get_site_registry
+from .utils import collect_errors, iter_site_results, new_site_report
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable from Django settings
+DEFAULT_LEASE_SECONDS = 30  # A running task's lease, and how long a silent node keeps its shard
+DEFAULT_MAX_ATTEMPTS = 3  # Workers that may take a site task (after earlier ones died) before it fails
+DEFAULT_MAX_QUEUED = 1000  # Queued jobs beyond which new submissions are refused
+DEFAULT_WORKER_CONCURRENCY = 2  # Site tasks a scraper worker runs at once
+DEFAULT_POLL_SECONDS = 1.0  # Idle wait between queue polls
+DEFAULT_STEAL_AFTER = 2.0  # Seconds a task waits for its site's node before an idle node may take it
+CLAIM_CANDIDATES = 10  # Tasks tried per claim where the database can't skip locked rows
+
+ACTIVE = (SearchJob.QUEUED, SearchJob.RUNNING)
+
+
+class QueueFull(Exception):
+    """Too many jobs are waiting for a scraper worker."""
+
+
+class JobQueue:
+    """Durable queue of search jobs in the database, shared by every web and worker process.
+
+    A job is queued as one task per site. Workers claim the oldest queued
+    task, or a running task whose worker stopped renewing its lease.
+    PostgreSQL claims with ``SELECT ... FOR UPDATE SKIP LOCKED`` so
+    concurrent workers never wait on each other; elsewhere (SQLite) a
+    conditional UPDATE decides which worker gets a task. The worker
+    finishing a job's last task assembles the job's results.
+    """
+
+    def __init__(self, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                 max_queued=DEFAULT_MAX_QUEUED):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_queued = max_queued
+
+    def submit(self, query, params):
+        """Queue a search; raises QueueFull when too many jobs are waiting."""
+        if SearchJob.objects.filter(status=SearchJob.QUEUED).count() >= self.max_queued:
+            raise QueueFull("Too many queued searches, try again later")
+        sites = [name for name in params.get('sites', '').split(',') if name.strip()]
+        with transaction.atomic():
+            job = SearchJob.objects.create(query=query, params=params)
+            SiteTask.objects.bulk_create([
+                SiteTask(job=job, site=adapter.key) for adapter in get_site_registry().resolve(sites)
+            ])
+        self._finish_job(job.pk)  # No known sites: done at once
+        return job
+
+    def claim(self, worker, sites=None, steal_after=None):
+        """Take the next site task for ``worker``; returns None if there is none.
+
+        With ``sites`` (the worker's shard) only tasks of those sites are
+        taken, or with ``steal_after`` also tasks of other sites that have
+        waited that many seconds for their own node.
+        """
+        while True:
+            if sites is None:
+                task = self._claim(self._claimable(), worker)
+            else:
+                task = self._claim(self._claimable().filter(site__in=sites), worker)
+                if task is None and steal_after is not None:
+                    waited = self._claimable().exclude(site__in=sites).filter(
+                        created_at__lte=timezone.now() - timedelta(seconds=steal_after)
+                    )
+                    task = self._claim(waited, worker, stolen=True)
+            if task is None:
+                return None
+            if task.attempts <= self.max_attempts:
+                SearchJob.objects.filter(pk=task.job_id, status=SearchJob.QUEUED).update(
+                    status=SearchJob.RUNNING, started_at=task.started_at,
+                )
+                return task
+            self.fail(task, worker, f"Gave up after {self.max_attempts} workers stopped running the scrape")
+
+    def renew(self, tasks, worker):
+        """Extend ``worker``'s leases on running tasks; returns how many it still holds."""
+        return SiteTask.objects.filter(
+            pk__in=[task.pk for task in tasks], worker=worker, status=SearchJob.RUNNING,
+        ).update(lease_expires_at=self._lease_end())
+
+    def complete(self, task, worker, report, products, matches):
+        """Record a site's results; False if the task was taken over by another worker."""
+        task.product_count = len(products)
+        done = self._owned(task, worker).update(
+            status=SearchJob.DONE, finished_at=timezone.now(), lease_expires_at=None, report=report,
+            results=[{field: product.get(field) for field in PRODUCT_FIELDS} for product in products],
+            product_count=task.product_count, matches=matches,
+        )
+        if done:
+            self._finish_job(task.job_id)
+        return bool(done)
+
+    def fail(self, task, worker, error):
+        report = {**new_site_report(), 'status': STATUS_ERROR, 'error': error}
+        failed = self._owned(task, worker).update(
+            status=SearchJob.FAILED, finished_at=timezone.now(), lease_expires_at=None, report=report,
+        )
+        if failed:
+            self._finish_job(task.job_id)
+        return bool(failed)
+
+    def stats(self):
+        return {
+            'lease_seconds': self.lease_seconds,
+            'jobs': self._counts(SearchJob.objects),
+            'tasks': self._counts(SiteTask.objects),
+        }
+
+    @staticmethod
+    def _counts(manager):
+        counts = {status: 0 for status, _ in SearchJob.STATUS_CHOICES}
+        for status, count in manager.values_list('status').order_by().annotate(count=Count('pk')):
+            counts[status] = count
+        return counts
+
+    def _claimable(self):
+        return (SiteTask.objects
+                .filter(Q(status=SearchJob.QUEUED) | Q(status=SearchJob.RUNNING, lease_expires_at__lt=timezone.now()))
+                .order_by('created_at', 'pk'))
+
+    def _claim(self, claimable, worker, stolen=False):
+        if connection.features.has_select_for_update_skip_locked:
+            return self._claim_skip_locked(claimable, worker, stolen)
+        return self._claim_compare_and_set(claimable, worker, stolen)
+
+    def _claim_skip_locked(self, claimable, worker, stolen):
+        with transaction.atomic():
+            task = claimable.select_for_update(skip_locked=True, of=('self',)).select_related('job').first()
+            if task is None:
+                return None
+            task.status = SearchJob.RUNNING
+            task.worker = worker
+            task.started_at = timezone.now()
+            task.lease_expires_at = self._lease_end()
+            task.attempts += 1
+            task.stolen = stolen
+            task.save(update_fields=['status', 'worker', 'started_at', 'lease_expires_at', 'attempts', 'stolen'])
+            return task
+
+    def _claim_compare_and_set(self, claimable, worker, stolen):
+        for candidate in claimable.values('pk', 'status', 'lease_expires_at')[:CLAIM_CANDIDATES]:
+            # Only succeeds if no other worker changed the task since it was read
+            taken = SiteTask.objects.filter(**candidate).update(
+                status=SearchJob.RUNNING, worker=worker, started_at=timezone.now(),
+                lease_expires_at=self._lease_end(), attempts=F('attempts') + 1, stolen=stolen,
+            )
+            if taken:
+                return SiteTask.objects.select_related('job').get(pk=candidate['pk'])
+        return None
+
+    def _finish_job(self, job_id):
+        """Assemble a job's results once none of its site tasks is left to run."""
+        if SiteTask.objects.filter(job_id=job_id, status__in=ACTIVE).exists():
+            return
+        job = SearchJob.objects.get(pk=job_id)
+        if job.status not in ACTIVE:
+            return
+        # Sites in the order they finished, as a search merges them
+        tasks = list(job.tasks.order_by('finished_at', 'pk'))
+        results = [product for task in tasks for product in task.results or []]
+        result_id, _ = get_result_store().save([Product(**product) for product in results], job.query)
+        errors = collect_errors({task.site: task.report for task in tasks})
+        finished = timezone.now()
+        execution_time = (finished - (job.started_at or job.created_at)).total_seconds()
+        all_failed = bool(tasks) and all(task.status == SearchJob.FAILED for task in tasks)
+        if SearchJob.objects.filter(pk=job_id, status__in=ACTIVE).update(
+            status=SearchJob.FAILED if all_failed else SearchJob.DONE, finished_at=finished,
+            result_id=result_id, results=results, errors=errors if errors else None,
+            execution_time=round(execution_time, 2),
+        ):
+            get_query_log().record(job.query, execution_time, {task.site: task.report for task in tasks})
+
+    def _owned(self, task, worker):
+        return SiteTask.objects.filter(pk=task.pk, worker=worker, status=SearchJob.RUNNING)
+
+    def _lease_end(self):
+        return timezone.now() + timedelta(seconds=self.lease_seconds)
+
+
+def job_filters(params):
+    """The price and rating filters of a job's parameters (JSON has no infinite `max_price`)."""
+    max_price = params.get('max_price')
+    return {
+        'min_price': params.get('min_price', 0),
+        'max_price': float('inf') if max_price is None else max_price,
+        'min_rating': params.get('min_rating', 0),
+    }
+
+
+def job_sites(job):
+    """Per-site progress of a job: each site's report, its task's status and the node running it."""
+    return {
+        task.site: {**(task.report or new_site_report()), 'task': task.status, 'node': task.worker or None,
+                    'stolen': task.stolen}
+        for task in job.tasks.order_by('pk')
+    }
+
+
+def run_task(task, worker, job_queue):
+    """Scrape a task's site for its job, counting the job's other finished sites toward its limit."""
+    job = task.job
+    params = job.params
+    adapter = get_site_registry().get(task.site)
+    if adapter is None:
+        job_queue.fail(task, worker, f"Unknown site '{task.site}'")
+        return
+    quota = None
+    if params.get('limit'):
+        quota = ResultQuota(params['limit'], **job_filters(params))
+        finished = SiteTask.objects.filter(job_id=task.job_id, status=SearchJob.DONE).exclude(pk=task.pk)
+        for site, matches in finished.values_list('site', 'matches'):
+            quota.record(site, matches)
+
+    reports = {}
+    products = []
+    for _, site_products in iter_site_results(job.query, [adapter], reports=reports,
+                                              deadline=Deadline(params.get('timeout', 60)), quota=quota):
+        products = site_products
+    matches = len(ResultSet(products).filter(**job_filters(params)))
+    job_queue.complete(task, worker, reports[task.site], products, matches)
+
+
+class JobWorker:
+    """A scraper node: runs up to ``concurrency`` site tasks at once, preferring the sites sharded to it.
+
+    Sites are sharded over the live nodes by rendezvous hashing, so a
+    site's scrapes keep going to the same node and reuse its warm browsers,
+    cookies and caches. A node with a free slot and nothing of its own to
+    do steals tasks that have waited ``steal_after`` seconds. A heartbeat
+    thread renews the node's heartbeat and its tasks' leases and reshards
+    as nodes come and go; if this process dies, its sites move to other
+    nodes and its tasks are taken over once their leases expire.
+    """
+
+    def __init__(self, name, job_queue, concurrency=DEFAULT_WORKER_CONCURRENCY, poll_seconds=DEFAULT_POLL_SECONDS,
+                 steal_after=DEFAULT_STEAL_AFTER, browsers=None):
+        self.name = name
+        self.job_queue = job_queue
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.steal_after = steal_after
+        self.browsers = browsers if browsers is not None else settings.SCRAPER_POOL_SIZE
+        self.shard = []
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._stopped = threading.Event()
+        self._slot_freed = threading.Event()
+
+    def run(self, once=False):
+        """Claim and run site tasks until ``stop`` is called, or the queue is empty with ``once``."""
+        register_node(self.name, self.concurrency, self.browsers)
+        self.reshard()
+        heartbeat(self.name, 0, self.shard)
+        executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='scraper-task')
+        beat = threading.Thread(target=self._heartbeat, name='scraper-node-heartbeat', daemon=True)
+        beat.start()
+        logger.info(f"Scraper node {self.name} running {self.concurrency} tasks at a time")
+        try:
+            while not self._stop.is_set():
+                with self._lock:
+                    running = len(self._running)
+                if running < self.concurrency:
+                    task = self.job_queue.claim(self.name, self.shard, self.steal_after)
+                    if task is not None:
+                        logger.info(f"Node {self.name} took {task.site} of job {task.job_id}"
+                                    f"{' (stolen)' if task.stolen else ''}")
+                        with self._lock:
+                            self._running[task.pk] = task
+                        executor.submit(self._run, task)
+                        continue
+                    if once and not running and not self._waiting():
+                        break
+                self._slot_freed.clear()
+                self._slot_freed.wait(self.poll_seconds)
+        finally:
+            self._stop.set()
+            executor.shutdown(wait=True)
+            self._stopped.set()
+            stop_node(self.name)
+            close_old_connections()
+
+    def stop(self):
+        """Stop claiming tasks; tasks already running finish first."""
+        self._stop.set()
+        self._slot_freed.set()
+
+    def reshard(self):
+        """Recompute the sites sharded to this node from the live nodes."""
+        nodes = set(live_nodes(self.job_queue.lease_seconds)) | {self.name}
+        owners = assign_sites([adapter.key for adapter in get_site_registry()], nodes)
+        shard = sorted(site for site, owner in owners.items() if owner == self.name)
+        if shard != self.shard:
+            logger.info(f"Node {self.name} now owns sites: {', '.join(shard) or 'none'}")
+        self.shard = shard
+
+    def _waiting(self):
+        """Whether tasks of other nodes' sites are still queued, to be stolen once they have waited."""
+        return SiteTask.objects.filter(status=SearchJob.QUEUED).exists()
+
+    def _run(self, task):
+        started = time.monotonic()
+        failed = False
+        try:
+            run_task(task, self.name, self.job_queue)
+        except Exception as e:
+            logger.error(f"Task {task.site} of job {task.job_id} failed: {e}")
+            self.job_queue.fail(task, self.name, f"An error occurred: {e}")
+            failed = True
+        finally:
+            with self._lock:
+                self._running.pop(task.pk, None)
+            try:
+                record_task(self.name, task, failed, time.monotonic() - started)
+            finally:
+                connection.close()
+                self._slot_freed.set()
+
+    def _heartbeat(self):
+        # Keeps beating while running tasks finish after a stop
+        while not self._stopped.wait(self.job_queue.lease_seconds / 3):
+            with self._lock:
+                tasks = list(self._running.values())
+            try:
+                if tasks and self.job_queue.renew(tasks, self.name) < len(tasks):
+                    logger.warning(f"Node {self.name} lost the lease on some of its tasks")
+                heartbeat(self.name, len(tasks), self.shard)
+                self.reshard()
+            except Exception as e:
+                logger.error(f"Error sending the heartbeat of node {self.name}: {e}")
+        connection.close()
+
+
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide job queue."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(
+                lease_seconds=getattr(settings, 'SCRAPER_JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS),
+                max_attempts=getattr(settings, 'SCRAPER_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+                max_queued=getattr(settings, 'SCRAPER_JOB_MAX_QUEUED', DEFAULT_MAX_QUEUED),
+            )
+        return _job_queue
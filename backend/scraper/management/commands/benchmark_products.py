@@ -0,0 +1,70 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import ProductJSONRenderer
+from scraper.records import PRODUCT_FIELDS, Product
+
+
+class Command(BaseCommand):
+    help = "Compare memory per product and JSON serialization throughput of product dicts and records"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help="Products in the benchmark result set")
+        parser.add_argument('--repeat', type=int, default=5, help="Serialization runs per path; the best is reported")
+
+    def handle(self, *args, **options):
+        count = options['products']
+        rows = [self.sample_values(index) for index in range(count)]
+
+        dict_bytes, dicts = self.measure(lambda: [dict(zip(PRODUCT_FIELDS, values)) for values in rows])
+        record_bytes, records = self.measure(lambda: [Product(*values) for values in rows])
+        self.stdout.write(f"Memory per product ({count} products, field values shared):")
+        self.stdout.write(f"  dict    {dict_bytes / count:8.1f} bytes")
+        self.stdout.write(f"  record  {record_bytes / count:8.1f} bytes")
+
+        self.stdout.write("Serialization throughput:")
+        paths = [
+            ('dicts via JSONRenderer', JSONRenderer(), dicts),
+            ('records via JSONRenderer', JSONRenderer(), records),
+            ('records via ProductJSONRenderer', ProductJSONRenderer(), records),
+        ]
+        for label, renderer, products in paths:
+            seconds, size = self.time_render(renderer, {'query': 'benchmark', 'results': products}, options['repeat'])
+            self.stdout.write(
+                f"  {label:32} {count / seconds:12,.0f} products/s  {size / seconds / 1e6:8.1f} MB/s"
+            )
+
+    @staticmethod
+    def sample_values(index):
+        price = random.randint(199, 4999)
+        rating = round(random.uniform(3, 5), 1)
+        reviews = random.randint(1, 5000)
+        return (
+            f"Brand {index % 50} - Men Regular Fit Cotton Shirt {index}", float(price), f"₹{price:,}",
+            f"https://images.example.com/products/{index}.jpg", 'Cotton', f"{rating}|{reviews}",
+            rating, reviews, random.choice(['Myntra', 'Flipkart', 'Amazon', 'AJIO']),
+        )
+
+    @staticmethod
+    def measure(build):
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            built = build()
+            return tracemalloc.get_traced_memory()[0] - before, built
+        finally:
+            tracemalloc.stop()
+
+    @staticmethod
+    def time_render(renderer, data, repeat):
+        best = float('inf')
+        size = 0
+        for _ in range(max(1, repeat)):
+            started = time.perf_counter()
+            size = len(renderer.render(data))
+            best = min(best, time.perf_counter() - started)
+        return best, size
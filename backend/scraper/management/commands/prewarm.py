@@ -0,0 +1,45 @@
+import json
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from scraper.driver_pool import get_driver_pool
+from scraper.prewarm import DEFAULT_INTERVAL, DEFAULT_WINDOW_DAYS, build_prewarmer, prewarm_report
+
+
+class Command(BaseCommand):
+    help = "Refresh the cached results of the most searched queries before they expire"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep running, one pass every SCRAPER_PREWARM_INTERVAL seconds (see --interval)",
+        )
+        parser.add_argument(
+            '--interval', type=float, default=getattr(settings, 'SCRAPER_PREWARM_INTERVAL', DEFAULT_INTERVAL),
+            help="Seconds between passes with --loop",
+        )
+        parser.add_argument('--report', action='store_true', help="Print the pre-warm report instead of running")
+        parser.add_argument('--days', type=int, default=DEFAULT_WINDOW_DAYS, help="Days covered by --report")
+
+    def handle(self, *args, **options):
+        if options['report']:
+            self.stdout.write(json.dumps(prewarm_report(options['days']), indent=2))
+            return
+
+        prewarmer = build_prewarmer()
+        # This process only runs refreshes: its browsers are the pre-warm budget
+        get_driver_pool(size=prewarmer.browsers)
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+        while True:
+            run = prewarmer.run()
+            self.stdout.write(
+                f"Refreshed {run.refreshed} of {run.planned} due queries ({run.failed} failed, {run.skipped} over "
+                f"budget), {run.browser_seconds / 60:.1f} browser minutes"
+            )
+            if not options['loop'] or stop.wait(options['interval']):
+                break
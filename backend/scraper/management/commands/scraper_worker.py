@@ -0,0 +1,60 @@
+import os
+import signal
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from scraper.driver_pool import get_driver_pool
+from scraper.jobs import (
+    DEFAULT_POLL_SECONDS, DEFAULT_STEAL_AFTER, DEFAULT_WORKER_CONCURRENCY, JobWorker, get_job_queue
+)
+
+
+class Command(BaseCommand):
+    help = "Run the site tasks of search jobs queued through the job API, as one node of the scraper cluster"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int,
+            default=getattr(settings, 'SCRAPER_WORKER_CONCURRENCY', DEFAULT_WORKER_CONCURRENCY),
+            help="Site tasks run at once",
+        )
+        parser.add_argument(
+            '--browsers', type=int, default=getattr(settings, 'SCRAPER_WORKER_POOL_SIZE', settings.SCRAPER_POOL_SIZE),
+            help="Live browsers of this worker, shared by its tasks (replaces SCRAPER_POOL_SIZE)",
+        )
+        parser.add_argument(
+            '--poll', type=float, default=getattr(settings, 'SCRAPER_WORKER_POLL_SECONDS', DEFAULT_POLL_SECONDS),
+            help="Seconds between queue polls while idle",
+        )
+        parser.add_argument(
+            '--steal-after', type=float,
+            default=getattr(settings, 'SCRAPER_WORKER_STEAL_AFTER', DEFAULT_STEAL_AFTER),
+            help="Seconds another node's task must wait before this node, when idle, takes it",
+        )
+        parser.add_argument(
+            '--name', default=None,
+            help="Node name; sites are sharded by name, so keep it across restarts (default: host:pid)",
+        )
+        parser.add_argument('--once', action='store_true', help="Exit once the queue is empty")
+
+    def handle(self, *args, **options):
+        # Create the pool up front so it and browser admission are sized to this node's browsers
+        get_driver_pool(size=options['browsers'])
+        name = options['name'] or f"{socket.gethostname()}:{os.getpid()}"
+        worker = JobWorker(
+            name, get_job_queue(), concurrency=options['concurrency'], poll_seconds=options['poll'],
+            steal_after=options['steal_after'], browsers=options['browsers'],
+        )
+
+        def stop(signum, frame):
+            self.stdout.write(f"Stopping {name} after its running tasks")
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(
+            f"Scraper node {name}: {options['concurrency']} tasks at a time on {options['browsers']} browsers"
+        )
+        worker.run(once=options['once'])
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.7 on 2026-10-18 02:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogProduct',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_name', models.CharField(max_length=255, unique=True)),
+                ('name', models.CharField(max_length=500)),
+                ('material', models.CharField(default='N/A', max_length=100)),
+                ('first_seen', models.DateTimeField()),
+                ('last_seen', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Offer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site', models.CharField(max_length=100)),
+                ('price', models.FloatField(null=True)),
+                ('price_display', models.CharField(max_length=100)),
+                ('mrp', models.FloatField(null=True)),
+                ('image', models.TextField()),
+                ('rating', models.CharField(max_length=100)),
+                ('rating_value', models.FloatField(null=True)),
+                ('review_count', models.IntegerField(null=True)),
+                ('scraped_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='scraper.catalogproduct')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ScrapeRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site', models.CharField(max_length=50)),
+                ('query', models.CharField(max_length=255)),
+                ('tier', models.CharField(blank=True, max_length=20)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('exhausted', models.BooleanField(default=True)),
+                ('finished_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['query', 'site', '-finished_at'], name='scraper_scr_query_caa281_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RunResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('offer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='run_results', to='scraper.offer')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='scraper.scraperun')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['site', 'price'], name='scraper_off_site_586e77_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='offer',
+            index=models.Index(fields=['price'], name='scraper_off_price_59eb64_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='offer',
+            constraint=models.UniqueConstraint(fields=('product', 'site'), name='unique_offer_per_site'),
+        ),
+        migrations.AddConstraint(
+            model_name='runresult',
+            constraint=models.UniqueConstraint(fields=('run', 'position'), name='unique_run_position'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+def create_index(apps, schema_editor):
+    from scraper.search_index import create_search_index
+
+    create_search_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    from scraper.search_index import drop_search_index
+
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0001_catalog'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 02:55
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0002_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('query', models.CharField(max_length=500)),
+                ('params', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='queued', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(null=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('lease_expires_at', models.DateTimeField(null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('sites', models.JSONField(default=dict)),
+                ('schedule', models.JSONField(default=dict)),
+                ('result_id', models.CharField(blank=True, max_length=32)),
+                ('results', models.JSONField(null=True)),
+                ('errors', models.JSONField(null=True)),
+                ('execution_time', models.FloatField(null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'created_at'], name='scraper_sea_status_186923_idx')],
+            },
+        ),
+    ]
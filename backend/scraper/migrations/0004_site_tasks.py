@@ -0,0 +1,79 @@
+# Generated by Django 5.1.7 on 2026-10-18 02:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0003_search_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkerNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('host', models.CharField(max_length=255)),
+                ('pid', models.PositiveIntegerField()),
+                ('concurrency', models.PositiveSmallIntegerField()),
+                ('browsers', models.PositiveSmallIntegerField()),
+                ('started_at', models.DateTimeField()),
+                ('last_heartbeat', models.DateTimeField()),
+                ('stopped_at', models.DateTimeField(null=True)),
+                ('shard', models.JSONField(default=list)),
+                ('running', models.PositiveSmallIntegerField(default=0)),
+                ('tasks_done', models.PositiveIntegerField(default=0)),
+                ('tasks_failed', models.PositiveIntegerField(default=0)),
+                ('tasks_stolen', models.PositiveIntegerField(default=0)),
+                ('products', models.PositiveIntegerField(default=0)),
+                ('busy_seconds', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RemoveField(
+            model_name='searchjob',
+            name='attempts',
+        ),
+        migrations.RemoveField(
+            model_name='searchjob',
+            name='lease_expires_at',
+        ),
+        migrations.RemoveField(
+            model_name='searchjob',
+            name='schedule',
+        ),
+        migrations.RemoveField(
+            model_name='searchjob',
+            name='sites',
+        ),
+        migrations.RemoveField(
+            model_name='searchjob',
+            name='worker',
+        ),
+        migrations.CreateModel(
+            name='SiteTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('site', models.CharField(max_length=50)),
+                ('status', models.CharField(choices=[('queued', 'queued'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='queued', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(null=True)),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('lease_expires_at', models.DateTimeField(null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('stolen', models.BooleanField(default=False)),
+                ('report', models.JSONField(default=dict)),
+                ('results', models.JSONField(null=True)),
+                ('product_count', models.PositiveIntegerField(default=0)),
+                ('matches', models.PositiveIntegerField(default=0)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='scraper.searchjob')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'site', 'created_at'], name='scraper_sit_status_40fb9a_idx'), models.Index(fields=['worker', 'finished_at'], name='scraper_sit_worker_f0c396_idx')],
+                'constraints': [models.UniqueConstraint(fields=('job', 'site'), name='unique_task_per_site')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0004_site_tasks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrewarmRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(null=True)),
+                ('planned', models.PositiveIntegerField(default=0)),
+                ('refreshed', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('skipped', models.PositiveIntegerField(default=0)),
+                ('browser_seconds', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuerySiteStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255)),
+                ('site', models.CharField(max_length=50)),
+                ('day', models.DateField()),
+                ('lookups', models.PositiveIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('prewarmed_hits', models.PositiveIntegerField(default=0)),
+                ('seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'site'], name='scraper_que_day_1ae3ac_idx')],
+                'constraints': [models.UniqueConstraint(fields=('query', 'site', 'day'), name='unique_query_site_per_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255)),
+                ('day', models.DateField()),
+                ('searches', models.PositiveIntegerField(default=0)),
+                ('seconds', models.FloatField(default=0)),
+                ('max_seconds', models.FloatField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'query'], name='scraper_sea_day_2dcf8e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('query', 'day'), name='unique_query_per_day')],
+            },
+        ),
+    ]
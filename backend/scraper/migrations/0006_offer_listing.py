@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 03:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scraper', '0005_query_log'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='offer',
+            name='unique_offer_per_site',
+        ),
+        migrations.AddField(
+            model_name='offer',
+            name='listing',
+            field=models.CharField(default='', max_length=40),
+        ),
+        migrations.AddConstraint(
+            model_name='offer',
+            constraint=models.UniqueConstraint(fields=('product', 'site', 'listing'), name='unique_offer_listing'),
+        ),
+    ]
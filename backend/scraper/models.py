@@ -1,3 +1,222 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class CatalogProduct(models.Model):
+    """A product seen on any site, identified across sites by its normalized name."""
+
+    normalized_name = models.CharField(max_length=255, unique=True)
+    name = models.CharField(max_length=500)
+    material = models.CharField(max_length=100, default='N/A')
+    first_seen = models.DateTimeField()
+    last_seen = models.DateTimeField()
+
+    def __str__(self):
+        return self.name
+
+
+class Offer(models.Model):
+    """The latest state of one listing of a catalog product on one site."""
+
+    product = models.ForeignKey(CatalogProduct, on_delete=models.CASCADE, related_name='offers')
+    site = models.CharField(max_length=100)
+    listing = models.CharField(max_length=40, default='')  # Tells apart listings on a site sharing a name
+    price = models.FloatField(null=True)
+    price_display = models.CharField(max_length=100)
+    mrp = models.FloatField(null=True)
+    image = models.TextField()
+    rating = models.CharField(max_length=100)
+    rating_value = models.FloatField(null=True)
+    review_count = models.IntegerField(null=True)
+    scraped_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'site', 'listing'], name='unique_offer_listing'),
+        ]
+        indexes = [
+            models.Index(fields=['site', 'price']),
+            models.Index(fields=['price']),
+        ]
+
+    def __str__(self):
+        return f"{self.product} on {self.site}"
+
+
+class ScrapeRun(models.Model):
+    """One completed scrape of a site for a normalized query."""
+
+    site = models.CharField(max_length=50)
+    query = models.CharField(max_length=255)
+    tier = models.CharField(max_length=20, blank=True)
+    product_count = models.PositiveIntegerField(default=0)
+    exhausted = models.BooleanField(default=True)  # The site had no more results than were read
+    finished_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['query', 'site', '-finished_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.site}: {self.query}"
+
+
+class RunResult(models.Model):
+    """An offer returned by a scrape run, at its position in the site's results."""
+
+    run = models.ForeignKey(ScrapeRun, on_delete=models.CASCADE, related_name='results')
+    offer = models.ForeignKey(Offer, on_delete=models.CASCADE, related_name='run_results')
+    position = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['run', 'position'], name='unique_run_position'),
+        ]
+
+
+class SearchJob(models.Model):
+    """A search submitted through the job API, run as one site task per site by the scraper workers."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(status, status) for status in (QUEUED, RUNNING, DONE, FAILED)]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    query = models.CharField(max_length=500)
+    params = models.JSONField(default=dict)  # sites, timeout, filters, sort and limit of the search
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)  # When a worker took the first of its site tasks
+    finished_at = models.DateTimeField(null=True)
+    result_id = models.CharField(max_length=32, blank=True)  # Stored result set behind the job's cursors
+    results = models.JSONField(null=True)  # All products found, once done
+    errors = models.JSONField(null=True)
+    execution_time = models.FloatField(null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.query} ({self.status})"
+
+
+class SiteTask(models.Model):
+    """The scrape of one site for a search job, claimed by a scraper worker."""
+
+    STATUS_CHOICES = SearchJob.STATUS_CHOICES
+
+    job = models.ForeignKey(SearchJob, on_delete=models.CASCADE, related_name='tasks')
+    site = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=SearchJob.QUEUED)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+    # The worker running the task holds it until its lease expires; then any worker may take it over
+    worker = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    stolen = models.BooleanField(default=False)  # Run by a worker the site is not sharded to
+    report = models.JSONField(default=dict)  # The site's report, once done
+    results = models.JSONField(null=True)
+    product_count = models.PositiveIntegerField(default=0)
+    matches = models.PositiveIntegerField(default=0)  # Products passing the job's filters, toward its limit
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'site'], name='unique_task_per_site'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'site', 'created_at']),
+            models.Index(fields=['worker', 'finished_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.site}: {self.job.query} ({self.status})"
+
+
+class WorkerNode(models.Model):
+    """A scraper worker process, with its heartbeat, its shard of the sites and its counters."""
+
+    name = models.CharField(max_length=100, unique=True)
+    host = models.CharField(max_length=255)
+    pid = models.PositiveIntegerField()
+    concurrency = models.PositiveSmallIntegerField()
+    browsers = models.PositiveSmallIntegerField()
+    started_at = models.DateTimeField()
+    last_heartbeat = models.DateTimeField()
+    stopped_at = models.DateTimeField(null=True)
+    shard = models.JSONField(default=list)  # Sites sharded to the node at its last heartbeat
+    running = models.PositiveSmallIntegerField(default=0)
+    tasks_done = models.PositiveIntegerField(default=0)
+    tasks_failed = models.PositiveIntegerField(default=0)
+    tasks_stolen = models.PositiveIntegerField(default=0)
+    products = models.PositiveIntegerField(default=0)
+    busy_seconds = models.FloatField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class SearchQuery(models.Model):
+    """Searches for a normalized query on one day, with their total and slowest latency."""
+
+    query = models.CharField(max_length=255)
+    day = models.DateField()
+    searches = models.PositiveIntegerField(default=0)
+    seconds = models.FloatField(default=0)
+    max_seconds = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['query', 'day'], name='unique_query_per_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'query']),
+        ]
+
+    def __str__(self):
+        return f"{self.query} ({self.day})"
+
+
+class QuerySiteStat(models.Model):
+    """Lookups of one site's results for a normalized query on one day, and how many the cache answered."""
+
+    query = models.CharField(max_length=255)
+    site = models.CharField(max_length=50)
+    day = models.DateField()
+    lookups = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)  # Answered from the result cache, fresh or stale
+    prewarmed_hits = models.PositiveIntegerField(default=0)  # ... from results a pre-warm refresh stored
+    seconds = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['query', 'site', 'day'], name='unique_query_site_per_day'),
+        ]
+        indexes = [
+            models.Index(fields=['day', 'site']),
+        ]
+
+    def __str__(self):
+        return f"{self.site}: {self.query} ({self.day})"
+
+
+class PrewarmRun(models.Model):
+    """One pass of the pre-warm scheduler over the most searched queries."""
+
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True)
+    planned = models.PositiveIntegerField(default=0)  # (site, query) pairs due for a refresh
+    refreshed = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)  # Left for the next run once the browser budget ran out
+    browser_seconds = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"Pre-warm run {self.started_at}"
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import socket
+from datetime import timedelta
+
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import SiteTask, WorkerNode
+
+THROUGHPUT_WINDOW = 300  # Seconds of finished tasks a node's recent throughput is measured over
+
+
+def shard_weight(node, site):
+    """Rendezvous-hashing weight of ``site`` on ``node``; the live node with the highest weight owns the site."""
+    digest = hashlib.blake2b(f"{node}\0{site}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def assign_sites(sites, nodes):
+    """Map each site to the node it is sharded to.
+
+    Rendezvous hashing: a site stays on its node for as long as that node is
+    live, and when a node joins or leaves only the sites it gains or loses move.
+    """
+    nodes = sorted(nodes)
+    if not nodes:
+        return {}
+    return {site: max(nodes, key=lambda node: shard_weight(node, site)) for site in sites}
+
+
+def register_node(name, concurrency, browsers):
+    now = timezone.now()
+    WorkerNode.objects.update_or_create(name=name, defaults={
+        'host': socket.gethostname(), 'pid': os.getpid(), 'concurrency': concurrency, 'browsers': browsers,
+        'started_at': now, 'last_heartbeat': now, 'stopped_at': None, 'running': 0,
+    })
+
+
+def heartbeat(name, running, shard):
+    WorkerNode.objects.filter(name=name).update(last_heartbeat=timezone.now(), running=running, shard=shard)
+
+
+def stop_node(name):
+    """Take a node out of sharding straight away, instead of after its heartbeat times out."""
+    WorkerNode.objects.filter(name=name).update(stopped_at=timezone.now(), running=0, shard=[])
+
+
+def record_task(name, task, failed, seconds):
+    """Add a finished site task to its node's counters."""
+    WorkerNode.objects.filter(name=name).update(
+        tasks_done=F('tasks_done') + int(not failed),
+        tasks_failed=F('tasks_failed') + int(failed),
+        tasks_stolen=F('tasks_stolen') + int(task.stolen),
+        products=F('products') + task.product_count,
+        busy_seconds=F('busy_seconds') + seconds,
+    )
+
+
+def live_nodes(timeout):
+    """Names of the nodes that sent a heartbeat within the last ``timeout`` seconds."""
+    return list(WorkerNode.objects.filter(
+        stopped_at__isnull=True, last_heartbeat__gte=timezone.now() - timedelta(seconds=timeout),
+    ).values_list('name', flat=True))
+
+
+def node_stats(timeout, window=THROUGHPUT_WINDOW):
+    """Describe every known node: liveness, shard, load, counters and recent throughput per minute."""
+    now = timezone.now()
+    recent = {
+        row['worker']: row for row in SiteTask.objects
+        .filter(finished_at__gte=now - timedelta(seconds=window)).exclude(worker='')
+        .values('worker').order_by().annotate(tasks=Count('pk'), products=Sum('product_count'))
+    }
+    nodes = []
+    for node in WorkerNode.objects.order_by('name'):
+        uptime = max((now - node.started_at).total_seconds(), 1)
+        live = node.stopped_at is None and (now - node.last_heartbeat).total_seconds() <= timeout
+        window_seconds = min(window, uptime)
+        done = recent.get(node.name, {})
+        nodes.append({
+            'name': node.name,
+            'host': node.host,
+            'pid': node.pid,
+            'live': live,
+            'heartbeat_age': round((now - node.last_heartbeat).total_seconds(), 1),
+            'shard': node.shard if live else [],
+            'concurrency': node.concurrency,
+            'browsers': node.browsers,
+            'running': node.running if live else 0,
+            'tasks_done': node.tasks_done,
+            'tasks_failed': node.tasks_failed,
+            'tasks_stolen': node.tasks_stolen,
+            'products': node.products,
+            'utilization': round(node.busy_seconds / (uptime * node.concurrency), 3),
+            'tasks_per_minute': round(done.get('tasks', 0) * 60 / window_seconds, 2),
+            'products_per_minute': round((done.get('products') or 0) * 60 / window_seconds, 2),
+        })
+    return nodes
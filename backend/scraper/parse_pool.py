@@ -0,0 +1,142 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+from django.conf import settings
+
+from .deadline import DeadlineExceeded
+from .parsing import parser_backend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)  # Parser processes; 0 parses in the calling thread
+SHARED_MEMORY_MIN_BYTES = 256 * 1024  # Pages at least this large are handed over in shared memory
+
+
+def _init_worker():
+    # Spawned workers start without Django; building products imports the models
+    import django
+
+    django.setup()
+
+
+def _parse_job(site, page, backend, limit=None):
+    """Parse one page in a worker process.
+
+    ``page`` is either the page text or ``(shm_name, size)`` of a UTF-8
+    buffer in shared memory, which the parent unlinks once this returns.
+    """
+    if isinstance(page, tuple):
+        name, size = page
+        buffer = shared_memory.SharedMemory(name=name)
+        try:
+            page = bytes(buffer.buf[:size]).decode('utf-8')
+        finally:
+            buffer.close()
+    from .sites import get_site
+
+    return get_site(site).parse(page, backend=backend, limit=limit)
+
+
+class ParsePool:
+    """Pipeline stage that parses fetched pages in worker processes.
+
+    Fetch threads hand the raw HTML over and wait for the normalized
+    products, so BeautifulSoup work runs outside the web process's GIL and
+    concurrent searches parse on all cores. Large pages travel through shared
+    memory rather than being pickled into the worker pipe.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {'pooled': 0, 'inline': 0, 'shared_memory': 0, 'restarts': 0}
+
+    def parse(self, adapter, page_source, deadline=None, limit=None):
+        """Return the first ``limit`` products in ``page_source``, parsed in a worker if possible."""
+        backend = parser_backend()
+        executor = self._get_executor()
+        if executor is None:
+            self._count('inline')
+            return adapter.parse(page_source, backend=backend, limit=limit)
+
+        buffer = None
+        payload = page_source
+        encoded = page_source.encode('utf-8')
+        if len(encoded) >= SHARED_MEMORY_MIN_BYTES:
+            buffer = shared_memory.SharedMemory(create=True, size=len(encoded))
+            buffer.buf[:len(encoded)] = encoded
+            payload = (buffer.name, len(encoded))
+            self._count('shared_memory')
+        try:
+            future = executor.submit(_parse_job, adapter.key, payload, backend, limit)
+            self._count('pooled')
+            return future.result(timeout=deadline.remaining() if deadline is not None else None)
+        except FuturesTimeoutError:
+            future.cancel()
+            raise DeadlineExceeded(f"Deadline passed while parsing {adapter.key}")
+        except BrokenProcessPool as e:
+            logger.error(f"Parser process pool broke, restarting it: {e}")
+            self._reset(executor)
+            self._count('inline')
+            return adapter.parse(page_source, backend=backend, limit=limit)
+        finally:
+            if buffer is not None:
+                buffer.close()
+                buffer.unlink()
+
+    def stats(self):
+        with self._lock:
+            return {'workers': self.workers, **self._stats}
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self):
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers don't inherit the web process's threads or browsers
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def _reset(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self._stats['restarts'] += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+
+def parse_page(adapter, page_source, deadline=None, limit=None):
+    """Parse a page fetched for ``adapter``'s site through the shared parse pool."""
+    return get_parse_pool().parse(adapter, page_source, deadline, limit)
+
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool():
+    """Return the process-wide parse pool, creating it on first use."""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ParsePool(workers=getattr(settings, 'SCRAPER_PARSE_WORKERS', DEFAULT_WORKERS))
+        return _parse_pool
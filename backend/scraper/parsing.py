@@ -0,0 +1,67 @@
+import logging
+import re
+
+import soupsieve
+from bs4 import BeautifulSoup
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = 'lxml'
+except ImportError:  # Fall back to the pure-Python parser
+    DEFAULT_PARSER = 'html.parser'
+
+
+def has_class(name):
+    """Match a class token in a SoupStrainer, which sees the unsplit attribute while parsing."""
+    return re.compile(rf'(?:^|\s){re.escape(name)}(?:\s|$)')
+
+
+class CompiledSpec:
+    """A site's card and field selectors, compiled once."""
+
+    def __init__(self, spec):
+        self.cards = soupsieve.compile(spec['cards'])
+        self.limit = spec['limit']
+        self.fields = [
+            (field, [soupsieve.compile(selector) for selector in rule['selectors']], rule['attr'])
+            for field, rule in spec['fields'].items()
+        ]
+
+    def row(self, card):
+        row = {}
+        for field, selectors, attr in self.fields:
+            value = None
+            for selector in selectors:
+                element = selector.select_one(card)
+                if element is not None:
+                    if attr is None:
+                        value = element.text
+                    elif attr in element.attrs:
+                        value = element[attr]
+                    break
+            row[field] = value
+        return row
+
+
+def parser_backend():
+    return getattr(settings, 'SCRAPER_HTML_PARSER', DEFAULT_PARSER)
+
+
+def parse_rows(page_source, spec, strainer, backend=None, limit=None):
+    """Return the raw field strings of the product cards in ``page_source``.
+
+    Only elements matched by ``strainer`` (the product cards and everything
+    inside them) are built into the tree; the rest of the page is skipped.
+    At most ``limit`` cards are read, the spec's own limit by default.
+    """
+    soup = BeautifulSoup(page_source, backend or parser_backend(), parse_only=strainer)
+    rows = []
+    for card in spec.cards.select(soup, limit=limit or spec.limit):
+        try:
+            rows.append(spec.row(card))
+        except Exception as e:
+            logger.error(f"Error parsing product card: {e}")
+    return rows
@@ -0,0 +1,166 @@
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .cache import get_result_cache
+from .deadline import STATUS_OK
+from .http_fetch import TIER_SELENIUM
+from .models import PrewarmRun, QuerySiteStat, SearchQuery
+from .sites import get_site_registry
+from .utils import refresh_site
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable from Django settings
+DEFAULT_TOP_QUERIES = 20  # Most searched queries kept warm per site
+DEFAULT_WINDOW_DAYS = 7  # Days of the query log popularity is counted over
+DEFAULT_LEAD_SECONDS = 120  # Results expiring within this many seconds are refreshed
+DEFAULT_BROWSERS = 1  # Refreshes running at once, each holding at most one browser
+DEFAULT_BROWSER_MINUTES = 5.0  # Browser time one pre-warm run may spend
+DEFAULT_INTERVAL = 60  # Seconds between runs of the scheduler
+REPORT_TOP_QUERIES = 10  # Queries listed in the report
+
+
+class Prewarmer:
+    """Refreshes each site's most searched queries before their cached results expire.
+
+    Popularity comes from the query log. A run refreshes the due (site,
+    query) pairs most searched first, ``browsers`` at a time at background
+    priority, and stops starting refreshes once ``browser_minutes`` of
+    browser time are spent; HTTP-tier refreshes cost no browser time.
+    """
+
+    def __init__(self, top_queries=DEFAULT_TOP_QUERIES, window_days=DEFAULT_WINDOW_DAYS,
+                 lead_seconds=DEFAULT_LEAD_SECONDS, browsers=DEFAULT_BROWSERS, browser_minutes=DEFAULT_BROWSER_MINUTES):
+        self.top_queries = top_queries
+        self.window_days = window_days
+        self.lead_seconds = lead_seconds
+        self.browsers = browsers
+        self.browser_minutes = browser_minutes
+
+    def plan(self):
+        """Return the (site, query) pairs to refresh, most searched first."""
+        registry = get_site_registry()
+        since = timezone.localdate() - timedelta(days=self.window_days - 1)
+        popular = (QuerySiteStat.objects.filter(day__gte=since)
+                   .values('site', 'query').annotate(lookups=Sum('lookups')).order_by('-lookups', 'query'))
+        per_site = defaultdict(int)
+        due = []
+        cache = get_result_cache()
+        for row in popular.iterator():
+            site, query = row['site'], row['query']
+            if per_site[site] >= self.top_queries or registry.get(site) is None:
+                continue
+            per_site[site] += 1
+            expires_in = cache.expires_in(site, query)
+            if expires_in is None or expires_in <= self.lead_seconds:
+                due.append((site, query))
+        return due
+
+    def run(self):
+        """Refresh what is due within the browser budget; returns the run's record."""
+        run = PrewarmRun.objects.create(started_at=timezone.now())
+        due = self.plan()
+        run.planned = len(due)
+        budget = self.browser_minutes * 60
+        pending = iter(due)
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.browsers, thread_name_prefix='prewarm') as executor:
+            while True:
+                while len(running) < self.browsers and run.browser_seconds < budget:
+                    item = next(pending, None)
+                    if item is None:
+                        break
+                    running.add(executor.submit(self._refresh, *item))
+                if not running:
+                    break
+                finished, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    ok, browser_seconds = future.result()
+                    run.refreshed += ok
+                    run.failed += not ok
+                    run.browser_seconds += browser_seconds
+        run.skipped = run.planned - run.refreshed - run.failed
+        run.finished_at = timezone.now()
+        run.save()
+        logger.info(f"Pre-warmed {run.refreshed} of {run.planned} due queries "
+                    f"({run.failed} failed, {run.skipped} over budget) in {run.browser_seconds / 60:.1f} browser minutes")
+        return run
+
+    def _refresh(self, site, query):
+        """Refresh one site's results; returns whether it worked and the browser seconds it took."""
+        report = {}
+        started = time.monotonic()
+        try:
+            products = refresh_site(get_site_registry().get(site), query, report=report)
+            ok = report.get('status') == STATUS_OK and bool(products)
+        except Exception as e:
+            logger.error(f"Error pre-warming {site} for {query}: {e}")
+            ok = False
+        finally:
+            close_old_connections()
+        browser_seconds = time.monotonic() - started if report.get('tier') == TIER_SELENIUM else 0
+        return ok, browser_seconds
+
+
+def prewarm_report(days=DEFAULT_WINDOW_DAYS):
+    """Summarize the last ``days`` of searches and pre-warming: hit rates, latency and browser time spent."""
+    since = timezone.localdate() - timedelta(days=days - 1)
+    searches = SearchQuery.objects.filter(day__gte=since).aggregate(searches=Sum('searches'), seconds=Sum('seconds'))
+    lookups = QuerySiteStat.objects.filter(day__gte=since).aggregate(
+        lookups=Sum('lookups'), hits=Sum('hits'), prewarmed_hits=Sum('prewarmed_hits'),
+    )
+    runs = PrewarmRun.objects.filter(started_at__date__gte=since).aggregate(
+        runs=Count('pk'), refreshed=Sum('refreshed'), failed=Sum('failed'), skipped=Sum('skipped'),
+        browser_seconds=Sum('browser_seconds'),
+    )
+    top = (SearchQuery.objects.filter(day__gte=since).values('query')
+           .annotate(searches=Sum('searches'), seconds=Sum('seconds'), max_seconds=Max('max_seconds'))
+           .order_by('-searches', 'query')[:REPORT_TOP_QUERIES])
+
+    search_count = searches['searches'] or 0
+    lookup_count = lookups['lookups'] or 0
+    prewarmed_hits = lookups['prewarmed_hits'] or 0
+    browser_minutes = (runs['browser_seconds'] or 0) / 60
+    return {
+        'days': days,
+        'searches': search_count,
+        'avg_search_seconds': round(searches['seconds'] / search_count, 2) if search_count else None,
+        'site_lookups': lookup_count,
+        'cache_hit_rate': round((lookups['hits'] or 0) / lookup_count, 3) if lookup_count else None,
+        'prewarm_hit_rate': round(prewarmed_hits / lookup_count, 3) if lookup_count else None,
+        'prewarmed_hits': prewarmed_hits,
+        'prewarm_runs': runs['runs'],
+        'refreshed': runs['refreshed'] or 0,
+        'failed': runs['failed'] or 0,
+        'skipped': runs['skipped'] or 0,
+        'browser_minutes': round(browser_minutes, 2),
+        'prewarmed_hits_per_browser_minute': round(prewarmed_hits / browser_minutes, 1) if browser_minutes else None,
+        'top_queries': [
+            {
+                'query': row['query'],
+                'searches': row['searches'],
+                'avg_seconds': round(row['seconds'] / row['searches'], 2),
+                'max_seconds': round(row['max_seconds'], 2),
+            }
+            for row in top
+        ],
+    }
+
+
+def build_prewarmer():
+    """Build a pre-warmer configured from the Django settings."""
+    return Prewarmer(
+        top_queries=getattr(settings, 'SCRAPER_PREWARM_TOP_QUERIES', DEFAULT_TOP_QUERIES),
+        window_days=getattr(settings, 'SCRAPER_PREWARM_WINDOW_DAYS', DEFAULT_WINDOW_DAYS),
+        lead_seconds=getattr(settings, 'SCRAPER_PREWARM_LEAD_SECONDS', DEFAULT_LEAD_SECONDS),
+        browsers=getattr(settings, 'SCRAPER_PREWARM_BROWSERS', DEFAULT_BROWSERS),
+        browser_minutes=getattr(settings, 'SCRAPER_PREWARM_BROWSER_MINUTES', DEFAULT_BROWSER_MINUTES),
+    )
@@ -0,0 +1,135 @@
+import atexit
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import CACHE_HIT, CACHE_STALE, normalize_query
+from .models import QuerySiteStat, SearchQuery
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable from Django settings
+DEFAULT_FLUSH_SECONDS = 10.0  # Longest a search's counts wait in memory before they are written
+
+
+class QueryLog:
+    """Counts searches per normalized query and day, with their latency and per-site cache hits.
+
+    ``record`` only adds to in-memory counters, so searches never wait on
+    the database; a background thread adds them to the daily rows every
+    ``flush_seconds``. Counting per day keeps the table bounded by distinct
+    queries rather than searches.
+    """
+
+    def __init__(self, flush_seconds=DEFAULT_FLUSH_SECONDS):
+        self.flush_seconds = flush_seconds
+        self._queries = defaultdict(lambda: [0, 0.0, 0.0])  # searches, seconds, slowest
+        self._sites = defaultdict(lambda: [0, 0, 0, 0.0])  # lookups, hits, prewarmed hits, seconds
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats = {'searches': 0, 'flushes': 0, 'errors': 0}
+
+    def record(self, query, seconds, site_reports):
+        """Count a search for ``query`` that took ``seconds``, with the cache status of each site it looked up."""
+        query = normalize_query(query)[:255]
+        if not query:
+            return
+        day = timezone.localdate()
+        with self._lock:
+            counts = self._queries[(query, day)]
+            counts[0] += 1
+            counts[1] += seconds
+            counts[2] = max(counts[2], seconds)
+            for site, report in site_reports.items():
+                # Sites skipped before their results were looked up aren't counted
+                if not report.get('cache'):
+                    continue
+                counts = self._sites[(query, site, day)]
+                counts[0] += 1
+                counts[1] += report['cache'] in (CACHE_HIT, CACHE_STALE)
+                counts[2] += bool(report.get('prewarmed'))
+                counts[3] += report.get('elapsed') or 0
+            self._stats['searches'] += 1
+        self._start()
+
+    def flush(self):
+        """Write the counts gathered since the last flush."""
+        with self._lock:
+            queries, self._queries = self._queries, defaultdict(lambda: [0, 0.0, 0.0])
+            sites, self._sites = self._sites, defaultdict(lambda: [0, 0, 0, 0.0])
+        if not queries and not sites:
+            return
+        try:
+            for (query, day), (searches, seconds, slowest) in queries.items():
+                _increment(SearchQuery, {'query': query, 'day': day},
+                           {'searches': searches, 'seconds': seconds}, {'max_seconds': slowest})
+            for (query, site, day), (lookups, hits, prewarmed_hits, seconds) in sites.items():
+                _increment(QuerySiteStat, {'query': query, 'site': site, 'day': day},
+                           {'lookups': lookups, 'hits': hits, 'prewarmed_hits': prewarmed_hits, 'seconds': seconds})
+        except Exception as e:
+            logger.error(f"Error writing the query log: {e}")
+            with self._lock:
+                self._stats['errors'] += 1
+            return
+        with self._lock:
+            self._stats['flushes'] += 1
+
+    def close(self):
+        """Stop the flush thread, writing what is left."""
+        self._stop.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(self.flush_seconds)
+
+    def stats(self):
+        with self._lock:
+            return {'pending_queries': len(self._queries), **self._stats}
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-log', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_seconds):
+            close_old_connections()
+            self.flush()
+        self.flush()
+
+
+def _increment(model, lookup, counts, maxima=None):
+    """Add ``counts`` to (and raise ``maxima`` on) the row matching ``lookup``, creating it if needed."""
+    maxima = maxima or {}
+    changes = {field: F(field) + value for field, value in counts.items()}
+    changes.update({field: Greatest(F(field), value) for field, value in maxima.items()})
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **counts, **maxima)
+    except IntegrityError:
+        # Another process created the row first
+        model.objects.filter(**lookup).update(**changes)
+
+
+_query_log = None
+_query_log_lock = threading.Lock()
+
+
+def get_query_log():
+    """Return the process-wide query log, creating it on first use."""
+    global _query_log
+    with _query_log_lock:
+        if _query_log is None:
+            _query_log = QueryLog(flush_seconds=getattr(settings, 'SCRAPER_QUERY_LOG_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS))
+            atexit.register(_query_log.close)
+        return _query_log
@@ -0,0 +1,68 @@
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Report error of sites skipped because the search already had its results
+LIMIT_REACHED = "Result limit reached before the site was scraped"
+
+_context = threading.local()
+
+
+class ResultQuota:
+    """How many matching products a search still needs across all its sites.
+
+    A search with a ``limit`` shares one quota between its site scrapes.
+    Each site reports the products it has read so far, as often as it likes;
+    only those passing the search's filters count. Once the sites together
+    hold ``limit`` matches, scrapes in progress stop paging or scrolling and
+    sites not yet started are skipped.
+    """
+
+    def __init__(self, limit, min_price=0, max_price=float('inf'), min_rating=0):
+        self.limit = limit
+        self.filters = {'min_price': min_price, 'max_price': max_price, 'min_rating': min_rating}
+        self._matches = {}
+        self._lock = threading.Lock()
+
+    def update(self, site, products):
+        """Record the products ``site`` has found so far, replacing its earlier count."""
+        from .results import ResultSet
+
+        self.record(site, len(ResultSet(products).filter(**self.filters)))
+
+    def record(self, site, matches):
+        """Record ``site``'s count of matching products, e.g. counted by another worker."""
+        with self._lock:
+            self._matches[site] = matches
+            found = sum(self._matches.values())
+        if found >= self.limit:
+            logger.debug(f"Result limit of {self.limit} met after {site}")
+
+    def matches(self):
+        with self._lock:
+            return sum(self._matches.values())
+
+    def met(self):
+        return self.matches() >= self.limit
+
+    def stats(self):
+        with self._lock:
+            return {'limit': self.limit, 'matches': sum(self._matches.values()), 'sites': dict(self._matches)}
+
+
+@contextmanager
+def result_quota(quota):
+    """Count the products scraped by this thread toward ``quota``."""
+    previous = getattr(_context, 'quota', None)
+    _context.quota = quota
+    try:
+        yield quota
+    finally:
+        _context.quota = previous
+
+
+def current_quota():
+    """Return the quota of the scrape running in this thread, or None."""
+    return getattr(_context, 'quota', None)
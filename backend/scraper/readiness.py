@@ -0,0 +1,99 @@
+import logging
+import time
+
+from selenium.common.exceptions import TimeoutException
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CARD_LIMIT = 10  # Cards a scraper parses from a results page
+DEFAULT_MAX_SCROLLS = 5  # Scroll rounds before giving up on more cards
+QUIET_MS = 500  # A round ends once the DOM and network are idle for this long
+ROUND_TIMEOUT = 5  # seconds a single scroll round may wait for new cards
+
+# Scrolls to the bottom, then calls back with the card count once enough
+# cards exist, or once neither the DOM nor the network has changed for
+# `quietMs`, or after `maxMs` at the latest.
+SCROLL_AND_SETTLE_JS = """
+const [selector, limit, quietMs, maxMs, done] = arguments;
+const count = () => document.querySelectorAll(selector).length;
+let finished = false;
+let quietTimer = null;
+const observers = [];
+const finish = () => {
+  if (finished) return;
+  finished = true;
+  clearTimeout(quietTimer);
+  clearTimeout(capTimer);
+  observers.forEach(observer => observer.disconnect());
+  done(count());
+};
+const activity = () => {
+  if (count() >= limit) return finish();
+  clearTimeout(quietTimer);
+  quietTimer = setTimeout(finish, quietMs);
+};
+const capTimer = setTimeout(finish, maxMs);
+const mutations = new MutationObserver(activity);
+mutations.observe(document.body, {childList: true, subtree: true});
+observers.push(mutations);
+if (window.PerformanceObserver) {
+  try {
+    const network = new PerformanceObserver(activity);
+    network.observe({type: 'resource'});
+    observers.push(network);
+  } catch (e) {}
+}
+window.scrollTo(0, document.body.scrollHeight);
+activity();
+"""
+
+
+def wait_until_ready(driver, selector, limit=DEFAULT_CARD_LIMIT, deadline=None,
+                     max_scrolls=DEFAULT_MAX_SCROLLS, report=None, on_round=None):
+    """Scroll a results page until it holds ``limit`` cards or stops growing.
+
+    Each round scrolls to the bottom and waits in the page for DOM mutations
+    and network requests to go quiet, instead of sleeping a fixed time. The
+    page is left as soon as ``limit`` cards matching ``selector`` exist, or
+    when a round adds none. ``on_round``, if given, is called with the card
+    count whenever a round added cards and ends the scrolling by returning
+    True. Returns the final card count and, if ``report`` is given, records
+    the count, rounds and seconds spent under ``ready``.
+    """
+    started = time.monotonic()
+    cards = _count(driver, selector)
+    scrolls = 0
+    # The browser goes back to the pool: leave its script timeout as it was
+    script_timeout = None
+    try:
+        while cards < limit and scrolls < max_scrolls:
+            round_timeout = ROUND_TIMEOUT if deadline is None else deadline.timeout(ROUND_TIMEOUT)
+            if round_timeout <= 0:
+                break
+            if script_timeout is None:
+                script_timeout = driver.timeouts.script
+            driver.set_script_timeout(round_timeout + 1)
+            try:
+                found = driver.execute_async_script(
+                    SCROLL_AND_SETTLE_JS, selector, limit, QUIET_MS, int(round_timeout * 1000)
+                )
+            except TimeoutException:
+                found = _count(driver, selector)
+            scrolls += 1
+            if found <= cards:
+                break
+            cards = found
+            if on_round is not None and on_round(cards):
+                break
+    finally:
+        if script_timeout is not None:
+            driver.set_script_timeout(script_timeout)
+
+    if report is not None:
+        report['ready'] = {'cards': cards, 'scrolls': scrolls, 'seconds': round(time.monotonic() - started, 2)}
+    logger.debug(f"Page ready with {cards} cards after {scrolls} scrolls")
+    return cards
+
+
+def _count(driver, selector):
+    return driver.execute_script("return document.querySelectorAll(arguments[0]).length;", selector)
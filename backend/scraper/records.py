@@ -0,0 +1,143 @@
+import json
+import operator
+from json.encoder import encode_basestring
+
+# Fields of a product record, in the order they are serialized
+PRODUCT_FIELDS = (
+    'name', 'price', 'price_display', 'image', 'material', 'rating', 'rating_value', 'review_count', 'site', 'mrp'
+)
+
+RECORDS_PER_CHUNK = 256  # Product records joined into one chunk of rendered JSON
+
+
+class Product:
+    """A scraped product, stored in slots rather than a per-product dict.
+
+    Records read like the dicts they replace (``product['price']``,
+    ``product.get('rating')``, ``dict(product)``), pickle as a plain tuple of
+    values for the caches and parse workers, and are written straight to
+    JSON by ``iter_json``.
+    """
+
+    __slots__ = PRODUCT_FIELDS
+
+    def __init__(self, name, price, price_display, image, material, rating, rating_value, review_count, site,
+                 mrp=None):
+        self.name = name
+        self.price = price
+        self.price_display = price_display
+        self.image = image
+        self.material = material
+        self.rating = rating
+        self.rating_value = rating_value
+        self.review_count = review_count
+        self.site = site
+        self.mrp = mrp  # List price before discount, None if the site shows none
+
+    def values(self):
+        return tuple(getattr(self, field) for field in PRODUCT_FIELDS)
+
+    def keys(self):
+        return PRODUCT_FIELDS
+
+    def get(self, field, default=None):
+        return getattr(self, field) if field in PRODUCT_FIELDS else default
+
+    def as_dict(self):
+        return dict(zip(PRODUCT_FIELDS, self.values()))
+
+    def __getitem__(self, field):
+        if field not in PRODUCT_FIELDS:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def __contains__(self, field):
+        return field in PRODUCT_FIELDS
+
+    def __eq__(self, other):
+        if not isinstance(other, Product):
+            return NotImplemented
+        return self.values() == other.values()
+
+    def __reduce__(self):
+        return Product, self.values()
+
+    def __repr__(self):
+        return f"<Product {self.site}: {self.name}>"
+
+
+_field_values = operator.attrgetter(*PRODUCT_FIELDS)
+
+# A product's JSON object with a %s slot per encoded value, keys encoded once
+_PRODUCT_TEMPLATE = '{' + ','.join(f'{encode_basestring(field)}:%s' for field in PRODUCT_FIELDS) + '}'
+
+
+def _encode_value(value):
+    return json.dumps(value, ensure_ascii=False, allow_nan=False)
+
+
+def product_json(product):
+    """Encode one product record as a JSON object.
+
+    Text fields are almost always strings and numeric fields floats, ints or
+    None, so those are encoded inline; anything else takes ``json.dumps``.
+    """
+    (name, price, price_display, image, material, rating, rating_value, review_count, site,
+     mrp) = _field_values(product)
+    return _PRODUCT_TEMPLATE % (
+        encode_basestring(name) if name.__class__ is str else _encode_value(name),
+        'null' if price is None else repr(price),
+        encode_basestring(price_display) if price_display.__class__ is str else _encode_value(price_display),
+        encode_basestring(image) if image.__class__ is str else _encode_value(image),
+        encode_basestring(material) if material.__class__ is str else _encode_value(material),
+        encode_basestring(rating) if rating.__class__ is str else _encode_value(rating),
+        'null' if rating_value is None else repr(rating_value),
+        'null' if review_count is None else repr(review_count),
+        encode_basestring(site) if site.__class__ is str else _encode_value(site),
+        'null' if mrp is None else repr(mrp),
+    )
+
+
+def iter_json(value):
+    """Yield compact JSON for ``value`` in chunks.
+
+    Product records are encoded field by field, batched into chunks of
+    ``RECORDS_PER_CHUNK``; everything else (response metadata, products
+    cached as dicts) goes through ``json.dumps``.
+    """
+    if isinstance(value, Product):
+        yield product_json(value)
+    elif isinstance(value, dict):
+        yield '{'
+        for position, (key, item) in enumerate(value.items()):
+            yield (',' if position else '') + encode_basestring(str(key)) + ':'
+            yield from iter_json(item)
+        yield '}'
+    elif isinstance(value, (list, tuple)):
+        yield '['
+        batch = []
+        first = True
+        for item in value:
+            if isinstance(item, Product):
+                batch.append(product_json(item))
+                if len(batch) < RECORDS_PER_CHUNK:
+                    continue
+            if batch:
+                yield ('' if first else ',') + ','.join(batch)
+                batch = []
+                first = False
+            if not isinstance(item, Product):
+                if not first:
+                    yield ','
+                first = False
+                yield from iter_json(item)
+        if batch:
+            yield ('' if first else ',') + ','.join(batch)
+        yield ']'
+    else:
+        yield json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+
+
+def render_json(value):
+    """Return ``value`` as compact UTF-8 JSON."""
+    return ''.join(iter_json(value)).encode('utf-8')
@@ -0,0 +1,139 @@
+import logging
+
+import numpy as np
+
+from .utils import normalize_rating
+
+logger = logging.getLogger(__name__)
+
+# Sort keys accepted by ResultSet.sort; a leading '-' sorts descending
+SORT_COLUMNS = ('price', 'rating', 'reviews', 'discount', 'position')
+
+# Sort modes of the search API's `sort` parameter
+SORT_MODES = {
+    'price': ('price',),
+    'price_desc': ('-price',),
+    'rating': ('-rating', '-reviews', 'price'),
+    'discount': ('-discount', 'price'),
+    # Order the products were stored in: best match first for index searches
+    'relevance': ('position',),
+}
+DEFAULT_SORT = 'price'
+
+
+class ResultSet:
+    """Merged search results held column-wise for vectorized filtering and sorting.
+
+    Price, rating, review count and discount off the list price live in
+    NumPy arrays (NaN when missing) next to the product records they were
+    read from. Filters and sorts only compute a new array of row indices over
+    the same columns, so chaining them never copies or re-reads the products.
+    """
+
+    def __init__(self, products, _columns=None, _index=None):
+        self.products = products
+        if _columns is None:
+            _columns = self._build_columns(products)
+        self._columns = _columns
+        self._index = np.arange(len(products)) if _index is None else _index
+
+    @staticmethod
+    def _build_columns(products):
+        count = len(products)
+        price = np.full(count, np.nan)
+        rating = np.full(count, np.nan)
+        reviews = np.full(count, np.nan)
+        mrp = np.full(count, np.nan)
+        site = np.empty(count, dtype=object)
+        complete = np.zeros(count, dtype=bool)
+        for row, product in enumerate(products):
+            if product.get('price') is not None:
+                price[row] = product['price']
+            if 'rating_value' in product:
+                rating_value, review_count = product['rating_value'], product.get('review_count')
+            else:
+                # Cached results scraped before ratings were normalized
+                rating_value, review_count = normalize_rating(product.get('rating'))
+            if rating_value is not None:
+                rating[row] = rating_value
+            if review_count is not None:
+                reviews[row] = review_count
+            if product.get('mrp') is not None:
+                mrp[row] = product['mrp']
+            site[row] = product.get('site')
+            complete[row] = product.get('name') != 'N/A'
+        # Fraction off the list price; NaN (sorted last) without a higher list price
+        with np.errstate(invalid='ignore', divide='ignore'):
+            discount = np.where(mrp > price, (mrp - price) / mrp, np.nan)
+        return {
+            'price': price, 'rating': rating, 'reviews': reviews, 'discount': discount,
+            'position': np.arange(count, dtype=float), 'site': site, 'complete': complete,
+        }
+
+    def __len__(self):
+        return len(self._index)
+
+    def _view(self, index):
+        return ResultSet(self.products, self._columns, index)
+
+    def column(self, name):
+        """Return a column's values for the rows in this result set."""
+        return self._columns[name][self._index]
+
+    def filter(self, min_price=0, max_price=float('inf'), min_rating=0, sites=None):
+        """Keep complete products inside the price range, rating floor and sites.
+
+        Products without a name or price are always dropped; products without
+        a rating are dropped only when ``min_rating`` is set.
+        """
+        price = self.column('price')
+        # NaN compares false, so unpriced products fail the range check
+        mask = self.column('complete') & (price >= min_price) & (price <= max_price)
+        if min_rating > 0:
+            mask &= self.column('rating') >= min_rating
+        if sites is not None:
+            mask &= np.isin(self.column('site'), list(sites))
+        return self._view(self._index[mask])
+
+    def _sort_keys(self, keys):
+        """Build lexsort keys, primary key last, with missing values sorting last."""
+        arrays = []
+        for key in reversed(keys):
+            descending = key.startswith('-')
+            name = key.lstrip('-')
+            if name not in SORT_COLUMNS:
+                raise ValueError(f"Unknown sort key: {key}")
+            values = self.column(name)
+            if descending:
+                values = -values
+            arrays.append(np.where(np.isnan(values), np.inf, values))
+        return arrays
+
+    def sort(self, keys=('price',)):
+        """Stable multi-key sort, e.g. ``('-rating', 'price')``."""
+        if not len(self):
+            return self
+        order = np.lexsort(self._sort_keys(keys))
+        return self._view(self._index[order])
+
+    def top(self, k, keys=('price',)):
+        """Return the first ``k`` rows of ``sort(keys)`` without sorting every row.
+
+        Rows are partitioned on the primary key first; everything tied with
+        the k-th value is kept, so the result matches the full stable sort.
+        """
+        if k >= len(self):
+            return self.sort(keys)
+        if k <= 0:
+            return self._view(self._index[:0])
+        sort_keys = self._sort_keys(keys)
+        primary = sort_keys[-1]
+        threshold = np.partition(primary, k - 1)[k - 1]
+        candidates = np.flatnonzero(primary <= threshold)
+        order = np.lexsort([values[candidates] for values in sort_keys])[:k]
+        return self._view(self._index[candidates[order]])
+
+    def to_list(self):
+        """Return the products of this result set, in order."""
+        products = self.products
+        return [products[row] for row in self._index.tolist()]
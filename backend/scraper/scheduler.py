@@ -0,0 +1,105 @@
+import heapq
+import logging
+import threading
+
+from .admission import get_browser_admission
+from .http_fetch import TIER_HTTP
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SITE_SECONDS = 15.0  # Expected scrape duration of a site with no history
+EWMA_ALPHA = 0.3  # Weight of the latest duration in a site's moving estimate
+CACHED_SECONDS = 0.1  # Expected duration of a site served from the result cache
+
+class DurationEstimator:
+    """Moving estimate of how long a real (uncached) scrape of each site takes."""
+
+    def __init__(self, priors=None, default=DEFAULT_SITE_SECONDS, alpha=EWMA_ALPHA):
+        self.priors = priors or {}
+        self.default = default
+        self.alpha = alpha
+        self._estimates = {}
+        self._lock = threading.Lock()
+
+    def observe(self, site, seconds):
+        with self._lock:
+            estimate = self._estimates.get(site)
+            if estimate is None:
+                self._estimates[site] = seconds
+            else:
+                self._estimates[site] = estimate + self.alpha * (seconds - estimate)
+
+    def estimate(self, site):
+        with self._lock:
+            estimate = self._estimates.get(site)
+        if estimate is None:
+            return self.priors.get(site, self.default)
+        return estimate
+
+    def stats(self):
+        with self._lock:
+            return {site: round(seconds, 2) for site, seconds in self._estimates.items()}
+
+
+def predict_makespan(durations, workers):
+    """Return when the last of ``durations`` finishes if started in order on ``workers`` threads."""
+    loads = [0.0] * max(1, workers)
+    for duration in durations:
+        # Each job goes to the worker that frees up first
+        heapq.heapreplace(loads, loads[0] + duration)
+    return max(loads)
+
+
+def plan_schedule(predictions, workers, shortest_first=False):
+    """Order sites longest-expected first and predict the resulting makespan.
+
+    ``predictions`` maps each site to its expected duration. Returns the
+    dispatch order together with the predicted makespan of that order and of
+    the original submission order, so the gain can be compared.
+    ``shortest_first`` reverses the order, for searches that stop at their
+    first results rather than waiting for every site.
+    """
+    order = sorted(predictions, key=predictions.get, reverse=not shortest_first)
+    return {
+        'workers': workers,
+        'order': order,
+        'predicted': {site: round(predictions[site], 2) for site in order},
+        'predicted_makespan': round(predict_makespan([predictions[site] for site in order], workers), 2),
+        'unordered_predicted_makespan': round(predict_makespan(list(predictions.values()), workers), 2),
+    }
+
+
+def uses_browser(scraper):
+    """Whether ``scraper`` needs a browser for its first attempt (HTTP-tier sites don't)."""
+    return getattr(scraper, 'tier', None) != TIER_HTTP
+
+
+def worker_count(scrapers, limit):
+    """Size a search's scraper threads: returns (browser threads, HTTP threads).
+
+    Threads for Selenium-tier sites beyond the free browser slots would only
+    queue in admission control, so their count follows the live budget,
+    between one and ``limit``. HTTP-tier sites fetch without a browser and
+    get up to ``limit`` threads of their own, so a busy browser pool doesn't
+    hold them up.
+    """
+    browser_jobs = sum(1 for scraper in scrapers if uses_browser(scraper))
+    http_jobs = len(scrapers) - browser_jobs
+    browser = max(1, min(browser_jobs, limit, get_browser_admission().available())) if browser_jobs else 0
+    return browser, min(http_jobs, limit)
+
+
+_estimator = None
+_estimator_lock = threading.Lock()
+
+
+def get_duration_estimator():
+    """Return the process-wide site duration estimator."""
+    global _estimator
+    with _estimator_lock:
+        if _estimator is None:
+            from .sites import get_site_registry
+
+            # Starting estimates until real durations are observed
+            _estimator = DurationEstimator(priors={adapter.key: adapter.prior_seconds for adapter in get_site_registry()})
+        return _estimator
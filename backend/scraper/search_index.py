@@ -0,0 +1,186 @@
+import logging
+import re
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .models import CatalogProduct, Offer
+from .records import Product
+
+logger = logging.getLogger(__name__)
+
+# Defaults, overridable from Django settings
+DEFAULT_MAX_RESULTS = 200  # Best-ranked offers an index search returns
+DEFAULT_MAX_AGE = 7 * 24 * 3600  # Seconds since an offer was last scraped for it to be searchable
+MAX_TERMS = 12  # Query terms used for matching; the rest are ignored
+IN_CHUNK = 500  # Offer ids per indexing statement, within SQLite's variable limit
+
+FTS_TABLE = 'scraper_offer_fts'  # SQLite FTS5 table, rowid = offer id
+TSV_TABLE = 'scraper_offer_search'  # PostgreSQL tsvector table with a GIN index
+
+# Per-column weights: name, brand, material, site
+COLUMN_WEIGHTS = (10.0, 5.0, 2.0, 1.0)
+
+TERM_PATTERN = re.compile(r'\w+')
+
+# Columns an index search selects, in the order of Product's arguments
+RESULT_COLUMNS = (
+    'p.name, o.price, o.price_display, o.image, p.material, o.rating, o.rating_value, o.review_count, o.site, o.mrp'
+)
+
+
+class IndexUnavailable(Exception):
+    """The database has no product search index."""
+
+
+def _document_sql(vendor):
+    """SELECT producing (offer id, name, brand, material, site) for indexing offers."""
+    if vendor == 'postgresql':
+        brand = "CASE WHEN strpos(p.name, ' - ') > 0 THEN split_part(p.name, ' - ', 1) ELSE '' END"
+    else:
+        brand = "CASE WHEN instr(p.name, ' - ') > 0 THEN substr(p.name, 1, instr(p.name, ' - ') - 1) ELSE '' END"
+    return f"""
+        SELECT o.id, p.name, {brand}, CASE WHEN p.material = 'N/A' THEN '' ELSE p.material END, o.site
+        FROM {Offer._meta.db_table} o JOIN {CatalogProduct._meta.db_table} p ON p.id = o.product_id
+    """
+
+
+def _insert_sql(vendor, where=''):
+    if vendor == 'postgresql':
+        return f"""
+            INSERT INTO {TSV_TABLE} (offer_id, document)
+            SELECT id,
+                   setweight(to_tsvector('simple', name), 'A') || setweight(to_tsvector('simple', brand), 'B') ||
+                   setweight(to_tsvector('simple', material), 'C') || setweight(to_tsvector('simple', site), 'D')
+            FROM ({_document_sql(vendor)} {where}) AS documents (id, name, brand, material, site)
+            ON CONFLICT (offer_id) DO UPDATE SET document = EXCLUDED.document
+        """
+    return f"INSERT INTO {FTS_TABLE} (rowid, name, brand, material, site) {_document_sql(vendor)} {where}"
+
+
+def create_search_index(conn):
+    """Create the search index for ``conn``'s backend and index every existing offer."""
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                    f"USING fts5(name, brand, material, site, tokenize='unicode61 remove_diacritics 2')"
+                )
+            except DatabaseError as e:
+                logger.warning(f"SQLite has no FTS5 support, product search index not created: {e}")
+                return
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {TSV_TABLE} (
+                    offer_id bigint PRIMARY KEY REFERENCES {Offer._meta.db_table} (id) ON DELETE CASCADE,
+                    document tsvector NOT NULL
+                )
+            """)
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {TSV_TABLE}_document ON {TSV_TABLE} USING GIN (document)")
+        else:
+            return
+        cursor.execute(_insert_sql(conn.vendor))
+
+
+def drop_search_index(conn):
+    table = {'sqlite': FTS_TABLE, 'postgresql': TSV_TABLE}.get(conn.vendor)
+    if table is not None:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def update_index(offer_ids):
+    """Re-index the given offers, e.g. after an ingestion batch upserted them.
+
+    Runs in a savepoint: a database without the index keeps ingesting
+    products, they just aren't searchable.
+    """
+    vendor = connection.vendor
+    if vendor not in ('sqlite', 'postgresql') or not offer_ids:
+        return
+    offer_ids = list(offer_ids)
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(offer_ids), IN_CHUNK):
+                chunk = offer_ids[start:start + IN_CHUNK]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                if vendor == 'sqlite':
+                    # FTS5 tables have no upsert
+                    cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", chunk)
+                cursor.execute(_insert_sql(vendor, f"WHERE o.id IN ({placeholders})"), chunk)
+    except DatabaseError as e:
+        logger.warning(f"Error updating the product search index: {e}")
+
+
+def query_terms(query):
+    """Split a free-text query like "black shirt, medium size" into match terms."""
+    return [term for term in TERM_PATTERN.findall(query.lower()) if len(term) > 1][:MAX_TERMS]
+
+
+def search_offers(query, site_names=None, max_results=DEFAULT_MAX_RESULTS, max_age=DEFAULT_MAX_AGE):
+    """Return product records for the offers best matching ``query``, best first.
+
+    Any term may match, with every term matching as a prefix ("shirt" finds
+    "shirts"); offers matching more and rarer terms, in heavier columns,
+    rank higher. SQLite ranks with FTS5's BM25, PostgreSQL with
+    ``ts_rank_cd`` over weighted columns. ``site_names`` limits the offers
+    to those sites (and their merchants, as in "Google Shopping - <shop>").
+    The records are built straight from the ranking query's rows.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    vendor = connection.vendor
+    offers = Offer._meta.db_table
+    products = f"JOIN {CatalogProduct._meta.db_table} p ON p.id = o.product_id"
+    conditions = ["o.scraped_at >= %s"]
+    params = [connection.ops.adapt_datetimefield_value(timezone.now() - timedelta(seconds=max_age))]
+    if site_names:
+        conditions.append('(' + ' OR '.join(['o.site = %s OR o.site LIKE %s'] * len(site_names)) + ')')
+        for name in site_names:
+            params.extend([name, f"{name} - %"])
+
+    if vendor == 'sqlite':
+        match = ' OR '.join(f'"{term}"*' for term in terms)
+        sql = f"""
+            SELECT {RESULT_COLUMNS} FROM {FTS_TABLE} f JOIN {offers} o ON o.id = f.rowid {products}
+            WHERE {FTS_TABLE} MATCH %s AND {' AND '.join(conditions)}
+            ORDER BY bm25({FTS_TABLE}, {', '.join(map(str, COLUMN_WEIGHTS))})
+            LIMIT %s
+        """
+    elif vendor == 'postgresql':
+        match = ' | '.join(f'{term}:*' for term in terms)
+        sql = f"""
+            SELECT {RESULT_COLUMNS}
+            FROM {TSV_TABLE} s JOIN {offers} o ON o.id = s.offer_id {products}, to_tsquery('simple', %s) q
+            WHERE s.document @@ q AND {' AND '.join(conditions)}
+            ORDER BY ts_rank_cd(s.document, q, 1) DESC
+            LIMIT %s
+        """
+    else:
+        raise IndexUnavailable(f"No product search index on the {vendor} backend")
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match, *params, max_results])
+            return [Product(*row) for row in cursor.fetchall()]
+    except DatabaseError as e:
+        raise IndexUnavailable(f"Product search index is not available: {e}")
+
+
+def search_products(query, site_names=None, report=None):
+    """Search the index with the configured limits, recording the count and seconds in ``report``."""
+    started = time.monotonic()
+    products = search_offers(
+        query, site_names,
+        max_results=getattr(settings, 'SCRAPER_INDEX_MAX_RESULTS', DEFAULT_MAX_RESULTS),
+        max_age=getattr(settings, 'SCRAPER_INDEX_MAX_AGE', DEFAULT_MAX_AGE),
+    )
+    if report is not None:
+        report['results'] = len(products)
+        report['seconds'] = round(time.monotonic() - started, 4)
+    return products
@@ -0,0 +1,367 @@
+import logging
+import re
+import string
+import threading
+
+from bs4 import SoupStrainer
+from django.conf import settings
+
+from .deadline import DeadlineExceeded
+from .extraction import attr_field, brand_name, field_value, make_product, text_field
+from .http_fetch import TIER_HTTP, TIER_SELENIUM
+from .parsing import CompiledSpec, has_class, parse_rows
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WAIT_TIMEOUT = 30  # seconds to wait for the first product card
+DEFAULT_CARD_LIMIT = 10  # Cards taken from a results page
+DEFAULT_MAX_CARDS = 100  # Cards a site may read, across pages, for a search with a `limit`
+DEFAULT_MAX_PAGES = 5  # Result pages an HTTP-tier site may fetch for such a search
+DEFAULT_MAX_SCROLLS = 3  # Scroll rounds while waiting for more cards
+DEFAULT_CONCURRENCY = 3  # Scrapes of one site running at once in this process
+DEFAULT_PRIOR_SECONDS = 15.0  # Expected scrape duration before any is observed
+
+# Adapter settings that SCRAPER_SITE_OVERRIDES may change per site
+KNOBS = (
+    'wait_timeout', 'card_limit', 'max_cards', 'max_pages', 'max_scrolls', 'concurrency', 'tier', 'prior_seconds',
+    'default',
+)
+
+
+class SiteAdapter:
+    """A declarative description of how one site is scraped, compiled once.
+
+    The adapter is called like the per-site scraping functions it replaces,
+    ``adapter(query, report=None, deadline=None)``, and carries the site's
+    performance knobs: page wait timeout, scroll policy, card limit,
+    concurrency cap, fetch tier and the prior used by the scheduler.
+
+    A search with a ``limit`` reads up to ``max_cards`` cards instead of
+    ``card_limit``, scrolling further or following ``page_url`` (the search
+    URL of result page ``{page}``) for up to ``max_pages`` pages.
+    """
+
+    def __init__(self, key, name, url, wait_selector, cards, strainer, fields, build,
+                 wait_timeout=DEFAULT_WAIT_TIMEOUT, card_limit=DEFAULT_CARD_LIMIT, max_scrolls=DEFAULT_MAX_SCROLLS,
+                 concurrency=DEFAULT_CONCURRENCY, tier=TIER_SELENIUM, embedded_state=False,
+                 prior_seconds=DEFAULT_PRIOR_SECONDS, default=True, aliases=(), page_url=None,
+                 max_cards=DEFAULT_MAX_CARDS, max_pages=DEFAULT_MAX_PAGES):
+        self.key = key
+        self.__name__ = f'scrape_{key}'
+        self.name = name
+        self.url = url
+        self.page_url = page_url
+        self.wait_selector = wait_selector
+        self.strainer = strainer
+        self.build = build
+        self.wait_timeout = wait_timeout
+        self.card_limit = card_limit
+        self.max_cards = max(max_cards, card_limit)
+        self.max_pages = max_pages if page_url else 1
+        self.max_scrolls = max_scrolls
+        self.concurrency = concurrency
+        self.tier = tier
+        self.embedded_state = embedded_state
+        self.prior_seconds = prior_seconds
+        self.default = default
+        self.aliases = tuple(aliases)
+        # Spec passed to the in-page extractor, and its precompiled soup equivalent
+        self.spec = {'cards': cards, 'limit': card_limit, 'fields': fields}
+        self.compiled = CompiledSpec(self.spec)
+        for template, allowed in ((url, {'query', 'slug'}), (page_url or '', {'query', 'slug', 'page'})):
+            placeholders = {name for _, name, _, _ in string.Formatter().parse(template) if name}
+            if not placeholders <= allowed:
+                raise ValueError(f"Unknown placeholders in URL template for {key}: {placeholders}")
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+
+    def __repr__(self):
+        return f"<SiteAdapter {self.key}>"
+
+    def search_url(self, query, page=1):
+        template = self.page_url if page > 1 else self.url
+        return template.format(query=query, slug=query.replace(' ', '-'), page=page)
+
+    def depth(self, quota=None):
+        """Return how many cards to read: ``max_cards`` for a search with a result quota."""
+        return self.max_cards if quota is not None else self.card_limit
+
+    def parse(self, page_source, backend=None, limit=None):
+        """Parse a search results page of this site into product records."""
+        return self.products(parse_rows(page_source, self.compiled, self.strainer, backend, limit))
+
+    def products(self, rows):
+        """Build product records from raw card field strings."""
+        products = []
+        for row in rows:
+            try:
+                products.append(self.build(row))
+            except Exception as e:
+                logger.error(f"Error building {self.name} product: {e}")
+        return products
+
+    def __call__(self, query, report=None, deadline=None):
+        from .utils import scrape_with_adapter
+
+        if self._slots is None:
+            return scrape_with_adapter(self, query, report, deadline)
+        timeout = deadline.remaining() if deadline is not None else None
+        if not self._slots.acquire(timeout=timeout):
+            raise DeadlineExceeded(f"Deadline passed waiting for a {self.name} scrape slot")
+        try:
+            return scrape_with_adapter(self, query, report, deadline)
+        finally:
+            self._slots.release()
+
+
+def _build_meesho(row):
+    return make_product(field_value(row, 'name'), field_value(row, 'price'), field_value(row, 'image'),
+                        'N/A', field_value(row, 'rating'), 'Meesho')
+
+
+def _build_nykaa_fashion(row):
+    return make_product(brand_name(row, brand_if_name=True), field_value(row, 'price', strip=True),
+                        field_value(row, 'image'), 'N/A', 'N/A', 'Nykaa Fashion')
+
+
+def _build_fabindia(row):
+    name = field_value(row, 'name', strip=True)
+    # FabIndia often uses natural materials
+    material = 'Cotton' if 'cotton' in name.lower() else 'N/A'
+    return make_product(name, field_value(row, 'price', strip=True), field_value(row, 'image'),
+                        material, 'N/A', 'FabIndia')
+
+
+def _build_google_shopping(row):
+    merchant = field_value(row, 'merchant', strip=True)
+    # Add merchant name to the site field
+    site = f"Google Shopping - {merchant}" if merchant != 'N/A' else "Google Shopping"
+    return make_product(field_value(row, 'name', strip=True), field_value(row, 'price', strip=True),
+                        field_value(row, 'image'), 'N/A', field_value(row, 'rating', strip=True), site)
+
+
+def _build_myntra(row):
+    return make_product(brand_name(row), field_value(row, 'price', strip=True), field_value(row, 'image'),
+                        'N/A', field_value(row, 'rating', strip=True), 'Myntra', field_value(row, 'mrp', strip=True))
+
+
+def _build_ajio(row):
+    return make_product(brand_name(row), field_value(row, 'price', strip=True), field_value(row, 'image'),
+                        'N/A', 'N/A', 'AJIO', field_value(row, 'mrp', strip=True))
+
+
+def _build_plain(site_name):
+    def build(row):
+        return make_product(field_value(row, 'name'), field_value(row, 'price'), field_value(row, 'image'),
+                            'N/A', field_value(row, 'rating'), site_name, field_value(row, 'mrp', strip=True))
+    return build
+
+
+# Every supported site, in the order a full search dispatches them before scheduling
+SITE_DEFINITIONS = [
+    dict(
+        key='meesho', name='Meesho',
+        url='https://www.meesho.com/search?q={query}',
+        wait_selector='div.ProductList__GridCol-sc-8lnc8o-0',
+        cards="div[class*='ProductList__GridCol']",
+        strainer=SoupStrainer('div', class_=re.compile('ProductList__GridCol')),
+        fields={
+            'name': text_field("p[class*='Text__StyledText']"),
+            'price': text_field("h5[class*='Text__StyledText']"),
+            'image': attr_field('src', 'img'),
+            'rating': text_field("span[class*='Rating__StyledRating']"),
+        },
+        build=_build_meesho,
+        wait_timeout=10, max_scrolls=1, tier=TIER_HTTP, embedded_state=True, prior_seconds=8.0,
+    ),
+    dict(
+        key='nykaa_fashion', name='Nykaa Fashion',
+        url='https://www.nykaafashion.com/search?q={query}',
+        wait_selector='div.product-card',
+        cards='div.product-card',
+        strainer=SoupStrainer('div', class_=has_class('product-card')),
+        fields={
+            'name': text_field('div.product-name'),
+            'brand': text_field('div.brand-name'),
+            'price': text_field('span.primary-price'),
+            'image': attr_field('src', 'img'),
+        },
+        build=_build_nykaa_fashion,
+        wait_timeout=10, max_scrolls=1, tier=TIER_HTTP, embedded_state=True, prior_seconds=8.0,
+        aliases=('nykaa', 'nykaafashion'),
+    ),
+    dict(
+        key='fabindia', name='FabIndia',
+        url='https://www.fabindia.com/search?q={query}',
+        wait_selector='div.product-item',
+        cards='div.product-item',
+        strainer=SoupStrainer('div', class_=has_class('product-item')),
+        fields={
+            'name': text_field('div.product-name'),
+            'price': text_field('span.price'),
+            'image': attr_field('src', 'img.product-image'),
+        },
+        build=_build_fabindia,
+        wait_timeout=10, max_scrolls=1, tier=TIER_HTTP, prior_seconds=8.0,
+    ),
+    dict(
+        key='myntra', name='Myntra',
+        url='https://www.myntra.com/{slug}',
+        page_url='https://www.myntra.com/{slug}?p={page}',
+        wait_selector='li.product-base',
+        cards='li.product-base',
+        strainer=SoupStrainer('li', class_=has_class('product-base')),
+        fields={
+            'brand': text_field('h3.product-brand'),
+            'name': text_field('h4.product-product'),
+            'price': text_field('span.product-discountedPrice', 'div.product-price'),
+            'mrp': text_field('span.product-strike'),
+            'image': attr_field('src', 'img.product-image'),
+            'rating': text_field('div.product-ratingsContainer'),
+        },
+        build=_build_myntra,
+        max_scrolls=1, tier=TIER_HTTP, embedded_state=True,
+    ),
+    dict(
+        key='ajio', name='AJIO',
+        url='https://www.ajio.com/search/?text={query}',
+        wait_selector='div.item.rilrtl-products-list__item',
+        cards="div[class='item rilrtl-products-list__item']",
+        strainer=SoupStrainer('div', class_='item rilrtl-products-list__item'),
+        fields={
+            'brand': text_field('div.brand'),
+            'name': text_field('div.nameCls'),
+            'price': text_field('span.price'),
+            'mrp': text_field('span.orginal-price'),
+            'image': attr_field('src', 'img'),
+        },
+        build=_build_ajio,
+        max_scrolls=1, tier=TIER_HTTP, embedded_state=True,
+    ),
+    dict(
+        key='flipkart', name='Flipkart',
+        url='https://www.flipkart.com/search?q={query}',
+        page_url='https://www.flipkart.com/search?q={query}&page={page}',
+        wait_selector='div._1AtVbE',
+        cards='div._1AtVbE',
+        strainer=SoupStrainer('div', class_=has_class('_1AtVbE')),
+        fields={
+            'name': text_field('div._4rR01T'),
+            'price': text_field('div._30jeq3'),
+            'mrp': text_field('div._3I9_wc'),
+            'image': attr_field('src', 'img._396QI4'),
+            'rating': text_field('div._3LWZlK'),
+        },
+        build=_build_plain('Flipkart'),
+        tier=TIER_HTTP, prior_seconds=25.0,
+    ),
+    dict(
+        key='amazon', name='Amazon',
+        url='https://www.amazon.in/s?k={query}',
+        page_url='https://www.amazon.in/s?k={query}&page={page}',
+        wait_selector="div[data-component-type='s-search-result']",
+        cards="div[data-component-type='s-search-result']",
+        strainer=SoupStrainer('div', attrs={'data-component-type': 's-search-result'}),
+        fields={
+            'name': text_field('span.a-text-normal'),
+            'price': text_field('span.a-price-whole'),
+            'mrp': text_field('span.a-price.a-text-price span.a-offscreen'),
+            'image': attr_field('src', 'img.s-image'),
+            'rating': text_field('span.a-icon-alt'),
+        },
+        build=_build_plain('Amazon'),
+        tier=TIER_HTTP, prior_seconds=25.0,
+    ),
+    dict(
+        key='tatacliq', name='Tata CLiQ',
+        url='https://www.tatacliq.com/search/?searchCategory=all&text={query}',
+        wait_selector='div.ProductList__GridCol',
+        cards='div.ProductList__GridCol',
+        strainer=SoupStrainer('div', class_=has_class('ProductList__GridCol')),
+        fields={
+            'name': text_field('div.ProductDescription__ProductName'),
+            'price': text_field('div.ProductDescription__Price'),
+            'image': attr_field('src', 'img.ProductImage'),
+            'rating': text_field('div.ProductDescription__Rating'),
+        },
+        build=_build_plain('Tata CLiQ'),
+        prior_seconds=25.0,
+    ),
+    dict(
+        key='google_shopping', name='Google Shopping',
+        url='https://www.google.com/search?q={query}&tbm=shop',
+        wait_selector='div.sh-dgr__grid-result',
+        cards='div.sh-dgr__grid-result',
+        strainer=SoupStrainer('div', class_=has_class('sh-dgr__grid-result')),
+        fields={
+            'name': text_field('h3.tAxDx'),
+            'price': text_field('span.a8Pemb'),
+            'merchant': text_field('div.aULzUe'),
+            'image': attr_field('src', 'img.TL92Hc'),
+            'rating': text_field('div.QIrs8'),
+        },
+        build=_build_google_shopping,
+        card_limit=15, max_scrolls=1, default=False, aliases=('google',),
+    ),
+]
+
+
+class SiteRegistry:
+    """Adapters for every supported site, looked up by key or alias."""
+
+    def __init__(self, adapters):
+        self.adapters = {adapter.key: adapter for adapter in adapters}
+        self._names = {}
+        for adapter in adapters:
+            for name in (adapter.key,) + adapter.aliases:
+                self._names[name] = adapter
+
+    def get(self, name):
+        return self._names.get(name.strip().lower())
+
+    def resolve(self, names):
+        """Map requested site names to adapters; all default sites if none are given."""
+        if not names:
+            return self.defaults()
+        adapters = []
+        for name in names:
+            adapter = self.get(name)
+            if adapter is not None and adapter not in adapters:
+                adapters.append(adapter)
+        return adapters
+
+    def defaults(self):
+        return [adapter for adapter in self.adapters.values() if adapter.default]
+
+    def __iter__(self):
+        return iter(self.adapters.values())
+
+
+def build_registry(definitions=SITE_DEFINITIONS, overrides=None):
+    """Compile site definitions into a registry, applying per-site knob overrides."""
+    overrides = overrides or {}
+    adapters = []
+    for definition in definitions:
+        knobs = overrides.get(definition['key'], {})
+        unknown = set(knobs) - set(KNOBS)
+        if unknown:
+            raise ValueError(f"Unknown settings in SCRAPER_SITE_OVERRIDES for {definition['key']}: {sorted(unknown)}")
+        adapters.append(SiteAdapter(**{**definition, **knobs}))
+    return SiteRegistry(adapters)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_site_registry():
+    """Return the process-wide site registry, compiling it on first use."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = build_registry(overrides=getattr(settings, 'SCRAPER_SITE_OVERRIDES', {}))
+        return _registry
+
+
+def get_site(name):
+    """Return the adapter for a site key or alias, or None."""
+    return get_site_registry().get(name)
@@ -1,3 +1,1232 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import csv
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import requests
+from django.core.cache import caches
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .admission import PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, BrowserAdmission, Overloaded, get_browser_admission
+from .async_pipeline import scrape_sites_async
+from .catalog import STAGING_COLUMNS, STAGING_NULLABLE, Catalog, IngestJob, _staging_csv, write_batch
+from .browser_profile import (
+    PROFILE_FULL, PROFILE_LIGHT, PageLoadStats, _network_totals, blocked_urls, load_page
+)
+from .cursors import ResultStore, decode_cursor, encode_cursor
+from .cache import ResultCache, get_result_cache
+from .coalesce import ROLE_FOLLOWER, ROLE_LEADER, ROLE_PROCESS_FOLLOWER, SingleFlight, get_single_flight
+from .deadline import Deadline, DeadlineExceeded
+from .driver_pool import DriverPool, DriverPoolTimeout, get_driver_pool
+from .http_fetch import TIER_HTTP, TIER_SELENIUM, extract_embedded_products, fetch_with_http
+from .health import CIRCUIT_CLOSED, CIRCUIT_OPEN, CircuitOpen, RetryBudget, SiteHealthTracker
+from .extraction import MODE_COMPARE, MODE_JS, extract_products, make_product
+from .jobs import JobQueue
+from .parse_pool import SHARED_MEMORY_MIN_BYTES, ParsePool
+from .parsing import DEFAULT_PARSER, parse_rows
+from .prewarm import Prewarmer, prewarm_report
+from .query_log import QueryLog, get_query_log
+from .quota import ResultQuota
+from .models import CatalogProduct, Offer, QuerySiteStat, SearchJob, SearchQuery, SiteTask
+from .nodes import assign_sites
+from .readiness import ROUND_TIMEOUT, wait_until_ready
+from .records import Product, render_json
+from .results import SORT_MODES, ResultSet
+from .search_index import search_products
+from .sites import SITE_DEFINITIONS, build_registry, get_site_registry
+from .scheduler import worker_count
+from .utils import iter_site_results, normalize_rating, scrape_with_adapter, wait_timeout
+
+# Trimmed search result pages with the product output of the original
+# html.parser/BeautifulSoup scrapers (plus normalized ratings) saved next to each one
+TESTDATA = Path(__file__).resolve().parent / 'testdata'
+
+
+class FakeDriver:
+    """Stands in for a Selenium driver in pool tests."""
+
+    def __init__(self):
+        self.alive = True
+        self.quit_calls = 0
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise RuntimeError("browser crashed")
+        return 'about:blank'
+
+    def execute_script(self, script):
+        pass
+
+    def delete_all_cookies(self):
+        pass
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.quit_calls += 1
+        self.alive = False
+
+
+class DriverPoolTests(SimpleTestCase):
+    """Browsers are reused across checkouts, recycled and bounded by the pool size."""
+
+    def test_reuse_and_recycle(self):
+        pool = DriverPool(FakeDriver, size=2, max_pages=2)
+        first = pool.checkout()
+        pool.checkin(first)
+        self.assertIs(pool.checkout(), first)
+        pool.checkin(first)  # Second page: recycled
+        self.assertEqual(first.quit_calls, 1)
+        second = pool.checkout()
+        self.assertIsNot(second, first)
+        second.alive = False
+        pool.checkin(second)
+        # A browser that stopped responding while parked is replaced on checkout
+        third = pool.checkout()
+        self.assertIsNot(third, second)
+        stats = pool.stats()
+        self.assertEqual((stats['launched'], stats['reuses'], stats['recycled'], stats['crashed']), (3, 1, 1, 1))
+
+    def test_size_bound(self):
+        pool = DriverPool(FakeDriver, size=1)
+        driver = pool.checkout()
+        with self.assertRaises(DriverPoolTimeout):
+            pool.checkout(timeout=0.05)
+        pool.checkin(driver)
+        self.assertIs(pool.checkout(timeout=0.05), driver)
+
+    def test_admission_and_pool_share_timeout(self):
+        admission = BrowserAdmission(capacity=2, job_seconds=0.3)
+        pool = DriverPool(FakeDriver, size=1, admission=admission)
+        pool.checkout()
+        held = admission.acquire()
+        threading.Timer(0.3, admission.release, [held]).start()
+        # Admitted after 0.3s, the pool wait only gets what is left of the 0.5s
+        started = time.monotonic()
+        with self.assertRaises(DriverPoolTimeout):
+            pool.checkout(timeout=0.5)
+        self.assertLess(time.monotonic() - started, 0.7)
+        self.assertEqual(admission.stats()['in_use'], 1)
+
+    @override_settings(SCRAPER_POOL_SIZE=5, SCRAPER_POOL_PRELAUNCH=0)
+    def test_process_pool_size(self):
+        # A worker process sizes its pool and admission without touching settings
+        with mock.patch('scraper.driver_pool._pool', None), mock.patch('scraper.admission._admission', None), \
+                mock.patch('scraper.utils.setup_driver', FakeDriver):
+            pool = get_driver_pool(size=2)
+            self.assertEqual(pool.size, 2)
+            self.assertEqual(get_browser_admission().capacity, 2)
+            self.assertIs(get_driver_pool(size=3), pool)
+            pool.close()
+
+
+class BrowserAdmissionTests(SimpleTestCase):
+    """Browser jobs are admitted by priority and shed with 429 when they would wait too long."""
+
+    def test_priority_order(self):
+        admission = BrowserAdmission(capacity=1)
+        held = admission.acquire()
+        admitted = []
+
+        def job(priority):
+            admitted_at = admission.acquire(priority=priority)
+            admitted.append(priority)
+            admission.release(admitted_at)
+
+        background = threading.Thread(target=job, args=(PRIORITY_BACKGROUND,))
+        background.start()
+        while admission.stats()['queued'] < 1:
+            time.sleep(0.01)
+        interactive = threading.Thread(target=job, args=(PRIORITY_INTERACTIVE,))
+        interactive.start()
+        while admission.stats()['queued'] < 2:
+            time.sleep(0.01)
+        admission.release(held)
+        background.join()
+        interactive.join()
+        # The interactive job queued last but goes first
+        self.assertEqual(admitted, [PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND])
+
+    def test_rejects_with_retry_after(self):
+        admission = BrowserAdmission(capacity=1, job_seconds=30)
+        admission.check(5)
+        admission.acquire()
+        with self.assertRaises(Overloaded) as raised:
+            admission.check(5)
+        self.assertEqual(raised.exception.retry_after, 30)
+        with self.assertRaises(Overloaded):
+            admission.acquire(timeout=5)
+        self.assertEqual(admission.stats()['rejected'], 2)
+
+    def test_search_returns_429(self):
+        admission = BrowserAdmission(capacity=1, job_seconds=30)
+        admission.acquire()
+        with mock.patch('api.views.get_browser_admission', return_value=admission):
+            response = self.client.get('/api/search/', {'query': 'shirt', 'timeout': 5})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+
+def network_event(method, **params):
+    """Build a Chrome performance log entry as returned by ``driver.get_log('performance')``."""
+    return {'message': json.dumps({'message': {'method': method, 'params': params}})}
+
+
+class ProfileDriver(FakeDriver):
+    """Fake driver recording the DevTools commands and navigation of a page load."""
+
+    def __init__(self, log, ready_states=('complete',)):
+        super().__init__()
+        self.page_log = list(log)
+        self.log = [network_event('Network.loadingFinished', encodedDataLength=99)]  # Left by the last page
+        self.ready_states = list(ready_states)
+        self.blocked = None
+        self.loaded = None
+
+    def execute_cdp_cmd(self, command, params):
+        if command == 'Network.setBlockedURLs':
+            self.blocked = params['urls']
+
+    def get(self, url):
+        self.loaded = url
+        self.log = list(self.page_log)
+
+    def get_log(self, kind):
+        log, self.log = self.log, []
+        return log
+
+    def execute_script(self, script):
+        return self.ready_states.pop(0) if len(self.ready_states) > 1 else self.ready_states[0]
+
+
+class BrowserProfileTests(SimpleTestCase):
+    """Scrapes load pages without unneeded resources, and a sampled baseline measures what that saves."""
+
+    @override_settings(
+        SCRAPER_BLOCKED_RESOURCES=['*.png', '*.css'], SCRAPER_BLOCKED_DOMAINS=['*hotjar.com*'],
+        SCRAPER_SITE_RESOURCE_RULES={'ajio': {'allow': ['*.css'], 'block': ['*.js']}},
+    )
+    def test_blocked_urls(self):
+        self.assertEqual(blocked_urls('myntra'), ['*.png', '*.css', '*hotjar.com*'])
+        self.assertEqual(blocked_urls('ajio'), ['*.png', '*hotjar.com*', '*.js'])
+
+    def test_network_totals(self):
+        entries = [
+            network_event('Network.loadingFinished', encodedDataLength=1200),
+            network_event('Network.loadingFinished', encodedDataLength=800),
+            network_event('Network.loadingFailed', blockedReason='inspector'),
+            network_event('Network.loadingFailed', errorText='net::ERR_ABORTED'),
+            network_event('Network.requestWillBeSent'),
+            {'message': 'not json'},
+        ]
+        self.assertEqual(_network_totals(entries), (2000, 2, 1))
+
+    def test_page_load_stats(self):
+        stats = PageLoadStats()
+        stats.record({'profile': PROFILE_LIGHT, 'bytes': 1000, 'blocked': 4, 'load_seconds': 1.0})
+        stats.record({'profile': PROFILE_LIGHT, 'bytes': 3000, 'blocked': 3, 'load_seconds': 2.0})
+        stats.record({'profile': PROFILE_FULL, 'bytes': 9000, 'blocked': 0, 'load_seconds': 4.0})
+        self.assertEqual(stats.stats(), {
+            PROFILE_LIGHT: {'pages': 2, 'avg_bytes': 2000, 'avg_blocked': 3.5, 'avg_load_seconds': 1.5},
+            PROFILE_FULL: {'pages': 1, 'avg_bytes': 9000, 'avg_blocked': 0.0, 'avg_load_seconds': 4.0},
+        })
+
+    @override_settings(SCRAPER_BLOCKED_RESOURCES=['*.png'], SCRAPER_BLOCKED_DOMAINS=[])
+    def test_light_and_baseline_loads(self):
+        log = [network_event('Network.loadingFinished', encodedDataLength=500)]
+        with override_settings(SCRAPER_PROFILE_BASELINE_RATE=0):
+            driver = ProfileDriver(log, ready_states=['interactive'])
+            report = {}
+            load_page(driver, 'https://example.com/search', 'myntra', report)
+        self.assertEqual(driver.blocked, ['*.png'])
+        self.assertEqual((report['page']['profile'], report['page']['bytes']), (PROFILE_LIGHT, 500))
+        # The eager browser returns before the load event; a baseline load waits for it
+        with override_settings(SCRAPER_PROFILE_BASELINE_RATE=1):
+            driver = ProfileDriver(log, ready_states=['interactive', 'interactive', 'complete'])
+            report = {}
+            load_page(driver, 'https://example.com/search', 'myntra', report)
+        self.assertEqual(driver.blocked, [])
+        self.assertEqual(report['page']['profile'], PROFILE_FULL)
+        self.assertEqual(driver.ready_states, ['complete'])
+
+
+class ResultCacheTests(SimpleTestCase):
+    """Results are shared across cache instances, served stale while refreshing, and only when deep enough."""
+
+    def setUp(self):
+        caches['default'].clear()
+        self.fetches = []
+
+    def fetch(self, count, exhausted=True):
+        def _fetch(report, deadline):
+            self.fetches.append(count)
+            report['depth'] = {'exhausted': exhausted}
+            return [make_product(f'Shirt {i}', '₹999', 'N/A', 'N/A', 'N/A', 'Myntra') for i in range(count)]
+        return _fetch
+
+    def test_miss_then_shared_hit(self):
+        cache = ResultCache(alias='default')
+        report = {}
+        self.assertEqual(len(cache.get_or_scrape('myntra', 'Shirt', self.fetch(3), report)), 3)
+        self.assertEqual((report['cache'], report['coalesced']), ('miss', 'leader'))
+        # Another worker's cache finds the entry in the shared tier, under any spelling of the query
+        report = {}
+        self.assertEqual(len(ResultCache(alias='default').get_or_scrape('myntra', ' shirt ', self.fetch(3), report)), 3)
+        self.assertEqual((report['cache'], report['cache_tier']), ('hit', 'shared'))
+        self.assertEqual(self.fetches, [3])
+
+    def test_stale_while_revalidate(self):
+        cache = ResultCache(alias='default', ttl=0, stale_ttl=600)
+        cache.get_or_scrape('myntra', 'shirt', self.fetch(2))
+        report = {}
+        products = cache.get_or_scrape('myntra', 'shirt', self.fetch(3), report, refresh_fetch=self.fetch(4))
+        self.assertEqual((len(products), report['cache']), (2, 'stale'))
+        cache._refresh_executor.shutdown(wait=True)
+        self.assertEqual(self.fetches, [2, 4])
+        self.assertTrue(cache.is_cached('myntra', 'shirt'))
+        self.assertEqual(len(cache._lookup(cache._key('myntra', 'shirt'), 'myntra')[0]['products']), 4)
+
+    def test_refresh_closes_connections(self):
+        cache = ResultCache(alias='default', ttl=0, stale_ttl=600)
+        cache.get_or_scrape('myntra', 'shirt', self.fetch(2))
+        calls = []
+
+        def refresh(report, deadline):
+            calls.append('fetch')
+            return self.fetch(3)(report, deadline)
+
+        with mock.patch('scraper.cache.close_old_connections', lambda: calls.append('close')):
+            cache.get_or_scrape('myntra', 'shirt', self.fetch(3), refresh_fetch=refresh)
+            cache._refresh_executor.shutdown(wait=True)
+        # The refresh thread's connection doesn't outlive the refresh
+        self.assertEqual(calls, ['close', 'fetch', 'close'])
+
+    def test_expired_local_copy_rereads_shared(self):
+        web = ResultCache(alias='default', ttl=60)
+        web.get_or_scrape('myntra', 'shirt', self.fetch(2))
+        web._local.get(web._key('myntra', 'shirt'))['stored_at'] -= 120
+        # The pre-warmer, another process, replaces the entry before it goes stale
+        ResultCache(alias='default', ttl=60).refresh('myntra', 'shirt', self.fetch(3))
+        report = {}
+        products = web.get_or_scrape('myntra', 'shirt', self.fetch(4), report)
+        self.assertEqual(len(products), 3)
+        self.assertEqual((report['cache'], report['cache_tier'], report['prewarmed']), ('hit', 'shared', True))
+        self.assertEqual(self.fetches, [2, 3])
+
+    def test_depth(self):
+        cache = ResultCache(alias='default')
+        cache.get_or_scrape('myntra', 'shirt', self.fetch(2, exhausted=False))
+        self.assertTrue(cache.is_cached('myntra', 'shirt', depth=2))
+        # A scrape cut short at 2 products can't answer a search needing 5...
+        self.assertFalse(cache.is_cached('myntra', 'shirt', depth=5))
+        report = {}
+        self.assertEqual(len(cache.get_or_scrape('myntra', 'shirt', self.fetch(2), report, depth=5)), 2)
+        self.assertEqual(report['cache'], 'miss')
+        # ...but one that found the site had no more can
+        self.assertTrue(cache.is_cached('myntra', 'shirt', depth=5))
+        self.assertEqual(self.fetches, [2, 2])
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Identical calls in flight share one execution, its result or its error."""
+
+    def setUp(self):
+        lock_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(lock_dir.cleanup)
+        self.lock_dir = lock_dir.name
+        self.flight = SingleFlight(lock_dir=self.lock_dir)
+
+    def follow(self, key, fn, outcomes, **kwargs):
+        def _follow():
+            try:
+                outcomes.append(self.flight.do(key, fn, **kwargs))
+            except Exception as e:
+                outcomes.append(e)
+        thread = threading.Thread(target=_follow)
+        thread.start()
+        return thread
+
+    def wait_for_followers(self, key, count):
+        while self.flight._calls[key].followers < count:
+            time.sleep(0.01)
+
+    def test_followers_share_result(self):
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(5)
+            return 'products'
+
+        outcomes = []
+        leader = self.follow('k', fn, outcomes)
+        while 'k' not in self.flight._calls:
+            time.sleep(0.01)
+        followers = [self.follow('k', fn, outcomes) for _ in range(3)]
+        self.wait_for_followers('k', 3)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(role for _, role in outcomes), [ROLE_FOLLOWER] * 3 + [ROLE_LEADER])
+        self.assertEqual({result for result, _ in outcomes}, {'products'})
+        # The per-key lock file only exists while the call is in flight
+        self.assertEqual(os.listdir(self.lock_dir), [])
+
+    def test_error_and_timeout(self):
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise RuntimeError("site down")
+
+        outcomes = []
+        leader = self.follow('k', fail, outcomes)
+        while 'k' not in self.flight._calls:
+            time.sleep(0.01)
+        impatient = self.follow('k', fail, outcomes, timeout=0.05)
+        impatient.join()
+        self.assertIsInstance(outcomes.pop(), TimeoutError)
+        follower = self.follow('k', fail, outcomes)
+        self.wait_for_followers('k', 2)
+        release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual([str(error) for error in outcomes], ["site down"] * 2)
+        self.assertEqual(self.flight.do('k', lambda: 'retried'), ('retried', ROLE_LEADER))
+
+    def test_other_process_result(self):
+        # Another SingleFlight on the same lock directory stands in for another process
+        other = SingleFlight(lock_dir=self.lock_dir)
+        started, release = threading.Event(), threading.Event()
+        stored = []
+
+        def scrape():
+            started.set()
+            release.wait(5)
+            stored.append('products')
+            return 'products'
+
+        thread = threading.Thread(target=other.do, args=('k', scrape))
+        thread.start()
+        started.wait(5)
+        threading.Timer(0.1, release.set).start()
+        result = self.flight.do('k', lambda: 'scraped again', lookup=lambda: stored[0] if stored else None)
+        thread.join()
+        self.assertEqual(result, ('products', ROLE_PROCESS_FOLLOWER))
+        self.assertEqual(os.listdir(self.lock_dir), [])
+
+
+class DeadlineTests(SimpleTestCase):
+    """Cancelling a deadline aborts the work registered against it, and only its own callers see it expire."""
+
+    def test_cancel_aborts_browser(self):
+        pool = DriverPool(FakeDriver, size=1)
+        deadline = Deadline(60)
+        driver = pool.checkout()
+        deadline.add_cancel_callback(lambda: pool.abort(driver))
+        removed = deadline.add_cancel_callback(self.fail)
+        deadline.remove_cancel_callback(removed)
+        deadline.cancel()
+        self.assertEqual((deadline.remaining(), driver.quit_calls), (0.0, 1))
+        with self.assertRaises(DeadlineExceeded):
+            deadline.check()
+        # The aborted browser is replaced rather than parked for reuse
+        pool.checkin(driver)
+        self.assertIsNot(pool.checkout(), driver)
+        self.assertEqual(pool.stats()['aborted'], 1)
+        # Registering against a cancelled deadline aborts at once
+        aborted = []
+        deadline.add_cancel_callback(lambda: aborted.append(True))
+        self.assertEqual(aborted, [True])
+
+    def test_follower_outlives_leader_deadline(self):
+        caches['default'].clear()
+        cache = ResultCache(alias='default')
+        key = cache._key('myntra', 'deadline shirt') + ':None'  # Coalescing key: entry key and read depth
+        product = make_product('Slim Shirt', '₹999', 'N/A', 'N/A', 'N/A', 'Myntra')
+
+        def short(report, deadline):
+            while get_single_flight()._calls[key].followers < 1 or not deadline.expired():
+                time.sleep(0.01)
+            report['status'] = 'timeout'
+            return []
+
+        leader_report = {}
+        leader = threading.Thread(target=cache.get_or_scrape,
+                                  args=('myntra', 'deadline shirt', short, leader_report, Deadline(0.1)))
+        leader.start()
+        while key not in get_single_flight()._calls:
+            time.sleep(0.01)
+        report = {}
+        products = cache.get_or_scrape('myntra', 'deadline shirt', lambda report, deadline: [product],
+                                       report, Deadline(10))
+        leader.join()
+        self.assertEqual(leader_report['status'], 'timeout')
+        # The follower scraped again within its own deadline instead of sharing the leader's timeout
+        self.assertEqual((products, report['coalesced']), ([product], ROLE_LEADER))
+
+
+class ReadyDriver:
+    """Fake driver whose page grows by a scripted card count per scroll round, timing out where asked."""
+
+    def __init__(self, cards, rounds):
+        self.cards = cards
+        self.rounds = list(rounds)
+        self.timeouts = SimpleNamespace(script=30)
+        self.script_timeouts = []
+
+    def execute_script(self, script, selector):
+        return self.cards
+
+    def execute_async_script(self, script, selector, limit, quiet_ms, max_ms):
+        self.cards, timed_out = self.rounds.pop(0)
+        if timed_out:
+            raise TimeoutException("script timeout")
+        return self.cards
+
+    def set_script_timeout(self, seconds):
+        self.script_timeouts.append(seconds)
+        self.timeouts.script = seconds
+
+
+class ReadinessTests(SimpleTestCase):
+    """Pages are scrolled until they hold enough cards or go quiet, leaving the browser's script timeout alone."""
+
+    def test_quiet(self):
+        driver = ReadyDriver(2, [(5, False), (5, False)])
+        report = {}
+        self.assertEqual(wait_until_ready(driver, 'li', limit=10, report=report), 5)
+        # The second round added nothing: the page has no more
+        self.assertEqual((report['ready']['cards'], report['ready']['scrolls']), (5, 2))
+        self.assertEqual(driver.script_timeouts, [ROUND_TIMEOUT + 1, ROUND_TIMEOUT + 1, 30])
+
+    def test_limit_and_on_round(self):
+        driver = ReadyDriver(2, [(12, False)])
+        self.assertEqual(wait_until_ready(driver, 'li', limit=10), 12)
+        rounds = []
+        driver = ReadyDriver(2, [(4, False), (6, False), (6, False)])
+        self.assertEqual(wait_until_ready(driver, 'li', limit=10, on_round=lambda cards: rounds.append(cards)), 6)
+        self.assertEqual(rounds, [4, 6])
+        driver = ReadyDriver(2, [(4, False), (6, False)])
+        self.assertEqual(wait_until_ready(driver, 'li', limit=10, on_round=lambda cards: True), 4)
+        self.assertEqual(driver.timeouts.script, 30)
+
+    def test_round_timeout_falls_back_to_count(self):
+        # A round that never went quiet still counts the cards it loaded
+        driver = ReadyDriver(2, [(7, True), (7, False)])
+        report = {}
+        self.assertEqual(wait_until_ready(driver, 'li', limit=10, report=report), 7)
+        self.assertEqual(report['ready']['scrolls'], 2)
+        self.assertEqual(driver.timeouts.script, 30)
+
+    def test_expired_deadline(self):
+        driver = ReadyDriver(2, [])
+        self.assertEqual(wait_until_ready(driver, 'li', limit=10, deadline=Deadline(0)), 2)
+        self.assertEqual(driver.script_timeouts, [])
+
+
+class SiteHealthTests(SimpleTestCase):
+    """Failing sites are short-circuited, timeouts follow latency, and retries stay within budget."""
+
+    def test_circuit_breaker(self):
+        health = SiteHealthTracker(failure_threshold=3, cooldown=0.05)
+        for _ in range(3):
+            health.check('ajio')
+            health.record('ajio', 1.0, False)
+        with self.assertRaises(CircuitOpen):
+            health.check('ajio')
+        health.check('myntra')  # Other sites are unaffected
+        time.sleep(0.06)
+        # After the cooldown one probe goes through; a failed probe reopens the circuit at once
+        health.check('ajio')
+        with self.assertRaises(CircuitOpen):
+            health.check('ajio')
+        health.record('ajio', 1.0, False)
+        self.assertEqual(health.stats()['sites']['ajio']['circuit'], CIRCUIT_OPEN)
+        time.sleep(0.06)
+        health.check('ajio')
+        health.record('ajio', 1.0, True)
+        self.assertEqual(health.stats()['sites']['ajio']['circuit'], CIRCUIT_CLOSED)
+        health.check('ajio')
+        self.assertEqual(health.stats()['short_circuited'], 2)
+
+    def test_adaptive_timeout(self):
+        health = SiteHealthTracker(timeout_min_samples=5, timeout_factor=1.5, timeout_floor=5)
+        for latency in (4.0, 4.0, 4.0, 4.0):
+            health.record('myntra', latency, True)
+        self.assertEqual(health.timeout('myntra', 30), 30)
+        health.record('myntra', 8.0, True)
+        self.assertEqual(health.timeout('myntra', 30), 12.0)
+        self.assertEqual(health.timeout('myntra', 10), 10)
+        for _ in range(5):
+            health.record('ajio', 0.5, True)
+        self.assertEqual(health.timeout('ajio', 30), 5)
+
+    def test_timeout_per_tier(self):
+        health = SiteHealthTracker(timeout_min_samples=5, timeout_factor=1.5, timeout_floor=5)
+        for _ in range(10):
+            health.record('meesho', 0.4, True, TIER_HTTP)
+        # Sub-second HTTP fetches say nothing about how long the browser fallback needs
+        with mock.patch('scraper.utils.get_site_health', return_value=health):
+            self.assertEqual(wait_timeout('meesho', 20), 20)
+            for _ in range(5):
+                health.record('meesho', 8.0, True, TIER_SELENIUM)
+            self.assertEqual(wait_timeout('meesho', 20), 12.0)
+        self.assertEqual(health.timeout('meesho', 20, TIER_HTTP), 5)
+
+    def test_retry_budget(self):
+        budget = RetryBudget(ratio=0.2, min_retries=1, window=60)
+        for _ in range(10):
+            budget.record_attempt()
+        # One retry always, plus one per five attempts
+        self.assertEqual([budget.try_retry() for _ in range(4)], [True, True, True, False])
+        self.assertEqual(budget.stats()['denied'], 1)
+
+
+class SchedulerTests(SimpleTestCase):
+    """Only Selenium-tier sites are held to the free browsers; HTTP-tier sites always get threads."""
+
+    def test_http_sites_not_capped_by_browsers(self):
+        registry = get_site_registry()
+        sites = [registry.get(site) for site in ('tatacliq', 'google_shopping', 'meesho', 'fabindia')]
+        admission = BrowserAdmission(capacity=1)
+        admission.acquire()  # No browser free
+        release = threading.Event()
+
+        def scrape_site(func, query, report=None, deadline=None, quota=None):
+            if func.tier != TIER_HTTP:
+                release.wait(5)
+            return [make_product('Kurta', '₹499', 'N/A', 'N/A', 'N/A', func.name)]
+
+        with mock.patch('scraper.scheduler.get_browser_admission', return_value=admission), \
+                mock.patch('scraper.utils.scrape_site', scrape_site), \
+                mock.patch('scraper.utils.expected_duration', lambda site, query, depth: 1.0):
+            self.assertEqual(worker_count(sites, 5), (1, 2))
+            results = iter_site_results('kurta', sites)
+            # Both HTTP-tier sites finish while the browser sites wait
+            self.assertEqual({next(results)[0], next(results)[0]}, {'meesho', 'fabindia'})
+            release.set()
+            self.assertEqual({site for site, _ in results}, {'tatacliq', 'google_shopping'})
+
+
+class AsyncPipelineTests(SimpleTestCase):
+    """The async pipeline keeps blocking cache lookups off the event loop."""
+
+    def test_schedule_planned_off_loop(self):
+        def expected_duration(site, query, depth):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return {'myntra': 5.0, 'ajio': 9.0}[site]
+            raise AssertionError("Planned on the event loop")
+
+        async def scrape(func, query, **kwargs):
+            return []
+
+        sites = [get_site_registry().get('myntra'), get_site_registry().get('ajio')]
+        schedule = {}
+        with mock.patch('scraper.async_pipeline.expected_duration', expected_duration), \
+                mock.patch('scraper.async_pipeline.scrape_site_async', scrape):
+            asyncio.run(scrape_sites_async('shirt', sites, schedule=schedule))
+        self.assertEqual(schedule['order'], ['ajio', 'myntra'])
+
+
+class SiteRegistryTests(SimpleTestCase):
+    """Site definitions compile into adapters found by key or alias, with per-site knobs from settings."""
+
+    @override_settings(SCRAPER_SITE_OVERRIDES={'meesho': {'wait_timeout': 4, 'tier': TIER_SELENIUM, 'default': False}})
+    def test_settings_overrides(self):
+        with mock.patch('scraper.sites._registry', None):
+            registry = get_site_registry()
+            meesho = registry.get('meesho')
+            self.assertEqual((meesho.wait_timeout, meesho.tier, meesho.default), (4, TIER_SELENIUM, False))
+            # Sites without overrides keep their declared knobs
+            self.assertEqual((registry.get('myntra').wait_timeout, registry.get('myntra').tier), (30, TIER_HTTP))
+            self.assertNotIn(meesho, registry.resolve([]))
+
+    def test_unknown_knob(self):
+        with self.assertRaisesMessage(ValueError, "Unknown settings in SCRAPER_SITE_OVERRIDES for ajio: ['timeout']"):
+            build_registry(overrides={'ajio': {'timeout': 5}})
+
+    def test_aliases_and_resolve(self):
+        registry = build_registry()
+        nykaa = registry.get('nykaa_fashion')
+        self.assertIs(registry.get(' NykaaFashion '), nykaa)
+        self.assertIs(registry.get('google'), registry.get('google_shopping'))
+        self.assertIsNone(registry.get('etsy'))
+        # Unknown names are dropped and aliases of one site resolve to it once
+        self.assertEqual(registry.resolve(['nykaa', 'etsy', 'nykaa_fashion', 'google']),
+                         [nykaa, registry.get('google_shopping')])
+        self.assertNotIn(registry.get('google_shopping'), registry.resolve([]))
+
+    def test_url_templates(self):
+        registry = build_registry()
+        myntra = registry.get('myntra')
+        self.assertEqual(myntra.search_url('black shirt'), 'https://www.myntra.com/black-shirt')
+        self.assertEqual(myntra.search_url('black shirt', page=3), 'https://www.myntra.com/black-shirt?p=3')
+        self.assertEqual(registry.get('ajio').search_url('black shirt'), 'https://www.ajio.com/search/?text=black shirt')
+        # Sites without a page URL only ever read their first page
+        self.assertEqual((myntra.max_pages, registry.get('meesho').max_pages), (5, 1))
+        definition = {**SITE_DEFINITIONS[0], 'url': 'https://www.meesho.com/search?q={q}'}
+        with self.assertRaisesMessage(ValueError, "Unknown placeholders in URL template for meesho: {'q'}"):
+            build_registry([definition])
+        with self.assertRaises(ValueError):
+            build_registry([{**SITE_DEFINITIONS[0], 'page_url': 'https://www.meesho.com/search?q={query}&p={offset}'}])
+
+
+class ParserParityTests(SimpleTestCase):
+    """The scoped, precompiled parsers must match the original scraper output."""
+
+    def assert_parity(self):
+        for adapter in get_site_registry():
+            site = adapter.key
+            with self.subTest(site=site):
+                page = (TESTDATA / f'{site}.html').read_text(encoding='utf-8')
+                expected = json.loads((TESTDATA / f'{site}.json').read_text(encoding='utf-8'))
+                self.assertEqual([product.as_dict() for product in adapter.parse(page)], expected)
+
+    @override_settings(SCRAPER_HTML_PARSER='html.parser')
+    def test_html_parser_backend(self):
+        self.assert_parity()
+
+    @skipUnless(DEFAULT_PARSER == 'lxml', "lxml is not installed")
+    @override_settings(SCRAPER_HTML_PARSER='lxml')
+    def test_lxml_backend(self):
+        self.assert_parity()
+
+
+class PageDriver:
+    """Serves a saved page, running the in-page extractor by parsing it with the same spec."""
+
+    def __init__(self, page, broken=False):
+        self.page_source = page
+        self.broken = broken
+        self.specs = []
+
+    def execute_script(self, script, spec):
+        if self.broken:
+            raise WebDriverException("javascript error")
+        self.specs.append(spec)
+        adapter = get_site_registry().get('meesho')
+        rows = parse_rows(self.page_source, adapter.compiled, adapter.strainer, 'html.parser', spec['limit'])
+        return json.dumps(rows[spec.get('offset', 0):])
+
+
+@override_settings(SCRAPER_HTML_PARSER='html.parser')
+@mock.patch('scraper.parse_pool.get_parse_pool', lambda: ParsePool(workers=0))
+class ExtractionTests(SimpleTestCase):
+    """In-page extraction returns the products page source parsing would, and falls back to it."""
+
+    def setUp(self):
+        self.adapter = get_site_registry().get('meesho')
+        self.page = (TESTDATA / 'meesho.html').read_text(encoding='utf-8')
+        self.expected = json.loads((TESTDATA / 'meesho.json').read_text(encoding='utf-8'))
+
+    def extract(self, driver, **kwargs):
+        report = {}
+        products = extract_products(driver, self.adapter, report, **kwargs)
+        return [product.as_dict() for product in products], report
+
+    @override_settings(SCRAPER_EXTRACTION_MODE=MODE_JS)
+    def test_in_page(self):
+        driver = PageDriver(self.page)
+        self.assertEqual(self.extract(driver), (self.expected, {'extraction': 'js'}))
+        # Cards already read while scrolling are skipped
+        products, _ = self.extract(driver, offset=1, limit=3)
+        self.assertEqual(products, self.expected[1:3])
+        self.assertEqual((driver.specs[-1]['offset'], driver.specs[-1]['limit']), (1, 3))
+
+    @override_settings(SCRAPER_EXTRACTION_MODE=MODE_JS)
+    def test_falls_back_to_page_source(self):
+        self.assertEqual(self.extract(PageDriver(self.page, broken=True)), (self.expected, {'extraction': 'soup'}))
+
+    @override_settings(SCRAPER_EXTRACTION_MODE=MODE_COMPARE)
+    def test_compare(self):
+        products, report = self.extract(PageDriver(self.page))
+        self.assertEqual(products, self.expected)
+        self.assertEqual(report, {'extraction': 'compare', 'extraction_mismatches': 0})
+
+
+class FakeSession:
+    """Serves saved pages to the HTTP tier by result page number, failing for pages it doesn't have."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.urls = []
+
+    def get(self, url, timeout=None):
+        self.urls.append(url)
+        page = self.pages.get(len(self.urls))
+        if page is None:
+            raise requests.ConnectionError("connection refused")
+        response = requests.Response()
+        response.status_code = 200
+        response.encoding = 'utf-8'
+        response._content = page.encode('utf-8')
+        return response
+
+
+@override_settings(SCRAPER_HTML_PARSER='html.parser')
+@mock.patch('scraper.parse_pool.get_parse_pool', lambda: ParsePool(workers=0))
+class HttpTierTests(SimpleTestCase):
+    """HTTP-tier sites are read from embedded state or card markup, page by page, and fall back to a browser."""
+
+    def saved(self, name):
+        page = (TESTDATA / f'{name}.html').read_text(encoding='utf-8')
+        expected = json.loads((TESTDATA / f'{name}.json').read_text(encoding='utf-8'))
+        return page, expected
+
+    def fetch(self, adapter, pages, **kwargs):
+        session = FakeSession(pages)
+        report = {}
+        with mock.patch('scraper.http_fetch.get_session', return_value=session):
+            products = fetch_with_http(adapter, 'shirt', report, **kwargs)
+        return [product.as_dict() for product in products], report, session
+
+    def test_embedded_state(self):
+        for site in ('myntra', 'nykaa_fashion'):
+            with self.subTest(site=site):
+                adapter = get_site_registry().get(site)
+                page, expected = self.saved(f'{site}_state')
+                products = extract_embedded_products(page, adapter.name)
+                self.assertEqual([product.as_dict() for product in products], expected)
+                self.assertEqual(self.fetch(adapter, {1: page})[0], expected)
+                self.assertEqual(len(extract_embedded_products(page, adapter.name, limit=1)), 1)
+
+    def test_falls_back_to_card_parser(self):
+        # Meesho carries embedded state, but a page without it is parsed from its cards
+        page, expected = self.saved('meesho')
+        products, report, _ = self.fetch(get_site_registry().get('meesho'), {1: page})
+        self.assertEqual(products, expected)
+        self.assertEqual((report['tier'], report['pages']), ('http', 1))
+
+    def test_pages_and_quota(self):
+        adapter = build_registry(overrides={'myntra': {'max_pages': 3}}).get('myntra')
+        page, expected = self.saved('myntra_state')
+        pages = {number: page for number in range(1, 10)}
+        # A search with a limit follows result pages up to the site's page limit...
+        products, report, session = self.fetch(adapter, pages, depth=100, quota=ResultQuota(100))
+        self.assertEqual(len(products), 3 * len(expected))
+        self.assertEqual(session.urls, ['https://www.myntra.com/shirt', 'https://www.myntra.com/shirt?p=2',
+                                        'https://www.myntra.com/shirt?p=3'])
+        self.assertEqual(report['pages'], 3)
+        # ...stops once the search's limit is met...
+        products, report, session = self.fetch(adapter, pages, depth=100, quota=ResultQuota(4))
+        self.assertEqual((len(products), report['pages']), (2 * len(expected), 2))
+        # ...or at the first page that fails
+        products, report, session = self.fetch(adapter, {1: page}, depth=100, quota=ResultQuota(100))
+        self.assertEqual((products, report['pages'], len(session.urls)), (expected, 1, 2))
+
+    @override_settings(SCRAPER_EXTRACTION_MODE=MODE_JS)
+    def test_falls_back_to_selenium(self):
+        adapter = get_site_registry().get('meesho')
+        page, expected = self.saved('meesho')
+        driver = PageDriver(page)
+        report = {}
+        with mock.patch('scraper.http_fetch.get_session', return_value=FakeSession({1: '<html></html>'})), \
+                mock.patch('scraper.utils.pooled_driver', lambda deadline=None: contextlib.nullcontext(driver)), \
+                mock.patch('scraper.utils.load_page'), mock.patch('scraper.utils.WebDriverWait'), \
+                mock.patch('scraper.utils.wait_until_ready'):
+            products = scrape_with_adapter(adapter, 'shirt', report)
+        self.assertEqual([product.as_dict() for product in products], expected)
+        self.assertEqual(report['tier'], 'selenium')
+        self.assertNotIn('pages', report)
+
+
+@override_settings(SCRAPER_HTML_PARSER='html.parser')
+class ParsePoolTests(SimpleTestCase):
+    """Pages parsed in worker processes give the products inline parsing does."""
+
+    def test_parse_in_workers(self):
+        adapter = get_site_registry().get('meesho')
+        page = (TESTDATA / 'meesho.html').read_text(encoding='utf-8')
+        expected = adapter.parse(page)
+        pool = ParsePool(workers=1)
+        self.addCleanup(pool.close)
+        self.assertEqual(pool.parse(adapter, page), expected)
+        self.assertEqual(pool.parse(adapter, page, limit=2), expected[:2])
+        # Large pages are handed over in shared memory
+        padded = page.replace('</body>', '<!--' + 'x' * SHARED_MEMORY_MIN_BYTES + '--></body>')
+        self.assertEqual(pool.parse(adapter, padded, deadline=Deadline(30)), expected)
+        self.assertEqual(pool.stats()['pooled'], 3)
+        self.assertEqual(pool.stats()['shared_memory'], 1)
+        with self.assertRaises(DeadlineExceeded):
+            pool.parse(adapter, page, deadline=Deadline(0))
+
+    def test_inline(self):
+        adapter = get_site_registry().get('meesho')
+        page = (TESTDATA / 'meesho.html').read_text(encoding='utf-8')
+        pool = ParsePool(workers=0)
+        self.assertEqual(pool.parse(adapter, page), adapter.parse(page))
+        self.assertEqual(pool.stats()['inline'], 1)
+
+
+class ResultSetTests(SimpleTestCase):
+    """Numeric ratings and the columnar result set's filters and sorts."""
+
+    def products(self):
+        return [
+            make_product('Shirt', '₹999', 'N/A', 'N/A', '4.2|1.2k', 'Myntra'),
+            make_product('Kurta', '₹499', 'N/A', 'N/A', '4.5 (120)', 'Google Shopping'),
+            make_product('Tee', '₹499', 'N/A', 'N/A', 'N/A', 'AJIO'),
+            make_product('N/A', '₹199', 'N/A', 'N/A', '4.9', 'Meesho'),
+            make_product('Jeans', 'N/A', 'N/A', 'N/A', '4.0 out of 5 stars', 'Amazon'),
+            make_product('Top', '₹1,299', 'N/A', 'N/A', '3.8', 'Flipkart'),
+        ]
+
+    def names(self, result_set):
+        return [product['name'] for product in result_set.to_list()]
+
+    def test_normalize_rating(self):
+        self.assertEqual(normalize_rating('4.2|1.2k'), (4.2, 1200))
+        self.assertEqual(normalize_rating('4.5 (1,234)'), (4.5, 1234))
+        self.assertEqual(normalize_rating('4.0 out of 5 stars'), (4.0, None))
+        self.assertEqual(normalize_rating('N/A'), (None, None))
+
+    def test_filter_and_sort(self):
+        results = ResultSet(self.products()).filter(max_price=1000)
+        self.assertEqual(self.names(results.sort(('price',))), ['Kurta', 'Tee', 'Shirt'])
+        self.assertEqual(self.names(results.sort(('-rating', 'price'))), ['Kurta', 'Shirt', 'Tee'])
+        self.assertEqual(self.names(results.filter(min_rating=4.3)), ['Kurta'])
+        self.assertEqual(self.names(results.filter(sites=['AJIO'])), ['Tee'])
+
+    def test_discount_sort(self):
+        products = [
+            make_product('Plain', '₹500', 'N/A', 'N/A', 'N/A', 'Amazon'),
+            make_product('Half off', '₹500', 'N/A', 'N/A', 'N/A', 'Myntra', mrp='₹1,000'),
+            make_product('Fifth off', '₹800', 'N/A', 'N/A', 'N/A', 'AJIO', mrp='₹1,000'),
+        ]
+        results = ResultSet(products).sort(SORT_MODES['discount'])
+        self.assertEqual(self.names(results), ['Half off', 'Fifth off', 'Plain'])
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor('ab' * 16, 40)), ('ab' * 16, 40))
+        with self.assertRaises(ValueError):
+            decode_cursor('not-a-cursor')
+
+    def test_top_matches_full_sort(self):
+        results = ResultSet(self.products()).filter()
+        for keys in (('price',), ('-price',), ('-reviews', 'price')):
+            for k in range(len(results) + 1):
+                self.assertEqual(results.top(k, keys).to_list(), results.sort(keys).to_list()[:k])
+
+
+class AsyncCursorTests(TestCase):
+    """Result sets of async searches reach the shared store, so any worker can serve their cursors."""
+
+    async def test_cursor_from_another_worker(self):
+        products = [make_product(f'Shirt {i}', f'₹{i}99', 'N/A', 'N/A', 'N/A', 'Myntra') for i in range(1, 4)]
+
+        async def scrape(query, scrapers, **kwargs):
+            return products
+
+        with mock.patch('api.views.scrape_sites_async', scrape), \
+                mock.patch('api.views.get_query_log', lambda: QueryLog(flush_seconds=3600)), \
+                mock.patch('api.views.get_result_store', lambda: ResultStore()):
+            response = await self.async_client.get('/api/search/async/', {'query': 'shirt', 'limit': 2})
+            self.assertEqual(response.status_code, 200)
+            # Each request gets a fresh store, like a worker that never saw the search
+            response = await self.async_client.get('/api/search/async/', {'cursor': response.json()['next_cursor']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product['name'] for product in response.json()['results']], ['Shirt 3'])
+
+
+class SearchStreamTests(TestCase):
+    """The NDJSON search streams a frame per finished site, then a summary with every site's outcome."""
+
+    def stream(self, iter_site_results):
+        with mock.patch('api.views.iter_site_results', iter_site_results), \
+                mock.patch('api.views.get_query_log', lambda: QueryLog(flush_seconds=3600)), \
+                mock.patch('api.views.get_result_store', lambda: ResultStore()):
+            response = self.client.get('/api/search/stream/', {'query': 'shirt', 'sites': 'myntra,ajio,amazon'})
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            return [json.loads(line) for line in b''.join(response.streaming_content).decode('utf-8').splitlines()]
+
+    def test_site_and_summary_frames(self):
+        products = [make_product(f'Shirt {i}', f'₹{i}99', 'N/A', 'N/A', 'N/A', 'Myntra') for i in (3, 1, 2)]
+
+        def iter_site_results(query, scrapers, reports, deadline, schedule, quota):
+            reports['myntra'] = {'status': 'ok', 'tier': 'http'}
+            yield 'myntra', products
+            reports['ajio'] = {'status': 'error', 'error': 'HTTP 503'}
+            yield 'ajio', []
+            # Sites not started before the deadline get no frame of their own
+            reports['amazon'] = {'status': 'skipped', 'error': 'Deadline passed before the site was scraped'}
+
+        frames = self.stream(iter_site_results)
+        self.assertEqual([frame['type'] for frame in frames], ['site', 'site', 'summary'])
+        myntra, ajio, summary = frames
+        self.assertEqual([product['name'] for product in myntra['results']], ['Shirt 1', 'Shirt 2', 'Shirt 3'])
+        self.assertEqual(myntra['report'], {'status': 'ok', 'tier': 'http'})
+        self.assertEqual((ajio['site'], ajio['results'], ajio['report']['status']), ('ajio', [], 'error'))
+        self.assertEqual(summary['total_results'], 3)
+        self.assertEqual(summary['sites']['amazon']['status'], 'skipped')
+        self.assertEqual(summary['errors'], [
+            'Error scraping ajio: HTTP 503', 'Skipped amazon: Deadline passed before the site was scraped',
+        ])
+        self.assertIsNotNone(summary['cursor'])
+
+    def test_failure_mid_stream(self):
+        def iter_site_results(query, scrapers, reports, deadline, schedule, quota):
+            reports['myntra'] = {'status': 'ok'}
+            yield 'myntra', [make_product('Shirt', '₹999', 'N/A', 'N/A', 'N/A', 'Myntra')]
+            raise RuntimeError("executor shut down")
+
+        frames = self.stream(iter_site_results)
+        self.assertEqual([frame['type'] for frame in frames], ['site', 'summary'])
+        self.assertIsNone(frames[-1]['cursor'])
+        self.assertEqual(frames[-1]['errors'], ['An error occurred: executor shut down'])
+
+
+class ResultQuotaTests(SimpleTestCase):
+    """Early termination counts only matching products, once per site."""
+
+    def test_counts_matches_across_sites(self):
+        quota = ResultQuota(3, max_price=1000)
+        cheap = make_product('Tee', '₹499', 'N/A', 'N/A', 'N/A', 'AJIO')
+        dear = make_product('Coat', '₹4,999', 'N/A', 'N/A', 'N/A', 'AJIO')
+        quota.update('ajio', [cheap, dear])
+        quota.update('ajio', [cheap, dear, cheap])  # A later page replaces the site's count
+        self.assertEqual(quota.matches(), 2)
+        self.assertFalse(quota.met())
+        quota.update('myntra', [cheap])
+        self.assertTrue(quota.met())
+
+    @override_settings(SCRAPER_HTML_PARSER='html.parser')
+    def test_parse_limit(self):
+        adapter = get_site_registry().get('amazon')
+        saved = (TESTDATA / 'amazon.html').read_text(encoding='utf-8')
+        card = saved[saved.index('<div data-component-type'):saved.index('</div></main>')]
+        page = saved.replace(card, ''.join(card.replace('T-shirt', f'T-shirt {i}') for i in range(5)))
+        self.assertEqual(len(adapter.parse(page)), 5)
+        with mock.patch.object(adapter.compiled, 'row', wraps=adapter.compiled.row) as row:
+            products = adapter.parse(page, limit=2)
+        self.assertEqual([product.name for product in products], ['T-shirt 0', 'T-shirt 1'])
+        # Cards past the limit are never read
+        self.assertEqual(row.call_count, 2)
+
+    def test_coalesced_scrapes_keep_depth(self):
+        caches['default'].clear()
+        cache = ResultCache(alias='default')
+        flight = get_single_flight()
+        release = threading.Event()
+
+        def fetch(count, exhausted=False, wait=False):
+            def _fetch(report, deadline):
+                if wait:
+                    release.wait(5)
+                report['depth'] = {'exhausted': exhausted}
+                return [make_product(f'Shirt {i}', '₹999', 'N/A', 'N/A', 'N/A', 'Myntra') for i in range(count)]
+            return _fetch
+
+        # A search with a limit doesn't join a shallower scrape of the same query...
+        leader = threading.Thread(target=cache.get_or_scrape,
+                                  args=('myntra', 'depth shirt', fetch(10, wait=True)), kwargs={'depth': 10})
+        leader.start()
+        while cache._key('myntra', 'depth shirt') + ':10' not in flight._calls:
+            time.sleep(0.01)
+        report = {}
+        products = cache.get_or_scrape('myntra', 'depth shirt', fetch(30), report, depth=10, read_depth=100)
+        self.assertEqual((len(products), report['coalesced']), (30, ROLE_LEADER))
+        release.set()
+        leader.join()
+
+        # ...and a follower of a scrape its search's limit stopped early scrapes again
+        release.clear()
+        leader = threading.Thread(target=cache.get_or_scrape, args=('myntra', 'quota shirt', fetch(4, wait=True)),
+                                  kwargs={'depth': 10, 'read_depth': 100})
+        leader.start()
+        key = cache._key('myntra', 'quota shirt') + ':100'
+        while key not in flight._calls:
+            time.sleep(0.01)
+        follower_products = []
+        follower = threading.Thread(target=lambda: follower_products.extend(
+            cache.get_or_scrape('myntra', 'quota shirt', fetch(12), depth=10, read_depth=100)))
+        follower.start()
+        while flight._calls[key].followers < 1:
+            time.sleep(0.01)
+        release.set()
+        leader.join()
+        follower.join()
+        self.assertEqual(len(follower_products), 12)
+
+
+class ProductRecordTests(SimpleTestCase):
+    """Product records must serialize and pickle like the dicts they replace."""
+
+    def test_render_json_matches_dicts(self):
+        products = [
+            make_product('Shirt "Slim"', '₹1,299', 'a.jpg', 'Cotton', '4.2|1.2k', 'Myntra'),
+            make_product('Kurta', 'N/A', 'N/A', 'N/A', 'N/A', 'AJIO'),
+        ]
+        data = {'query': 'shirt', 'results': products, 'legacy': [{'name': 'Cached', 'price': 10.0}]}
+        expected = {'query': 'shirt', 'results': [product.as_dict() for product in products],
+                    'legacy': [{'name': 'Cached', 'price': 10.0}]}
+        self.assertEqual(json.loads(render_json(data)), expected)
+
+    def test_pickle_round_trip(self):
+        product = make_product('Shirt', '₹999', 'N/A', 'N/A', '4.5 (120)', 'Google Shopping')
+        restored = pickle.loads(pickle.dumps(product))
+        self.assertIsInstance(restored, Product)
+        self.assertEqual(restored, product)
+
+
+class CatalogTests(TestCase):
+    """Scrape results ingested into the catalog answer the same search later."""
+
+    def job(self, site, products, found=None, exhausted=True):
+        return IngestJob(site=site, query='shirt', products=products, found=found or len(products),
+                         tier='http', exhausted=exhausted, finished_at=timezone.now())
+
+    def test_ingest_and_lookup(self):
+        first = [
+            make_product('Slim Shirt', '₹999', 'a.jpg', 'N/A', '4.2|1.2k', 'Myntra', mrp='₹1,999'),
+            make_product('Kurta', '₹499', 'b.jpg', 'N/A', 'N/A', 'Myntra'),
+        ]
+        write_batch([self.job('myntra', first), self.job('ajio', first[:1], found=4, exhausted=False)])
+        # A later run upserts the product and offer instead of duplicating them
+        repriced = [make_product('slim  shirt', '₹899', 'a.jpg', 'N/A', '4.2|1.2k', 'Myntra', mrp='₹1,999')]
+        write_batch([self.job('myntra', repriced + first[1:])])
+        self.assertEqual(CatalogProduct.objects.count(), 2)
+        self.assertEqual(Offer.objects.get(site='Myntra', product__normalized_name='slim shirt').price, 899.0)
+
+        catalog = Catalog(ttl=600)
+        report = {}
+        products = catalog.lookup('myntra', ' Shirt ', depth=2, report=report)
+        self.assertEqual([product.name for product in products], ['slim  shirt', 'Kurta'])
+        self.assertEqual(products[1], first[1])
+        self.assertEqual(report['tier'], 'catalog')
+        # A run cut short before the site ran out can't answer a deeper search
+        self.assertIsNone(catalog.lookup('ajio', 'shirt', depth=10))
+        self.assertIsNone(Catalog(ttl=0).lookup('myntra', 'shirt'))
+
+    def test_same_name_listings(self):
+        # Sellers listing the same kurta at different prices are separate offers, with or without images
+        listings = [
+            make_product('Women Kurta', '₹399', 'a.jpg', 'N/A', 'N/A', 'Meesho'),
+            make_product('Women Kurta', '₹449', 'b.jpg', 'N/A', 'N/A', 'Meesho'),
+            make_product('Women Kurta', '₹499', 'N/A', 'N/A', 'N/A', 'Meesho'),
+            make_product('Women Kurta', '₹549', 'N/A', 'N/A', 'N/A', 'Meesho'),
+            make_product('!!!', '₹99', 'N/A', 'N/A', 'N/A', 'Meesho'),
+            make_product('???', '₹99', 'N/A', 'N/A', 'N/A', 'Meesho'),
+        ]
+        write_batch([self.job('meesho', listings)])
+        self.assertEqual(Offer.objects.count(), 6)
+        self.assertEqual(Catalog(ttl=600).lookup('meesho', 'shirt'), listings)
+
+    def test_staging_csv_nulls(self):
+        # No price, list price or rating: the numeric columns must reach COPY as NULL, not as text
+        product = make_product('Kurta', 'N/A', 'N/A', 'N/A', 'N/A', 'AJIO')
+        line = _staging_csv([(1, 0, 'kurta', 'abc', product)]).getvalue()
+        self.assertEqual(line, '1,0,"kurta","Kurta","N/A","AJIO","abc","","N/A","","N/A","N/A","",""\r\n')
+        row = dict(zip(STAGING_COLUMNS, next(csv.reader([line]))))
+        self.assertEqual({column for column, value in row.items() if value == ''}, set(STAGING_NULLABLE))
+
+    def test_index_search(self):
+        write_batch([self.job('myntra', [
+            make_product('Roadster - Black Slim Shirt', '₹999', 'N/A', 'Cotton', 'N/A', 'Myntra'),
+            make_product('HRX - Black Joggers', '₹799', 'N/A', 'N/A', 'N/A', 'Myntra'),
+            make_product('Red Kurta', '₹499', 'N/A', 'N/A', 'N/A', 'Myntra'),
+        ]), self.job('google_shopping', [
+            make_product('Black shirts', '₹599', 'N/A', 'N/A', 'N/A', 'Google Shopping - Store'),
+        ])])
+        names = [product.name for product in search_products('black shirt, medium size')]
+        self.assertEqual(set(names[:2]), {'Roadster - Black Slim Shirt', 'Black shirts'})
+        self.assertEqual(names[2:], ['HRX - Black Joggers'])
+        self.assertEqual([product.name for product in search_products('roadster')], ['Roadster - Black Slim Shirt'])
+        self.assertEqual([product.name for product in search_products('shirt', ['Google Shopping'])], ['Black shirts'])
+        # Offers upserted by a later scrape are re-indexed
+        write_batch([self.job('myntra', [make_product('Red Kurta', '₹449', 'N/A', 'Silk', 'N/A', 'Myntra')])])
+        self.assertEqual([product.price for product in search_products('silk')], [449.0])
+
+
+class JobQueueTests(TestCase):
+    """Site tasks go to the node their site is sharded to, or to an idle node once they have waited."""
+
+    def test_sharding_is_stable(self):
+        sites = [adapter.key for adapter in get_site_registry()]
+        before = assign_sites(sites, ['a', 'b'])
+        after = assign_sites(sites, ['a', 'b', 'c'])
+        self.assertEqual(set(before.values()), {'a', 'b'})
+        # Only the sites the new node takes over move
+        self.assertEqual({site for site in sites if before[site] != after[site]},
+                         {site for site in sites if after[site] == 'c'})
+
+    def test_claim_steal_and_take_over(self):
+        queue = JobQueue(lease_seconds=30, max_attempts=2)
+        job = queue.submit('shirt', {'sites': 'myntra,ajio', 'limit': 10})
+        self.assertEqual(job.tasks.count(), 2)
+        own = queue.claim('a', sites=['myntra'], steal_after=60)
+        self.assertEqual((own.site, own.stolen), ('myntra', False))
+        self.assertEqual(SearchJob.objects.get(pk=job.pk).status, SearchJob.RUNNING)
+        # AJIO's task hasn't waited long enough to be stolen from its own node
+        self.assertIsNone(queue.claim('a', sites=['myntra'], steal_after=60))
+        stolen = queue.claim('a', sites=['myntra'], steal_after=0)
+        self.assertEqual((stolen.site, stolen.stolen), ('ajio', True))
+
+        # Node a stops renewing its lease: b takes the task over and a can no longer finish it
+        SiteTask.objects.filter(pk=own.pk).update(lease_expires_at=timezone.now())
+        taken = queue.claim('b', sites=['ajio'], steal_after=0)
+        self.assertEqual((taken.pk, taken.attempts), (own.pk, 2))
+        self.assertEqual(queue.renew([own, stolen], 'a'), 1)
+        product = make_product('Slim Shirt', '₹999', 'a.jpg', 'N/A', '4.2|1.2k', 'Myntra')
+        self.assertFalse(queue.complete(own, 'a', {'status': 'ok'}, [product], 1))
+        self.assertTrue(queue.complete(taken, 'b', {'status': 'ok'}, [product], 1))
+        self.assertEqual(SearchJob.objects.get(pk=job.pk).status, SearchJob.RUNNING)
+
+        # A task whose workers keep dying fails, which finishes the job
+        SiteTask.objects.filter(pk=stolen.pk).update(lease_expires_at=timezone.now(), attempts=2)
+        self.assertIsNone(queue.claim('c'))
+        job = SearchJob.objects.get(pk=job.pk)
+        self.assertEqual(job.status, SearchJob.DONE)
+        self.assertEqual([product['name'] for product in job.results], ['Slim Shirt'])
+        self.assertEqual(job.errors, ["Error scraping ajio: Gave up after 2 workers stopped running the scrape"])
+        # Finished jobs count as searches in the query log
+        get_query_log().flush()
+        self.assertEqual(SearchQuery.objects.get(query='shirt').searches, 1)
+
+
+class PrewarmTests(TestCase):
+    """Logged queries are refreshed before their cached results expire, and hits on those results are counted."""
+
+    def test_query_log_and_plan(self):
+        log = QueryLog(flush_seconds=3600)
+        reports = {
+            'myntra': {'cache': 'miss', 'elapsed': 4.0},
+            'ajio': {'cache': 'hit', 'prewarmed': True, 'elapsed': 0.1},
+            'amazon': {'status': 'skipped'},
+        }
+        log.record(' Black  Shirt', 4.2, reports)
+        log.record('black shirt', 1.0, reports)
+        log.flush()
+        log.record('black shirt', 2.0, {})
+        log.flush()
+        searched = SearchQuery.objects.get(query='black shirt')
+        self.assertEqual((searched.searches, searched.max_seconds), (3, 4.2))
+        ajio = QuerySiteStat.objects.get(query='black shirt', site='ajio')
+        self.assertEqual((ajio.lookups, ajio.hits, ajio.prewarmed_hits), (2, 2, 2))
+        self.assertFalse(QuerySiteStat.objects.filter(site='amazon').exists())
+        self.assertEqual(prewarm_report(days=1)['prewarm_hit_rate'], 0.5)
+
+        cache = get_result_cache()
+        self.assertEqual(set(Prewarmer(top_queries=1).plan()), {('myntra', 'black shirt'), ('ajio', 'black shirt')})
+        product = make_product('Slim Shirt', '₹999', 'a.jpg', 'N/A', '4.2|1.2k', 'Myntra')
+        cache.refresh('myntra', 'black shirt', lambda report, deadline: [product])
+        self.assertEqual(Prewarmer(top_queries=1).plan(), [('ajio', 'black shirt')])
+        report = {}
+        cache.get_or_scrape('myntra', 'Black Shirt', lambda report, deadline: [], report)
+        self.assertEqual((report['cache'], report['prewarmed']), ('hit', True))
@@ -3,16 +3,29 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
-from bs4 import BeautifulSoup
-import requests
+from selenium.common.exceptions import TimeoutException
 import re
 import time
 import logging
-import json
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from contextlib import contextmanager
+
+from .admission import PRIORITY_BACKGROUND, Overloaded, scrape_priority
+from .browser_profile import configure_options, load_page
+from .cache import get_result_cache
+from .catalog import get_catalog
+from .deadline import (
+    STATUS_ERROR, STATUS_OK, STATUS_SKIPPED, STATUS_TIMEOUT, DeadlineExceeded, bounded, pause
+)
+from .driver_pool import get_driver_pool
+from .extraction import extract_products
+from .health import ANY_TIER, CircuitOpen, get_retry_budget, get_site_health
+from .readiness import wait_until_ready
+from .scheduler import CACHED_SECONDS, get_duration_estimator, plan_schedule, uses_browser, worker_count
+from .sites import get_site_registry
+from .http_fetch import TIER_HTTP, TIER_SELENIUM, fetch_with_http, record_tier
+from .quota import LIMIT_REACHED, current_quota, result_quota
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,9 +34,8 @@ logger = logging.getLogger(__name__)
 # Increase timeout values
 DEFAULT_TIMEOUT = 30  # seconds
 PAGE_LOAD_TIMEOUT = 40  # seconds
-SCROLL_WAIT_TIME = 5  # seconds
 MAX_RETRIES = 3  # Number of retries for failed scraping attempts
-MAX_CONCURRENT_SCRAPERS = 5  # Maximum number of concurrent scrapers
+MAX_CONCURRENT_SCRAPERS = 5  # Maximum number of concurrent scrapers per search, within the free browsers
 
 def setup_driver():
     """Set up and return a configured Selenium WebDriver."""
@@ -44,6 +56,7 @@ def setup_driver():
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
     ]
     options.add_argument(f'--user-agent={random.choice(user_agents)}')
+    configure_options(options)
     
     driver = webdriver.Chrome(options=options)
     driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
@@ -63,6 +76,34 @@ def normalize_price(price_str):
         return price
     return None
 
+def normalize_rating(rating_str):
+    """Extract the numeric rating and review count from a rating string.
+    
+    Handles the shapes the sites use, such as "4.2", "4.2|1.2k",
+    "4.5 (120)" and "4.0 out of 5 stars". Returns ``(rating, review_count)``,
+    either of which is None when missing.
+    """
+    if rating_str is None or rating_str == 'N/A':
+        return None, None
+    if isinstance(rating_str, (int, float)):
+        return float(rating_str), None
+    
+    rating_match = re.search(r'\d+(?:\.\d+)?', rating_str)
+    if not rating_match:
+        return None, None
+    rating = float(rating_match.group())
+    if rating > 5:
+        rating = None
+    
+    # Whatever number follows the rating (and its scale) is the review count
+    rest = re.sub(r'out of \d+', '', rating_str[rating_match.end():])
+    count_match = re.search(r'(\d[\d,]*(?:\.\d+)?)\s*([kKmM]?)', rest)
+    if not count_match:
+        return rating, None
+    count = float(count_match.group(1).replace(',', ''))
+    count *= {'k': 1000, 'm': 1000000}.get(count_match.group(2).lower(), 1)
+    return rating, int(count)
+
 def normalize_material(material_str):
     """Normalize material descriptions."""
     if not material_str or material_str == 'N/A':
@@ -95,631 +136,368 @@ def normalize_material(material_str):
     
     return material_str.capitalize()
 
-def scrape_with_retry(scrape_func, query, max_retries=MAX_RETRIES):
-    """Execute a scraping function with retries."""
-    for attempt in range(max_retries):
-        try:
-            return scrape_func(query)
-        except TimeoutException:
-            logger.warning(f"Timeout on attempt {attempt + 1} for {scrape_func.__name__}")
-            if attempt == max_retries - 1:
-                logger.error(f"Max retries reached for {scrape_func.__name__}")
-                return []
-            time.sleep(2 ** attempt)  # Exponential backoff
-        except Exception as e:
-            logger.error(f"Error in {scrape_func.__name__}: {str(e)}")
-            return []
-    return []
+def site_key(scrape_func):
+    """Return the short site identifier for a site adapter or scraping function (e.g. 'meesho')."""
+    return getattr(scrape_func, 'key', None) or scrape_func.__name__.replace('scrape_', '', 1)
 
-def scrape_all_sites(query):
-    """Scrape all supported e-commerce sites concurrently."""
-    scraping_functions = [
-        scrape_meesho,
-        scrape_nykaa_fashion,
-        scrape_fabindia,
-        scrape_myntra,
-        scrape_ajio,
-        scrape_flipkart,
-        scrape_amazon,
-        scrape_tatacliq
-    ]
+def scrape_with_retry(scrape_func, query, max_retries=MAX_RETRIES, report=None, deadline=None):
+    """Execute a scraping function with retries.
     
-    all_products = []
+    Sites whose circuit breaker is open are skipped with ``CircuitOpen``.
+    Every attempt's latency and outcome feed the site's health, and a failed
+    attempt is only retried while the deadline and the shared retry budget
+    allow it.
+    """
+    site = site_key(scrape_func)
+    health = get_site_health()
+    budget = get_retry_budget()
+    if report is None:
+        report = {}
     
-    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SCRAPERS) as executor:
-        # Create futures for each scraping function
-        future_to_site = {
-            executor.submit(scrape_with_retry, func, query): func.__name__
-            for func in scraping_functions
-        }
-        
-        # Process completed futures as they finish
-        for future in as_completed(future_to_site):
-            site_name = future_to_site[future]
-            try:
-                products = future.result()
-                all_products.extend(products)
-                logger.info(f"Completed scraping {site_name} - found {len(products)} products")
-            except Exception as e:
-                logger.error(f"Error scraping {site_name}: {str(e)}")
-    
-    return all_products
-
-def scrape_meesho(query):
-    """Scrape product data from Meesho."""
-    logger.info(f"Scraping Meesho for: {query}")
-    driver = setup_driver()
     products = []
-    
-    try:
-        search_url = f"https://www.meesho.com/search?q={query}"
-        driver.get(search_url)
-        
-        # Wait for product cards to load
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "div.ProductList__GridCol-sc-8lnc8o-0"))
-        )
-        
-        # Scroll down to load more products
-        driver.execute_script("window.scrollBy(0, 1000);")
-        time.sleep(2)
-        
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        
-        # Find all product cards
-        product_cards = soup.find_all('div', class_=lambda c: c and 'ProductList__GridCol' in c)
-        
-        for item in product_cards[:10]:  # Limit to first 10 products for performance
+    scrape_started = time.monotonic()
+    for attempt in range(max_retries):
+        health.check(site)
+        budget.record_attempt()
+        report['status'] = None
+        report.pop('error', None)
+        started = time.monotonic()
+        recorded = False
+        try:
             try:
-                name_elem = item.find('p', class_=lambda c: c and 'Text__StyledText' in c)
-                price_elem = item.find('h5', class_=lambda c: c and 'Text__StyledText' in c)
-                image_elem = item.find('img')
-                rating_elem = item.find('span', class_=lambda c: c and 'Rating__StyledRating' in c)
-                
-                name = name_elem.text if name_elem else 'N/A'
-                price = price_elem.text if price_elem else 'N/A'
-                image = image_elem['src'] if image_elem and 'src' in image_elem.attrs else 'N/A'
-                rating = rating_elem.text if rating_elem else 'N/A'
-                
-                # Material is often not directly available on search results
-                material = 'N/A'
-                
-                normalized_price = normalize_price(price)
-                
-                products.append({
-                    'name': name,
-                    'price': normalized_price,
-                    'price_display': price,
-                    'image': image,
-                    'material': material,
-                    'rating': rating,
-                    'site': 'Meesho'
-                })
+                products = scrape_func(query, report=report, deadline=deadline)
+            except (Overloaded, DeadlineExceeded):
+                # Let the caller report load shedding or expiry instead of an empty result
+                raise
             except Exception as e:
-                logger.error(f"Error parsing Meesho product: {e}")
-                continue
-                
-    except Exception as e:
-        logger.error(f"Error scraping Meesho: {e}")
-    finally:
-        driver.quit()
-        
+                logger.error(f"Error in {scrape_func.__name__}: {str(e)}")
+                record_failure(report, e, deadline)
+                products = []
+            
+            failed = report.get('status') in (STATUS_TIMEOUT, STATUS_ERROR)
+            # Attempts cut short by the caller's deadline say nothing about the site
+            if not (failed and deadline is not None and deadline.expired()):
+                health.record(site, time.monotonic() - started, not failed, report.get('tier') or ANY_TIER)
+                recorded = True
+        finally:
+            if not recorded:
+                health.abandon(site)
+        
+        if not failed:
+            get_duration_estimator().observe(site, time.monotonic() - scrape_started)
+            return products
+        if attempt == max_retries - 1 or (deadline is not None and deadline.remaining() < 2 ** attempt):
+            logger.error(f"Max retries reached for {scrape_func.__name__}")
+            break
+        if not budget.try_retry():
+            logger.warning(f"Retry budget exhausted, not retrying {scrape_func.__name__}")
+            break
+        logger.warning(f"Attempt {attempt + 1} failed for {scrape_func.__name__}, retrying")
+        pause(deadline, 2 ** attempt)  # Exponential backoff
+    if not (deadline is not None and deadline.expired()):
+        get_duration_estimator().observe(site, time.monotonic() - scrape_started)
     return products
 
-def scrape_nykaa_fashion(query):
-    """Scrape product data from Nykaa Fashion."""
-    logger.info(f"Scraping Nykaa Fashion for: {query}")
-    driver = setup_driver()
-    products = []
+def wait_timeout(site, cap, deadline=None):
+    """Return how long a browser waits for ``site``'s page: adapted to its recent Selenium scrapes, within ``deadline``."""
+    return bounded(deadline, get_site_health().timeout(site, cap, TIER_SELENIUM))
+
+@contextmanager
+def pooled_driver(deadline=None):
+    """Borrow a pooled browser for one scrape, bounded by ``deadline``.
     
+    If the deadline is cancelled while the browser is in use, the browser is
+    quit from the cancelling thread so the scrape fails immediately and the
+    browser is replaced rather than returned to the pool.
+    """
+    if deadline is not None:
+        deadline.check()
+    pool = get_driver_pool()
+    driver = pool.checkout(timeout=bounded(deadline, pool.checkout_timeout))
+    handle = deadline.add_cancel_callback(lambda: pool.abort(driver)) if deadline is not None else None
     try:
-        search_url = f"https://www.nykaafashion.com/search?q={query}"
-        driver.get(search_url)
-        
-        # Wait for product cards to load
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.product-card"))
-            )
-            
-            # Scroll down to load more products
-            driver.execute_script("window.scrollBy(0, 1000);")
-            time.sleep(2)
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            # Find all product cards
-            product_cards = soup.find_all('div', class_='product-card')
-            
-            for item in product_cards[:10]:  # Limit to first 10 products
-                try:
-                    name_elem = item.find('div', class_='product-name')
-                    brand_elem = item.find('div', class_='brand-name')
-                    price_elem = item.find('span', class_='primary-price')
-                    image_elem = item.find('img')
-                    
-                    brand = brand_elem.text.strip() if brand_elem else ''
-                    name = name_elem.text.strip() if name_elem else 'N/A'
-                    if brand and name != 'N/A':
-                        name = f"{brand} - {name}"
-                        
-                    price = price_elem.text.strip() if price_elem else 'N/A'
-                    image = image_elem['src'] if image_elem and 'src' in image_elem.attrs else 'N/A'
-                    
-                    # Material and rating often not available in search results
-                    material = 'N/A'
-                    rating = 'N/A'
-                    
-                    normalized_price = normalize_price(price)
-                    
-                    products.append({
-                        'name': name,
-                        'price': normalized_price,
-                        'price_display': price,
-                        'image': image,
-                        'material': material,
-                        'rating': rating,
-                        'site': 'Nykaa Fashion'
-                    })
-                except Exception as e:
-                    logger.error(f"Error parsing Nykaa Fashion product: {e}")
-                    continue
-        except TimeoutException:
-            logger.warning("Timeout waiting for Nykaa Fashion products to load")
-            
-    except Exception as e:
-        logger.error(f"Error scraping Nykaa Fashion: {e}")
+        driver.set_page_load_timeout(max(1, bounded(deadline, PAGE_LOAD_TIMEOUT)))
+        yield driver
     finally:
-        driver.quit()
-        
-    return products
+        if handle is not None:
+            deadline.remove_cancel_callback(handle)
+        pool.checkin(driver)
 
-def scrape_fabindia(query):
-    """Scrape product data from FabIndia."""
-    logger.info(f"Scraping FabIndia for: {query}")
-    driver = setup_driver()
-    products = []
+def record_failure(report, error, deadline=None):
+    """Mark a site's report as timed out or failed because of ``error``."""
+    if report is None:
+        return
+    timed_out = isinstance(error, (TimeoutException, DeadlineExceeded)) or (deadline is not None and deadline.expired())
+    report['status'] = STATUS_TIMEOUT if timed_out else STATUS_ERROR
+    report['error'] = str(error).strip() or error.__class__.__name__
+
+def collect_errors(reports):
+    """Build the response's list of error messages from per-site reports."""
+    errors = []
+    for site, report in reports.items():
+        status = report.get('status')
+        if status == STATUS_TIMEOUT:
+            errors.append(f"Timeout while scraping {site}")
+        elif status == STATUS_ERROR:
+            errors.append(f"Error scraping {site}: {report.get('error')}")
+        elif status == STATUS_SKIPPED and report.get('error') != LIMIT_REACHED:
+            errors.append(f"Skipped {site}: {report.get('error')}")
+    return errors
+
+def scrape_site(scrape_func, query, report=None, deadline=None, quota=None):
+    """Scrape one site through the shared result cache.
     
-    try:
-        search_url = f"https://www.fabindia.com/search?q={query}"
-        driver.get(search_url)
-        
-        # Wait for product cards to load
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.product-item"))
-            )
-            
-            # Scroll down to load more products
-            driver.execute_script("window.scrollBy(0, 1000);")
-            time.sleep(2)
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            # Find all product cards
-            product_cards = soup.find_all('div', class_='product-item')
-            
-            for item in product_cards[:10]:  # Limit to first 10 products
-                try:
-                    name_elem = item.find('div', class_='product-name')
-                    price_elem = item.find('span', class_='price')
-                    image_elem = item.find('img', class_='product-image')
-                    
-                    name = name_elem.text.strip() if name_elem else 'N/A'
-                    price = price_elem.text.strip() if price_elem else 'N/A'
-                    image = image_elem['src'] if image_elem and 'src' in image_elem.attrs else 'N/A'
-                    
-                    # FabIndia often uses natural materials
-                    material = 'Cotton' if 'cotton' in name.lower() else 'N/A'
-                    rating = 'N/A'
-                    
-                    normalized_price = normalize_price(price)
-                    
-                    products.append({
-                        'name': name,
-                        'price': normalized_price,
-                        'price_display': price,
-                        'image': image,
-                        'material': material,
-                        'rating': rating,
-                        'site': 'FabIndia'
-                    })
-                except Exception as e:
-                    logger.error(f"Error parsing FabIndia product: {e}")
-                    continue
-        except TimeoutException:
-            logger.warning("Timeout waiting for FabIndia products to load")
-            
-    except Exception as e:
-        logger.error(f"Error scraping FabIndia: {e}")
-    finally:
-        driver.quit()
-        
+    On a cache miss the site's fresh run in the catalog, if any, answers
+    without scraping; otherwise the site is scraped and the results are
+    queued for ingestion into the catalog. With a result ``quota`` the site
+    is read deeper but stops once the quota is met, and is skipped if it was
+    met before the site started.
+    """
+    if report is None:
+        report = {}
+    if deadline is not None and deadline.expired():
+        report['status'] = STATUS_SKIPPED
+        report['error'] = "Deadline passed before the site was scraped"
+        return []
+    if quota is not None and quota.met():
+        report['status'] = STATUS_SKIPPED
+        report['error'] = LIMIT_REACHED
+        return []
+    
+    site = site_key(scrape_func)
+    depth = site_depth(scrape_func)
+    catalog = get_catalog()
+    
+    def scrape(fetch_report, fetch_deadline):
+        products = scrape_with_retry(scrape_func, query, report=fetch_report, deadline=fetch_deadline)
+        catalog.ingest(site, query, products, fetch_report)
+        return products
+    
+    def fetch(fetch_report, fetch_deadline):
+        products = catalog.lookup(site, query, depth, fetch_report)
+        if products is not None:
+            return products
+        return scrape(fetch_report, fetch_deadline)
+    
+    # Scrapes for a search with a limit read deeper, but may stop once its limit is met
+    read_depth = scrape_func.depth(quota) if hasattr(scrape_func, 'depth') else depth
+    with result_quota(quota):
+        # Stale entries are refreshed by scraping; a catalog run may be older than the site's TTL
+        products = get_result_cache().get_or_scrape(site, query, fetch, report, deadline, depth=depth,
+                                                    read_depth=read_depth, refresh_fetch=scrape)
+    if quota is not None:
+        quota.update(site, products)
+    if not report.get('status'):
+        report['status'] = STATUS_OK
     return products
 
-def scrape_google_shopping(query):
-    """Scrape product data from Google Shopping."""
-    logger.info(f"Scraping Google Shopping for: {query}")
-    driver = setup_driver()
-    products = []
+def site_depth(scrape_func):
+    """Return how many products a cached entry must hold to answer for a site, None if any will do.
     
-    try:
-        # Use the complete query text for search
-        search_url = f"https://www.google.com/search?q={query}&tbm=shop"
-        driver.get(search_url)
-        
-        # Wait for product cards to load
-        try:
-            WebDriverWait(driver, DEFAULT_TIMEOUT).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.sh-dgr__grid-result"))
-            )
-            
-            # Scroll down to load more products
-            driver.execute_script("window.scrollBy(0, 1000);")
-            time.sleep(SCROLL_WAIT_TIME)
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            # Find all product cards
-            product_cards = soup.find_all('div', class_='sh-dgr__grid-result')
-            
-            for item in product_cards[:15]:  # Get more products from Google
-                try:
-                    # Extract product details
-                    name_elem = item.find('h3', class_='tAxDx')
-                    price_elem = item.find('span', class_='a8Pemb')
-                    merchant_elem = item.find('div', class_='aULzUe')
-                    image_elem = item.find('img', class_='TL92Hc')
-                    
-                    name = name_elem.text.strip() if name_elem else 'N/A'
-                    price = price_elem.text.strip() if price_elem else 'N/A'
-                    merchant = merchant_elem.text.strip() if merchant_elem else 'N/A'
-                    image = image_elem['src'] if image_elem and 'src' in image_elem.attrs else 'N/A'
-                    
-                    # Material is often not directly available on search results
-                    material = 'N/A'
-                    rating = 'N/A'
-                    
-                    # Try to find rating if available
-                    rating_elem = item.find('div', class_='QIrs8')
-                    if rating_elem:
-                        rating = rating_elem.text.strip()
-                    
-                    normalized_price = normalize_price(price)
-                    
-                    # Add merchant name to the site field
-                    site_name = f"Google Shopping - {merchant}" if merchant != 'N/A' else "Google Shopping"
-                    
-                    products.append({
-                        'name': name,
-                        'price': normalized_price,
-                        'price_display': price,
-                        'image': image,
-                        'material': material,
-                        'rating': rating,
-                        'site': site_name
-                    })
-                except Exception as e:
-                    logger.error(f"Error parsing Google Shopping product: {e}")
-                    continue
-        except TimeoutException:
-            logger.warning("Timeout waiting for Google Shopping products to load")
-            
-    except Exception as e:
-        logger.error(f"Error scraping Google Shopping: {e}")
-    finally:
-        driver.quit()
-        
-    return products
+    Searches with a result quota accept the same entries as any other; the
+    deeper read only happens when the site is actually scraped.
+    """
+    return getattr(scrape_func, 'card_limit', None)
 
-def scrape_myntra(query):
-    """Scrape product data from Myntra."""
-    logger.info(f"Scraping Myntra for: {query}")
-    driver = setup_driver()
-    products = []
+def refresh_site(scrape_func, query, report=None, deadline=None):
+    """Scrape one site at background priority, replacing its cached results (pre-warming).
     
-    try:
-        search_url = f"https://www.myntra.com/{query.replace(' ', '-')}"
-        driver.get(search_url)
-        
-        # Wait for product cards to load
-        try:
-            WebDriverWait(driver, DEFAULT_TIMEOUT).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "li.product-base"))
-            )
-            
-            # Scroll down to load more products
-            driver.execute_script("window.scrollBy(0, 1000);")
-            time.sleep(SCROLL_WAIT_TIME)
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            # Find all product cards
-            product_cards = soup.find_all('li', class_='product-base')
-            
-            for item in product_cards[:10]:
-                try:
-                    # Extract product details
-                    brand_elem = item.find('h3', class_='product-brand')
-                    name_elem = item.find('h4', class_='product-product')
-                    price_elem = item.find('span', class_='product-discountedPrice')
-                    if not price_elem:
-                        price_elem = item.find('div', class_='product-price')
-                    image_elem = item.find('img', class_='product-image')
-                    
-                    brand = brand_elem.text.strip() if brand_elem else ''
-                    product_name = name_elem.text.strip() if name_elem else 'N/A'
-                    name = f"{brand} - {product_name}" if brand else product_name
-                    price = price_elem.text.strip() if price_elem else 'N/A'
-                    image = image_elem['src'] if image_elem and 'src' in image_elem.attrs else 'N/A'
-                    
-                    # Material and rating often not available in search results
-                    material = 'N/A'
-                    rating = 'N/A'
-                    
-                    # Try to find rating if available
-                    rating_elem = item.find('div', class_='product-ratingsContainer')
-                    if rating_elem:
-                        rating = rating_elem.text.strip()
-                    
-                    normalized_price = normalize_price(price)
-                    
-                    products.append({
-                        'name': name,
-                        'price': normalized_price,
-                        'price_display': price,
-                        'image': image,
-                        'material': material,
-                        'rating': rating,
-                        'site': 'Myntra'
-                    })
-                except Exception as e:
-                    logger.error(f"Error parsing Myntra product: {e}")
-                    continue
-        except TimeoutException:
-            logger.warning("Timeout waiting for Myntra products to load")
-            
-    except Exception as e:
-        logger.error(f"Error scraping Myntra: {e}")
-    finally:
-        driver.quit()
-        
+    The catalog is not consulted, as its runs may be as old as the results
+    being replaced; the new results are ingested into it as usual.
+    """
+    if report is None:
+        report = {}
+    site = site_key(scrape_func)
+    catalog = get_catalog()
+    
+    def fetch(fetch_report, fetch_deadline):
+        products = scrape_with_retry(scrape_func, query, report=fetch_report, deadline=fetch_deadline)
+        catalog.ingest(site, query, products, fetch_report)
+        return products
+    
+    started = time.monotonic()
+    with scrape_priority(PRIORITY_BACKGROUND):
+        products = get_result_cache().refresh(site, query, fetch, report, deadline)
+    report['results'] = len(products)
+    report['elapsed'] = round(time.monotonic() - started, 2)
+    if not report.get('status'):
+        report['status'] = STATUS_OK
     return products
 
-def scrape_ajio(query):
-    """Scrape product data from AJIO."""
-    logger.info(f"Scraping AJIO for: {query}")
-    driver = setup_driver()
-    products = []
+def scrape_all_sites(query, reports=None, deadline=None, schedule=None):
+    """Scrape all default sites of the registry concurrently.
+    
+    If ``reports`` is a dict, it is filled with per-site metadata such as the
+    outcome status, the fetch tier that served the site, the result cache
+    status and the number of products found.
+    """
+    all_products = []
+    for _, products in iter_site_results(query, get_site_registry().defaults(), reports=reports, deadline=deadline, schedule=schedule):
+        all_products.extend(products)
     
+    return all_products
+
+def new_site_report():
+    """Return the initial per-site report of a search."""
+    return {'status': None, 'tier': None, 'results': 0}
+
+def iter_site_results(query, scraping_functions, reports=None, deadline=None, schedule=None, quota=None):
+    """Scrape sites concurrently, yielding (site, products) as each one finishes.
+    
+    Sites are dispatched longest-expected first, so slow sites don't end up
+    in the last wave: Selenium-tier sites onto as many threads as there are
+    free browsers, HTTP-tier sites onto threads of their own. If
+    ``schedule`` is a dict it receives the plan (dispatch order, per-site
+    predictions, predicted makespan) and the measured ``actual_makespan``.
+    
+    With a result ``quota`` the search only needs its first matches, so
+    sites are dispatched shortest-expected first (cached ones before any
+    scrape) and sites not started when the quota is met are skipped.
+    
+    When ``deadline`` passes, unfinished sites are given up on: sites still
+    running are cancelled (their browsers are released immediately) and
+    reported as ``timeout``, sites not yet started as ``skipped``. Nothing
+    is yielded for them.
+    """
+    if reports is None:
+        reports = {}
+    if schedule is None:
+        schedule = {}
+    
+    funcs = {}
+    for func in scraping_functions:
+        if site_key(func) not in reports:
+            funcs[site_key(func)] = func
+    browser_workers, http_workers = worker_count(list(funcs.values()), MAX_CONCURRENT_SCRAPERS)
+    schedule.update(plan_schedule(
+        {site: expected_duration(site, query, site_depth(funcs[site])) for site in funcs},
+        max(1, browser_workers + http_workers),
+        shortest_first=quota is not None
+    ))
+    
+    started = time.monotonic()
+    # HTTP-tier sites run on threads of their own, never waiting behind sites queued for browsers
+    browser_executor = ThreadPoolExecutor(max_workers=max(1, browser_workers))
+    http_executor = ThreadPoolExecutor(max_workers=max(1, http_workers))
     try:
-        search_url = f"https://www.ajio.com/search/?text={query}"
-        driver.get(search_url)
+        # Create futures for each scraping function in the planned order
+        future_to_site = {}
+        for site in schedule['order']:
+            report = reports[site] = new_site_report()
+            executor = browser_executor if uses_browser(funcs[site]) else http_executor
+            future = executor.submit(scrape_site, funcs[site], query, report=report, deadline=deadline, quota=quota)
+            future_to_site[future] = funcs[site]
         
-        # Wait for product cards to load
+        # Process completed futures as they finish
+        pending = set(future_to_site)
         try:
-            WebDriverWait(driver, DEFAULT_TIMEOUT).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.item.rilrtl-products-list__item"))
-            )
-            
-            # Scroll down to load more products
-            driver.execute_script("window.scrollBy(0, 1000);")
-            time.sleep(SCROLL_WAIT_TIME)
-            
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            
-            # Find all product cards
-            product_cards = soup.find_all('div', class_='item rilrtl-products-list__item')
-            
-            for item in product_cards[:10]:
+            timeout = deadline.remaining() if deadline is not None else None
+            for future in as_completed(future_to_site, timeout=timeout):
+                pending.discard(future)
+                func = future_to_site[future]
+                report = reports[site_key(func)]
+                site_name = func.__name__
                 try:
-                    # Extract product details
-                    brand_elem = item.find('div', class_='brand')
-                    name_elem = item.find('div', class_='nameCls')
-                    price_elem = item.find('span', class_='price')
-                    image_elem = item.find('img')
-                    
-                    brand = brand_elem.text.strip() if brand_elem else ''
-                    product_name = name_elem.text.strip() if name_elem else 'N/A'
-                    name = f"{brand} - {product_name}" if brand else product_name
-                    price = price_elem.text.strip() if price_elem else 'N/A'
-                    image = image_elem['src'] if image_elem and 'src' in image_elem.attrs else 'N/A'
-                    
-                    # Material and rating often not available in search results
-                    material = 'N/A'
-                    rating = 'N/A'
-                    
-                    normalized_price = normalize_price(price)
-                    
-                    products.append({
-                        'name': name,
-                        'price': normalized_price,
-                        'price_display': price,
-                        'image': image,
-                        'material': material,
-                        'rating': rating,
-                        'site': 'AJIO'
-                    })
+                    products = future.result()
+                    report['results'] = len(products)
+                    logger.info(f"Completed scraping {site_name} - found {len(products)} products")
+                except (Overloaded, CircuitOpen) as e:
+                    logger.warning(f"Shed {site_name}: {str(e)}")
+                    report['status'] = STATUS_SKIPPED
+                    report['error'] = str(e)
+                    products = []
                 except Exception as e:
-                    logger.error(f"Error parsing AJIO product: {e}")
-                    continue
-        except TimeoutException:
-            logger.warning("Timeout waiting for AJIO products to load")
-            
-    except Exception as e:
-        logger.error(f"Error scraping AJIO: {e}")
+                    logger.error(f"Error scraping {site_name}: {str(e)}")
+                    record_failure(report, e, deadline)
+                    products = []
+                report['elapsed'] = round(time.monotonic() - started, 2)
+                yield site_key(func), products
+        except FuturesTimeoutError:
+            for future in pending:
+                report = reports[site_key(future_to_site[future])]
+                if future.cancel():
+                    report['status'] = STATUS_SKIPPED
+                    report['error'] = "Deadline passed before the site was scraped"
+                else:
+                    report['status'] = STATUS_TIMEOUT
+                    report['error'] = "Deadline exceeded"
+            # Abort scrapes still holding browsers instead of letting them run on
+            deadline.cancel()
     finally:
-        driver.quit()
-        
-    return products
+        schedule['actual_makespan'] = round(time.monotonic() - started, 2)
+        for executor in (browser_executor, http_executor):
+            executor.shutdown(wait=False, cancel_futures=True)
 
-def scrape_flipkart(query):
-    """Scrape product data from Flipkart."""
-    logger.info(f"Scraping Flipkart for: {query}")
-    driver = setup_driver()
-    products = []
-    
-    try:
-        search_url = f"https://www.flipkart.com/search?q={query}"
-        driver.get(search_url)
-        
-        # Wait for product cards to load
-        WebDriverWait(driver, DEFAULT_TIMEOUT).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "div._1AtVbE"))
-        )
-        
-        # Scroll to load more products
-        for _ in range(3):
-            driver.execute_script("window.scrollBy(0, 1000);")
-            time.sleep(SCROLL_WAIT_TIME)
-        
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        product_cards = soup.find_all('div', class_='_1AtVbE')
-        
-        for item in product_cards[:10]:
-            try:
-                name_elem = item.find('div', class_='_4rR01T')
-                price_elem = item.find('div', class_='_30jeq3')
-                image_elem = item.find('img', class_='_396QI4')
-                rating_elem = item.find('div', class_='_3LWZlK')
-                
-                name = name_elem.text if name_elem else 'N/A'
-                price = price_elem.text if price_elem else 'N/A'
-                image = image_elem['src'] if image_elem and 'src' in image_elem.attrs else 'N/A'
-                rating = rating_elem.text if rating_elem else 'N/A'
-                
-                normalized_price = normalize_price(price)
-                
-                products.append({
-                    'name': name,
-                    'price': normalized_price,
-                    'price_display': price,
-                    'image': image,
-                    'material': 'N/A',
-                    'rating': rating,
-                    'site': 'Flipkart'
-                })
-            except Exception as e:
-                logger.error(f"Error parsing Flipkart product: {e}")
-                continue
-                
-    except Exception as e:
-        logger.error(f"Error scraping Flipkart: {e}")
-    finally:
-        driver.quit()
-        
-    return products
+def expected_duration(site, query, depth=None):
+    """Predict how long scraping ``site`` for ``query`` will take, for scheduling."""
+    if get_result_cache().is_cached(site, query, depth):
+        return CACHED_SECONDS
+    return get_duration_estimator().estimate(site)
 
-def scrape_amazon(query):
-    """Scrape product data from Amazon."""
-    logger.info(f"Scraping Amazon for: {query}")
-    driver = setup_driver()
-    products = []
+def scrape_with_adapter(adapter, query, report=None, deadline=None):
+    """Scrape one site as described by its adapter.
+    
+    HTTP-tier sites are fetched without a browser first; the Selenium path
+    waits for the first card, scrolls by the adapter's policy and extracts
+    the cards. Under a result quota (a search with a `limit`) the site reads
+    up to ``max_cards`` cards, counting them toward the quota page by page or
+    scroll by scroll, and stops as soon as the quota is met.
+    """
+    logger.info(f"Scraping {adapter.name} for: {query}")
+    quota = current_quota()
+    depth = adapter.depth(quota)
     
-    try:
-        search_url = f"https://www.amazon.in/s?k={query}"
-        driver.get(search_url)
-        
-        # Wait for product cards to load
-        WebDriverWait(driver, DEFAULT_TIMEOUT).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "div[data-component-type='s-search-result']"))
-        )
-        
-        # Scroll to load more products
-        for _ in range(3):
-            driver.execute_script("window.scrollBy(0, 1000);")
-            time.sleep(SCROLL_WAIT_TIME)
-        
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        product_cards = soup.find_all('div', attrs={'data-component-type': 's-search-result'})
-        
-        for item in product_cards[:10]:
-            try:
-                name_elem = item.find('span', class_='a-text-normal')
-                price_elem = item.find('span', class_='a-price-whole')
-                image_elem = item.find('img', class_='s-image')
-                rating_elem = item.find('span', class_='a-icon-alt')
-                
-                name = name_elem.text if name_elem else 'N/A'
-                price = price_elem.text if price_elem else 'N/A'
-                image = image_elem['src'] if image_elem and 'src' in image_elem.attrs else 'N/A'
-                rating = rating_elem.text if rating_elem else 'N/A'
-                
-                normalized_price = normalize_price(price)
-                
-                products.append({
-                    'name': name,
-                    'price': normalized_price,
-                    'price_display': price,
-                    'image': image,
-                    'material': 'N/A',
-                    'rating': rating,
-                    'site': 'Amazon'
-                })
-            except Exception as e:
-                logger.error(f"Error parsing Amazon product: {e}")
-                continue
-                
-    except Exception as e:
-        logger.error(f"Error scraping Amazon: {e}")
-    finally:
-        driver.quit()
-        
-    return products
-
-def scrape_tatacliq(query):
-    """Scrape product data from Tata CLiQ."""
-    logger.info(f"Scraping Tata CLiQ for: {query}")
-    driver = setup_driver()
     products = []
+    if adapter.tier == TIER_HTTP:
+        products = fetch_with_http(adapter, query, report, deadline, depth, quota)
+        if products:
+            record_depth(report, depth, products, quota)
+            return products
+    record_tier(report, TIER_SELENIUM)
     
-    try:
-        search_url = f"https://www.tatacliq.com/search/?searchCategory=all&text={query}"
-        driver.get(search_url)
-        
-        # Wait for product cards to load
-        WebDriverWait(driver, DEFAULT_TIMEOUT).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, "div.ProductList__GridCol"))
-        )
-        
-        # Scroll to load more products
-        for _ in range(3):
-            driver.execute_script("window.scrollBy(0, 1000);")
-            time.sleep(SCROLL_WAIT_TIME)
-        
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        product_cards = soup.find_all('div', class_='ProductList__GridCol')
+    def collect():
+        """Read the cards loaded since the last call; True once the quota is met."""
+        products.extend(extract_products(driver, adapter, report, deadline, offset=len(products), limit=depth))
+        quota.update(adapter.key, products)
+        return quota.met()
+    
+    with pooled_driver(deadline) as driver:
+        try:
+            load_page(driver, adapter.search_url(query), adapter.key, report, deadline)
         
-        for item in product_cards[:10]:
+            # Wait for product cards to load
             try:
-                name_elem = item.find('div', class_='ProductDescription__ProductName')
-                price_elem = item.find('div', class_='ProductDescription__Price')
-                image_elem = item.find('img', class_='ProductImage')
-                rating_elem = item.find('div', class_='ProductDescription__Rating')
-                
-                name = name_elem.text if name_elem else 'N/A'
-                price = price_elem.text if price_elem else 'N/A'
-                image = image_elem['src'] if image_elem and 'src' in image_elem.attrs else 'N/A'
-                rating = rating_elem.text if rating_elem else 'N/A'
-                
-                normalized_price = normalize_price(price)
-                
-                products.append({
-                    'name': name,
-                    'price': normalized_price,
-                    'price_display': price,
-                    'image': image,
-                    'material': 'N/A',
-                    'rating': rating,
-                    'site': 'Tata CLiQ'
-                })
-            except Exception as e:
-                logger.error(f"Error parsing Tata CLiQ product: {e}")
-                continue
-                
-    except Exception as e:
-        logger.error(f"Error scraping Tata CLiQ: {e}")
-    finally:
-        driver.quit()
+                WebDriverWait(driver, wait_timeout(adapter.key, adapter.wait_timeout, deadline)).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, adapter.wait_selector))
+                )
+            
+                # Scroll until enough product cards have loaded, or the quota is met
+                if quota is None or not collect():
+                    scrolls = adapter.max_scrolls * -(-depth // adapter.card_limit)
+                    wait_until_ready(driver, adapter.spec['cards'], limit=depth, deadline=deadline,
+                                     max_scrolls=scrolls, report=report,
+                                     on_round=(lambda cards: collect()) if quota is not None else None)
+                    products.extend(extract_products(driver, adapter, report, deadline, offset=len(products), limit=depth))
+                record_depth(report, depth, products, quota)
+            except TimeoutException:
+                logger.warning(f"Timeout waiting for {adapter.name} products to load")
+                record_failure(report, TimeoutException("Timed out waiting for products to load"), deadline)
+            
+        except Exception as e:
+            logger.error(f"Error scraping {adapter.name}: {e}")
+            record_failure(report, e, deadline)
         
     return products
+
+def record_depth(report, depth, products, quota=None):
+    """Record how deep a site was read and whether it ran out of results."""
+    if report is None:
+        return
+    stopped = quota is not None and quota.met()
+    report['depth'] = {
+        'wanted': depth,
+        'found': len(products),
+        # Fewer cards than asked for, and not because the quota stopped us: the site has no more
+        'exhausted': len(products) < depth and not stopped,
+        'stopped': stopped,
+    }
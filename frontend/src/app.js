@@ -19,6 +19,17 @@ const sortOptions = document.querySelectorAll('.sort-option');
 // Store the current results for sorting
 let currentResults = [];
 
+// Cursor over the last search's merged results, kept by the server for re-sorting
+let resultCursor = null;
+
+// Server-side sort modes for the dropdown's sort types
+const SERVER_SORTS = {
+    'price-asc': 'price',
+    'price-desc': 'price_desc',
+    'rating-desc': 'rating',
+    'discount-desc': 'discount'
+};
+
 // Initialize the application
 function init() {
     // Add event listeners
@@ -54,11 +65,20 @@ async function handleSearch(event) {
     showLoading();
     
     try {
-        // Fetch results from API
-        const results = await fetchResults(query, selectedSites);
+        // Stream results from the API, rendering each site as it finishes
+        currentResults = [];
+        resultCursor = null;
+        const summary = await streamResults(query, selectedSites, frame => {
+            currentResults = currentResults.concat(frame.results || []);
+            currentResults.sort((a, b) => (a.price || Infinity) - (b.price || Infinity));
+            if (currentResults.length > 0) {
+                updateResults({ results: currentResults });
+            }
+        });
         
-        // Update UI with results
-        updateResults(results);
+        // Show the final state once every site has reported
+        resultCursor = summary ? summary.cursor : null;
+        updateResults({ results: currentResults, errors: summary && summary.errors });
     } catch (error) {
         console.error('Error fetching results:', error);
         showError(error.message || 'An error occurred while fetching results');
@@ -85,6 +105,55 @@ async function fetchResults(query, sites) {
     return data;
 }
 
+// Stream results from the API as newline-delimited JSON frames
+async function streamResults(query, sites, onSiteResults) {
+    const sitesParam = sites.join(',');
+    const url = `${API_BASE_URL}/search/stream/?query=${encodeURIComponent(query)}&sites=${encodeURIComponent(sitesParam)}`;
+    
+    const response = await fetch(url);
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.error || `API request failed with status ${response.status}`);
+    }
+    
+    // Browsers without streaming support fall back to reading the whole body
+    if (!response.body || !response.body.getReader) {
+        const text = await response.text();
+        return handleFrames(text.split('\n'), onSiteResults);
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let summary = null;
+    
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        summary = handleFrames(lines, onSiteResults) || summary;
+    }
+    
+    return handleFrames([buffer], onSiteResults) || summary;
+}
+
+// Dispatch parsed frames; returns the summary frame if one was seen
+function handleFrames(lines, onSiteResults) {
+    let summary = null;
+    lines.forEach(line => {
+        if (!line.trim()) return;
+        const frame = JSON.parse(line);
+        if (frame.type === 'site') {
+            onSiteResults(frame);
+        } else if (frame.type === 'summary') {
+            summary = frame;
+        }
+    });
+    return summary;
+}
+
 // Update the UI with search results
 function updateResults(data) {
     // Hide loading indicator
@@ -168,11 +237,23 @@ function updateResults(data) {
 }
 
 // Handle sorting of results
-function handleSort(event) {
+async function handleSort(event) {
     event.preventDefault();
     
     const sortType = event.target.getAttribute('data-sort');
     
+    // Re-sort the server's copy of the results while it is still available
+    if (resultCursor && SERVER_SORTS[sortType]) {
+        try {
+            const data = await fetchSortedResults(resultCursor, SERVER_SORTS[sortType]);
+            updateResults({ results: data.results });
+            return;
+        } catch (error) {
+            console.warn('Server-side sort failed, sorting locally:', error);
+            resultCursor = null;
+        }
+    }
+    
     if (sortType === 'price-asc') {
         currentResults.sort((a, b) => {
             return (a.price || Infinity) - (b.price || Infinity);
@@ -183,16 +264,31 @@ function handleSort(event) {
         });
     } else if (sortType === 'rating-desc') {
         currentResults.sort((a, b) => {
-            const ratingA = parseFloat(a.rating) || 0;
-            const ratingB = parseFloat(b.rating) || 0;
+            const ratingA = a.rating_value || parseFloat(a.rating) || 0;
+            const ratingB = b.rating_value || parseFloat(b.rating) || 0;
             return ratingB - ratingA;
         });
+    } else if (sortType === 'discount-desc') {
+        const discount = p => (p.mrp && p.price && p.mrp > p.price) ? (p.mrp - p.price) / p.mrp : 0;
+        currentResults.sort((a, b) => discount(b) - discount(a));
     }
     
     // Update the UI with the sorted results
     updateResults({ results: currentResults });
 }
 
+// Re-sort the stored results of the last search on the server
+async function fetchSortedResults(cursor, sort) {
+    const url = `${API_BASE_URL}/search/?cursor=${encodeURIComponent(cursor)}&sort=${encodeURIComponent(sort)}`;
+    
+    const response = await fetch(url);
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.error || `API request failed with status ${response.status}`);
+    }
+    return response.json();
+}
+
 // Show loading indicator
 function showLoading() {
     loadingIndicator.classList.remove('d-none');
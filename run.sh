@@ -43,6 +43,8 @@ cd ../..
 # Start Django server in the background
 echo "Starting Django backend server..."
 cd backend
+python manage.py migrate --noinput
+python manage.py createcachetable
 python manage.py runserver &
 DJANGO_PID=$!
 cd ..